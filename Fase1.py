@@ -1,5 +1,7 @@
 import math
 
+import numpy as np
+
 # --- Base de Datos de Módulos (del archivo de inventario) ---
 # Un diccionario que mapea el código del módulo a su nombre para una salida más clara.
 MODULOS_INFO = {
@@ -309,9 +311,25 @@ def calcular_modulos_arka(P, T, TipoC):
     elif Resto_SLP in (3,4):
         modulos_necesarios["027"] += 1
         
-    total_modulos_sin_base = sum(modulos_necesarios.values())
+    total_modulos = sum(modulos_necesarios.values())
+    total_modulos_sin_base = calcular_total_minimo(total_modulos, P, T)
     
-    total_modulos = total_modulos_sin_base
+    return modulos_necesarios, total_modulos, total_modulos_sin_base
+
+def calcular_total_minimo(total_modulos, P, T):
+    """
+    Añade al total de módulos de inventario los módulos estructurales
+    (access, base, powercore, circulación y transcore).
+
+    Args:
+        total_modulos (int): Suma de los módulos del inventario.
+        P (int): Número de pasajeros.
+        T (int): Tiempo de la misión en días.
+
+    Returns:
+        int: Total mínimo de módulos requeridos.
+    """
+    total_modulos_sin_base = total_modulos
     
     # 7. Módulo ACCESS (010)
     if T <= 600:
@@ -330,9 +348,203 @@ def calcular_modulos_arka(P, T, TipoC):
     # 8. Módulos TRANSCORE (011)
     total_modulos_sin_base += math.ceil(total_modulos_sin_base/4)
 
-    total_modulos = sum(modulos_necesarios.values())
-    
-    return modulos_necesarios, total_modulos, total_modulos_sin_base
+    return total_modulos_sin_base
+
+# --- Versión vectorizada (lotes de misiones) ---
+def calcular_modulos_arka_batch(P, T, TipoC):
+    """
+    Calcula el inventario de muchas misiones a la vez con máscaras de NumPy.
+
+    Aplica exactamente las mismas reglas que calcular_modulos_arka, pero sobre
+    arrays: cada regla "if/elif" se convierte en una máscara booleana.
+
+    Args:
+        P (array-like de int): Número de pasajeros de cada misión.
+        T (array-like de int): Tiempo de cada misión en días.
+        TipoC (array-like de bool): Si cada misión es de tipo Científico.
+
+    Returns:
+        tuple: (modulos, total_modulos, total_minimo)
+            - modulos: ndarray int64 [n, 27], columna i = módulo f"{i+1:03d}"
+            - total_modulos: ndarray int64 [n], suma de cada fila
+            - total_minimo: ndarray int64 [n], total con ACCESS, BASE,
+              POWERCORE, CIRCULACION y TRANSCORE (ver calcular_total_minimo)
+    """
+    P, T, TipoC = np.broadcast_arrays(
+        np.atleast_1d(np.asarray(P, dtype=np.int64)),
+        np.atleast_1d(np.asarray(T, dtype=np.int64)),
+        np.atleast_1d(np.asarray(TipoC, dtype=bool)),
+    )
+    # Columna 0 sin usar para indexar por número de módulo (1..27)
+    m = np.zeros((P.shape[0], 28), dtype=np.int64)
+
+    def sumar(modulo, mascara, cantidad=1):
+        m[:, modulo] += np.where(mascara, cantidad, 0)
+
+    def en_rango(resto, minimo, maximo):
+        return (minimo <= resto) & (resto <= maximo)
+
+    # 2. Módulos LABORATORY (002 (tri) y 003)
+    Bloques_L = P // 16
+    Resto_L = P % 16
+    corta = TipoC & (T <= 500)
+    media = TipoC & (500 < T) & (T < 1000)
+    larga = TipoC & (T >= 1000)
+    sumar(3, corta, 4 * Bloques_L)
+    sumar(2, media, 1 * Bloques_L)
+    sumar(3, media, 3 * Bloques_L)
+    sumar(2, larga, 4 * Bloques_L)
+
+    r = en_rango(Resto_L, 1, 4)
+    sumar(3, r & corta); sumar(2, r & media); sumar(3, r & larga, 2)
+    r = en_rango(Resto_L, 5, 8)
+    sumar(3, r & corta, 2); sumar(2, r & media, 2); sumar(3, r & larga, 3)
+    r = en_rango(Resto_L, 9, 12)
+    sumar(3, r & corta, 3); sumar(2, r & media); sumar(3, r & media, 2); sumar(3, r & larga, 4)
+    r = en_rango(Resto_L, 13, 16)
+    sumar(3, r & corta, 4); sumar(2, r & media); sumar(3, r & media, 3); sumar(2, r & larga, 4)
+
+    # 4. Módulos RECREATION (005 (tri) y 006)
+    Bloques_R = P // 12
+    Resto_R = P % 12
+    corta = T <= 180
+    media = (180 < T) & (T <= 500)
+    larga = T > 500
+    sumar(6, corta, 1 * Bloques_R)
+    sumar(5, media, 1 * Bloques_R)
+    sumar(6, media, 1 * Bloques_R)
+    sumar(5, larga, 2 * Bloques_R)
+
+    r = en_rango(Resto_R, 1, 4)
+    sumar(6, r & media); sumar(5, r & larga)
+    r = en_rango(Resto_R, 5, 8)
+    sumar(6, r & corta); sumar(5, r & media); sumar(5, r & larga); sumar(6, r & larga)
+    r = en_rango(Resto_R, 9, 12)
+    sumar(5, r & corta); sumar(5, r & media); sumar(6, r & media); sumar(5, r & larga, 2)
+
+    # 5. Módulos HUERTA (007 (Tri) y 008)
+    Gu = P * 4
+    m[:, 7] = Gu // 16
+    sumar(7, Gu % 16 > 10)
+    sumar(8, (Gu % 16 <= 10) & (Gu % 16 != 0))
+
+    # 9. Módulos SANITARY (012 y 013(tri))
+    Bloques_S = P // 6
+    Resto_S = P % 6
+    sumar(12, T < 500, 1 * Bloques_S)
+    sumar(13, T >= 500, 1 * Bloques_S)
+
+    r = en_rango(Resto_S, 1, 2)
+    sumar(12, r & (T < 500)); sumar(13, r & (T >= 500))
+    r = en_rango(Resto_S, 3, 5)
+    sumar(12, r & (T <= 180)); sumar(13, r & (T > 180))
+    r = Resto_S == 6
+    sumar(12, r & (T <= 60)); sumar(13, r & (60 < T) & (T < 500))
+    sumar(12, r & (T >= 500)); sumar(13, r & (T >= 500))
+
+    # 11. Módulos EXERCISE (014 y 015)
+    Bloques_E = P // 12
+    Resto_E = P % 12
+    corta = T <= 30
+    media = (30 < T) & (T < 500)
+    larga = T >= 500
+    sumar(14, corta, 2 * Bloques_E)
+    sumar(14, media, 1 * Bloques_E)
+    sumar(15, media, 1 * Bloques_E)
+    sumar(15, larga, 2 * Bloques_E)
+
+    r = en_rango(Resto_E, 1, 4)
+    sumar(14, r & (T < 500)); sumar(15, r & larga)
+    r = en_rango(Resto_E, 5, 8)
+    sumar(15, r); sumar(14, r & larga)
+    r = en_rango(Resto_E, 9, 12)
+    sumar(14, r & corta, 2); sumar(14, r & media); sumar(15, r & media); sumar(15, r & larga, 2)
+
+    # 12. Módulos SYSTEM (016 y 017)
+    Bloques_SYS = P // 12
+    Resto_SYS = P % 12
+    corta = T <= 180
+    media = (180 < T) & (T < 500)
+    larga = T >= 500
+    sumar(17, corta, 2 * Bloques_SYS)
+    sumar(16, media, 3 * Bloques_SYS)
+    sumar(16, larga, 2 * Bloques_SYS)
+    sumar(17, larga, 1 * Bloques_SYS)
+
+    r = en_rango(Resto_SYS, 1, 4)
+    sumar(16, r & corta); sumar(17, r & media); sumar(17, r & larga); sumar(16, r & larga)
+    r = en_rango(Resto_SYS, 5, 6)
+    sumar(16, r & corta); sumar(16, r & media, 2); sumar(16, r & larga); sumar(17, r & larga)
+    r = en_rango(Resto_SYS, 7, 8)
+    sumar(17, r & corta); sumar(16, r & media, 2); sumar(16, r & larga); sumar(17, r & larga)
+    r = en_rango(Resto_SYS, 9, 10)
+    sumar(16, r & corta); sumar(17, r & corta); sumar(16, r & media, 3); sumar(16, r & larga, 2); sumar(17, r & larga)
+    r = en_rango(Resto_SYS, 11, 12)
+    sumar(17, r & corta, 2); sumar(16, r & media, 3); sumar(16, r & larga, 2); sumar(17, r & larga)
+
+    # 11. Módulos STORAGE (018 y 019)
+    # Mismo orden de operaciones en coma flotante que la versión escalar
+    T_storage = np.minimum(T, 365)
+    pt_product = 0.012 * P * T_storage
+    resto_pt = np.remainder(pt_product, 11.9)
+    m[:, 19] = np.floor(pt_product / 11.9).astype(np.int64)
+    sumar(19, resto_pt > 8.1)
+    m[:, 18] = np.where((resto_pt <= 8.1) & (resto_pt != 0), 1, 0)
+
+    # 12. Módulos COMPUTER (020 y 021)
+    Bloques_C = P // 16
+    Resto_C = P % 16
+    corta = T <= 180
+    sumar(20, corta, 2 * Bloques_C)
+    sumar(21, ~corta, 2 * Bloques_C)
+
+    r = en_rango(Resto_C, 1, 8)
+    sumar(20, r & corta); sumar(21, r & ~corta)
+    r = en_rango(Resto_C, 9, 12)
+    sumar(21, r)
+    r = en_rango(Resto_C, 13, 16)
+    sumar(20, r & corta, 2); sumar(21, r & ~corta, 2)
+
+    # 13. Módulos MEALPREP (022 y 023)
+    comidas = -(-P // 8)  # ceil(P / 8)
+    m[:, 22] = np.where(T <= 180, comidas, np.where(T >= 500, comidas + 1, 0))
+    m[:, 23] = np.where((180 < T) & (T < 500), comidas, 0)
+
+    # 14. Módulos MEDICAL (024 y 025)
+    Bloques_M = P // 12
+    Resto_M = P % 12
+    corta = T <= 180
+    sumar(25, corta, 2 * Bloques_M)
+    sumar(24, ~corta, 2 * Bloques_M)
+
+    r = en_rango(Resto_M, 1, 4)
+    sumar(24, r & corta); sumar(25, r & ~corta)
+    r = en_rango(Resto_M, 5, 6)
+    sumar(24, r & (T <= 60)); sumar(25, r & (60 < T) & (T < 500)); sumar(24, r & (T >= 500), 2)
+    r = en_rango(Resto_M, 7, 8)
+    sumar(25, r & corta); sumar(25, r & (180 < T) & (T < 500), 2)
+    sumar(24, r & (T >= 500)); sumar(25, r & (T >= 500))
+    r = en_rango(Resto_M, 9, 12)
+    sumar(25, r & corta, 2); sumar(24, r & ~corta, 2)
+
+    # 15. Módulos SLEEP (026 y 027)
+    Bloques_SLP = P // 4
+    Resto_SLP = P % 4
+    sumar(27, True, Bloques_SLP)
+    sumar(26, (Resto_SLP == 1) | (Resto_SLP == 2))
+    sumar(27, (Resto_SLP == 3) | (Resto_SLP == 4))
+
+    modulos = m[:, 1:]
+    total_modulos = modulos.sum(axis=1)
+
+    # Totales con módulos estructurales (mismas reglas que calcular_total_minimo)
+    total_minimo = total_modulos + np.where(T <= 600, 1, 2) * -(-P // 6)  # 7. ACCESS (010)
+    total_minimo += -(-total_minimo // 16)      # 1. BASE (001)
+    total_minimo += -(-total_minimo // 16)      # 3. POWERCORE (004)
+    total_minimo += -(-total_minimo // 16) - 1  # 6. CIRCULACION (009)
+    total_minimo += -(-total_minimo // 4)       # 8. TRANSCORE (011)
+
+    return modulos, total_modulos, total_minimo
 
 # --- EJEMPLO DE USO ---
 if __name__ == "__main__":
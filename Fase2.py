@@ -28,13 +28,13 @@ AUTOR: Sistema de Gestión de Módulos ARKHA
 VERSIÓN: 2.0
 """
 
+import logging
+
 import Fase1
-from typing import List, Tuple, Dict, Optional
+from math import isqrt
+from typing import Iterator, List, Tuple, Dict, Optional
 
-# =============================================================================
-# CONTADOR GLOBAL DE ARKAS
-# =============================================================================
-contador_arkas = 0
+logger = logging.getLogger(__name__)
 
 '''
 MODULOS_INFO = {
@@ -342,6 +342,87 @@ pisos_arka = {
     "0":4,
 }
 
+# Módulos sanitarios: solo pueden ir en piso 1+ sobre otro sanitario
+MODULOS_SANITARIOS = frozenset(("012", "013"))
+
+# =============================================================================
+# REGLAS COMPILADAS
+# =============================================================================
+# Las listas de arriba son la fuente editable de las reglas. Para el bucle de
+# colocación se compilan en estructuras de consulta O(1):
+# - restricciones: frozenset de pares (módulo, vecino)
+# - prioridades: diccionario (módulo, vecino) → puntos, que ya suma los +10 de
+#   (módulo, vecino) y los +10 de (vecino, módulo)
+
+def compilar_restricciones(restricciones: List[Tuple[str, str]]) -> frozenset:
+    """Convierte la lista de restricciones en un frozenset de pares prohibidos"""
+    return frozenset(restricciones)
+
+def compilar_prioridades(prioridades_colocacion: List[Tuple[str, str]]) -> Dict[Tuple[str, str], int]:
+    """
+    Convierte la lista de prioridades en un diccionario de puntos por par
+    
+    Returns:
+        Dict: (módulo, vecino) → puntos de prioridad (10 o 20); los pares sin
+              prioridad no aparecen
+    """
+    pares = frozenset(prioridades_colocacion)
+    puntos = {}
+    for origen, destino in pares:
+        puntos[(origen, destino)] = puntos.get((origen, destino), 0) + 10
+        if origen != destino:
+            puntos[(destino, origen)] = puntos.get((destino, origen), 0) + 10
+        else:
+            puntos[(origen, destino)] += 10  # Auto-preferencia: cuenta en ambos sentidos
+    return puntos
+
+RESTRICCIONES_COMPILADAS = compilar_restricciones(restricciones_prohibidas)
+PUNTOS_PRIORIDAD = compilar_prioridades(prioridades)
+
+# Para la representación compacta (ver ArkaCompacta) los módulos se numeran
+# 1..27 y el 0 es el hueco vacío. Las reglas se compilan además a tablas
+# indexadas por código:
+# - BITS_PROHIBIDOS[módulo]: bit `vecino` a 1 si (módulo, vecino) está prohibido
+# - TABLA_PUNTOS[módulo][vecino]: puntos de prioridad del par
+# - BITS_PISOS_PRIORITARIOS[módulo]: bit `piso` a 1 si el piso es preferido
+
+MODULO_DE_CODIGO = (None,) + tuple(f"{numero:03d}" for numero in range(1, 28))
+CODIGO_DE_MODULO = {modulo: codigo for codigo, modulo in enumerate(MODULO_DE_CODIGO) if modulo}
+NUM_CODIGOS = len(MODULO_DE_CODIGO)
+
+CODIGOS_SANITARIOS = tuple(sorted(CODIGO_DE_MODULO[modulo] for modulo in MODULOS_SANITARIOS))
+BITS_SANITARIOS = sum(1 << codigo for codigo in CODIGOS_SANITARIOS)
+
+def compilar_bits_prohibidos(prohibidas: frozenset) -> List[int]:
+    """Pares prohibidos → máscara de vecinos prohibidos por código de módulo"""
+    bits = [0] * NUM_CODIGOS
+    for modulo, vecino in prohibidas:
+        if modulo in CODIGO_DE_MODULO and vecino in CODIGO_DE_MODULO:
+            bits[CODIGO_DE_MODULO[modulo]] |= 1 << CODIGO_DE_MODULO[vecino]
+    return bits
+
+def compilar_tabla_puntos(puntos: Dict[Tuple[str, str], int]) -> List[List[int]]:
+    """Puntos por par → tabla [módulo][vecino] de puntos por código"""
+    tabla = [[0] * NUM_CODIGOS for _ in range(NUM_CODIGOS)]
+    for (modulo, vecino), valor in puntos.items():
+        if modulo in CODIGO_DE_MODULO and vecino in CODIGO_DE_MODULO:
+            tabla[CODIGO_DE_MODULO[modulo]][CODIGO_DE_MODULO[vecino]] = valor
+    return tabla
+
+def compilar_bits_pisos(pisos_preferidos: Dict[str, List[int]]) -> List[int]:
+    """Pisos prioritarios → máscara de pisos preferidos por código de módulo"""
+    bits = [0] * NUM_CODIGOS
+    for modulo, pisos in pisos_preferidos.items():
+        if modulo in CODIGO_DE_MODULO:
+            for piso in pisos:
+                if piso >= 0:
+                    bits[CODIGO_DE_MODULO[modulo]] |= 1 << piso
+    return bits
+
+BITS_PROHIBIDOS = compilar_bits_prohibidos(RESTRICCIONES_COMPILADAS)
+TABLA_PUNTOS = compilar_tabla_puntos(PUNTOS_PRIORIDAD)
+BITS_PISOS_PRIORITARIOS = compilar_bits_pisos(pisos_prioritarios)
+
 # =============================================================================
 # FUNCIONES PRINCIPALES DEL ALGORITMO
 # =============================================================================
@@ -361,23 +442,20 @@ Piso 3: [Cara A] [Cara B] [Cara C] [Cara D]
 """
 
 
-def nueva_arka():
+def nueva_arka(numero_arka: int) -> Dict:
     """
     Crea una nueva arka vacía (4x4) con número de arka y módulos de conexión reservados
     
     Estructura: 4 pisos x 4 caras por piso
     Reserva módulos 009 según la dirección actual y anterior
-    Incrementa el contador global de arkas ANTES de asignar el número
+    El número lo asigna quien la crea (ver ContextoColocacion.nueva_arka)
+    
+    Args:
+        numero_arka: Número de la arka (1, 2, 3, ...)
     
     Returns:
         Dict: Diccionario con la arka y su número
     """
-    global contador_arkas
-    
-    # Incrementar contador ANTES de asignar el número
-    contador_arkas += 1
-    numero_arka = contador_arkas
-    
     pisos = pisos_arka[str(numero_arka%5)]
     # Obtener direcciones
     direccion_actual = direccion(numero_arka)
@@ -431,300 +509,129 @@ def cleaning_postresultado(arkas_resultado):
         List[Dict]: Lista de arkas con limpieza aplicada
     """
     if not arkas_resultado:
-        print("No hay arkas en el resultado")
+        logger.warning("No hay arkas en el resultado")
         return None
     
     # PASO 1: Limpiar conexiones de la última arka
-    ultima_arka = arkas_resultado[-1]
-    direccion_actual = ultima_arka["direccion_actual"]
-
-    if direccion_actual == "ARRIBA":
-        ultima_arka["matriz"][1][2] = None
-    if direccion_actual == "IZQ":
-        ultima_arka["matriz"][1][3] = None
-    if direccion_actual == "ABAJO":
-        ultima_arka["matriz"][1][0] = None
-    if direccion_actual == "DER":
-        ultima_arka["matriz"][1][1] = None
-
-    arkas_resultado[-1] = ultima_arka
+    quitar_conexion_final(arkas_resultado[-1])
     
     # PASO 2: Barrida general - reemplazar todos los None con módulo 006 (recreación)
-    print("=== APLICANDO LIMPIEZA GENERAL ===")
     espacios_rellenados = 0
     
     for arka_data in arkas_resultado:
-        matriz = arka_data["matriz"]
-        for piso in range(arka_data["pisos"]):
-            for cara in range(4):
-                if matriz[piso][cara] is None:
-                    matriz[piso][cara] = "006"  # Módulo de recreación
-                    espacios_rellenados += 1
-                    print(f"Arka {arka_data['numero']}, Piso {piso+1}, Cara {cara+1}: Rellenado con módulo 006")
+        for piso, cara in rellenar_huecos(arka_data):
+            espacios_rellenados += 1
+            logger.debug("Arka %d, Piso %d, Cara %d: Rellenado con módulo 006", arka_data["numero"], piso + 1, cara + 1)
     
-    print(f"Total de espacios rellenados con módulo 006: {espacios_rellenados}")
-    print("=== LIMPIEZA COMPLETADA ===")
+    logger.debug("Limpieza completada: %d espacios rellenados con módulo 006", espacios_rellenados)
     
     return arkas_resultado
 
-def direccion(n):
-    if n < 1:
-        raise ValueError("n debe ser >= 1")
+def quitar_conexion_final(arka_data: Dict):
+    """Vacía el hueco 009 reservado hacia la siguiente arka (la última no tiene siguiente)"""
+    direccion_actual = arka_data["direccion_actual"]
 
-    direcciones = ["ARRIBA", "IZQ", "ABAJO", "DER"]  # orden cíclico
-    pasos = 1
-    actual = 1
-    dir_index = 0
+    if direccion_actual == "ARRIBA":
+        arka_data["matriz"][1][2] = None
+    if direccion_actual == "IZQ":
+        arka_data["matriz"][1][3] = None
+    if direccion_actual == "ABAJO":
+        arka_data["matriz"][1][0] = None
+    if direccion_actual == "DER":
+        arka_data["matriz"][1][1] = None
 
-    while True:
-        for _ in range(2):  # dos veces cada longitud
-            for _ in range(pasos):
-                if actual == n:
-                    return direcciones[dir_index]
-                actual += 1
-            dir_index = (dir_index + 1) % 4
-        pasos += 1
-        
-def es_valida(arka_data, piso: int, cara: int, modulo_id: str) -> bool:
+def rellenar_huecos(arka_data: Dict) -> List[Tuple[int, int]]:
     """
-    Verifica si es válido colocar un módulo en una posición específica
-    
-    Esta función es CRÍTICA porque verifica:
-    1. Que la posición esté vacía
-    2. Que no viole ninguna restricción con módulos horizontalmente adyacentes
-    3. Regla especial para módulos sanitarios: solo pueden estar en piso 1+ si hay otro sanitario debajo
-    
-    IMPORTANTE: Solo verifica restricciones con módulos de IZQUIERDA y DERECHA
-    - Cara 0 y Cara 3 son adyacentes entre sí (como un cilindro)
-    - Módulos sanitarios (012, 013) requieren otro sanitario debajo si están en piso 1+
-    
-    Args:
-        arka_data: Datos de la arka (puede ser matriz o diccionario)
-        piso: Piso donde queremos colocar (0-3)
-        cara: Cara donde queremos colocar (0-3)
-        modulo_id: ID del módulo que queremos colocar
+    Rellena los huecos vacíos de una arka con el módulo 006 (recreación)
     
     Returns:
-        bool: True si es válido colocar, False si no
+        List[Tuple[int, int]]: (piso, cara) de cada hueco rellenado
     """
-    # Obtener la matriz de la arka
-    if isinstance(arka_data, dict):
-        arka = arka_data["matriz"]
-    else:
-        arka = arka_data
-    
-    # PASO 1: Verificar que la posición esté vacía
-    if arka[piso][cara] is not None:
-        return False
-    
-    # PASO 2: Verificar restricciones SOLO con módulos horizontalmente adyacentes
-    # Solo verificamos izquierda y derecha (no arriba, abajo, ni diagonales)
-    
-    # Módulo de la IZQUIERDA
-    cara_izquierda = (cara - 1) % 4  # Cara 0 y 3 son adyacentes
-    modulo_izquierda = arka[piso][cara_izquierda]
-    if modulo_izquierda is not None:
-        # Verificar restricciones con el módulo de la izquierda
-        # Solo verificamos la dirección específica definida en la lista
-        if (modulo_id, modulo_izquierda) in restricciones_prohibidas:
-            return False
-    
-    # Módulo de la DERECHA
-    cara_derecha = (cara + 1) % 4  # Cara 3 y 0 son adyacentes
-    modulo_derecha = arka[piso][cara_derecha]
-    if modulo_derecha is not None:
-        # Verificar restricciones con el módulo de la derecha
-        # Solo verificamos la dirección específica definida en la lista
-        if (modulo_id, modulo_derecha) in restricciones_prohibidas:
-            return False
-    
-    # PASO 3: Regla especial para módulos sanitarios
-    # Los módulos sanitarios (012, 013) solo pueden estar en piso 1 o superior
-    # si hay otro módulo sanitario justo debajo
-    if modulo_id in ["012", "013"]:  # Módulos sanitarios
-        if piso > 0:  # Si no está en el piso 0 (piso 1)
-            # Verificar si hay un módulo sanitario justo debajo
-            modulo_debajo = arka[piso - 1][cara]
-            if modulo_debajo not in ["012", "013"]:  # Si no hay sanitario debajo
-                return False
-    
-    return True  # Si llegamos aquí, es válido colocar el módulo
+    rellenados = []
+    matriz = arka_data["matriz"]
+    for piso in range(arka_data["pisos"]):
+        for cara in range(4):
+            if matriz[piso][cara] is None:
+                matriz[piso][cara] = "006"  # Módulo de recreación
+                rellenados.append((piso, cara))
+    return rellenados
 
-def calcular_score(arka_data, piso: int, cara: int, modulo_id: str) -> int:
+# =============================================================================
+# ESPIRAL DE ARKAS
+# =============================================================================
+# Las arkas se encadenan en una espiral cuadrada: ARRIBA, IZQ, ABAJO, DER con
+# tramos de longitud 1, 1, 2, 2, 3, 3, ... (el tramo k mide k//2 + 1).
+# Los pasos acumulados al empezar el tramo k son m(m+1) si k = 2m y (m+1)^2
+# si k = 2m + 1, lo que permite localizar cualquier arka en O(1).
+
+DIRECCIONES = ("ARRIBA", "IZQ", "ABAJO", "DER")  # orden cíclico
+
+# Desplazamiento (x, z) en la rejilla al avanzar en cada dirección (ver Fase3)
+DESPLAZAMIENTOS = {
+    "ARRIBA": (0, 1),
+    "IZQ": (1, 0),
+    "ABAJO": (0, -1),
+    "DER": (-1, 0),
+}
+
+def _tramo_espiral(pasos: int) -> Tuple[int, int]:
     """
-    Calcula el score de una posición para un módulo específico
-    
-    Esta función es el CORAZÓN del algoritmo de optimización.
-    Evalúa qué tan "buena" es una posición para colocar un módulo.
-    
-    Sistema de puntuación:
-    - +10 puntos por cada prioridad satisfecha con módulos horizontalmente adyacentes
-    - +15 puntos por estar en piso prioritario (si está definido)
-    - -5 puntos por cada piso inferior incompleto (incentiva completar de abajo hacia arriba)
-    - +1 punto por cada espacio horizontalmente adyacente vacío (flexibilidad futura)
-    
-    IMPORTANTE: Solo considera módulos de IZQUIERDA y DERECHA
-    - Cara 0 y Cara 3 son adyacentes entre sí (como un cilindro)
-    
-    Args:
-        arka_data: Datos de la arka (puede ser matriz o diccionario)
-        piso: Piso a evaluar (0-3)
-        cara: Cara a evaluar (0-3)
-        modulo_id: ID del módulo que queremos colocar
+    Localiza el tramo de la espiral que contiene el paso número `pasos` (base 0)
     
     Returns:
-        int: Score de la posición (mayor = mejor)
+        Tuple[int, int]: (tramo k, pasos acumulados al empezar el tramo k)
     """
-    # Obtener la matriz de la arka
-    if isinstance(arka_data, dict):
-        arka = arka_data["matriz"]
-    else:
-        arka = arka_data
-    
-    score = 0
-    
-    # PASO 1: Verificar prioridades SOLO con módulos horizontalmente adyacentes
-    
-    # Módulo de la IZQUIERDA
-    cara_izquierda = (cara - 1) % 4  # Cara 0 y 3 son adyacentes
-    modulo_izquierda = arka[piso][cara_izquierda]
-    if modulo_izquierda is not None:
-        # Verificar prioridades con el módulo de la izquierda
-        if (modulo_id, modulo_izquierda) in prioridades:
-            score += 10  # +10 puntos por prioridad satisfecha
-        if (modulo_izquierda, modulo_id) in prioridades:
-            score += 10  # +10 puntos por prioridad bidireccional
-    
-    # Módulo de la DERECHA
-    cara_derecha = (cara + 1) % 4  # Cara 3 y 0 son adyacentes
-    modulo_derecha = arka[piso][cara_derecha]
-    if modulo_derecha is not None:
-        # Verificar prioridades con el módulo de la derecha
-        if (modulo_id, modulo_derecha) in prioridades:
-            score += 10  # +10 puntos por prioridad satisfecha
-        if (modulo_derecha, modulo_id) in prioridades:
-            score += 10  # +10 puntos por prioridad bidireccional
-    
-    # PASO 2: Bonus por piso prioritario
-    # Verificar si el módulo tiene preferencias de piso definidas
-    if modulo_id in pisos_prioritarios:
-        pisos_preferidos = pisos_prioritarios[modulo_id]
-        if piso in pisos_preferidos:
-            score += 15  # +15 puntos por estar en piso prioritario
-    
-    # PASO 3: Bonus por completar pisos de abajo hacia arriba
-    # Verificar si hay pisos inferiores incompletos
-    pisos_inferiores_incompletos = 0
-    for piso_inferior in range(piso):
-        # Contar espacios vacíos en el piso inferior
-        espacios_vacios_piso = sum(1 for cara in range(4) if arka[piso_inferior][cara] is None)
-        if espacios_vacios_piso > 0:
-            pisos_inferiores_incompletos += 1
-    
-    # Penalizar si hay pisos inferiores incompletos
-    if pisos_inferiores_incompletos > 0:
-        score -= pisos_inferiores_incompletos * 5  # -5 puntos por cada piso inferior incompleto
-    
-    # PASO 4:  Bonus por flexibilidad futura
-    # Contamos espacios horizontalmente adyacentes vacíos
-    espacios_vacios = 0
-    
-    # Espacio de la izquierda
-    if arka[piso][cara_izquierda] is None:
-        espacios_vacios += 1
-    
-    # Espacio de la derecha
-    if arka[piso][cara_derecha] is None:
-        espacios_vacios += 1
-    
-    score += espacios_vacios  # +1 punto por cada espacio horizontalmente adyacente vacío
-    
-    return score
+    r = isqrt(pasos)
+    if pasos >= r * (r + 1):
+        return 2 * r, r * (r + 1)
+    return 2 * r - 1, r * r
 
-def encontrar_mejor_posicion(arka_data, modulo_id: str) -> Tuple[int, int, int]:
+def direccion(n: int) -> str:
     """
-    Encuentra la mejor posición para un módulo en una arka
-    
-    Esta función busca en TODAS las posiciones de la arka y encuentra
-    la que tenga el mayor score (mejor optimización).
-    
-    Proceso:
-    1. Recorre todas las posiciones (4x4 = 16 posiciones)
-    2. Para cada posición válida, calcula su score
-    3. Guarda la posición con el mayor score
+    Dirección en la que la arka n conecta con la arka n+1
     
     Args:
-        arka_data: Datos de la arka (puede ser matriz o diccionario)
-        modulo_id: ID del módulo que queremos colocar
+        n: Número de arka (>= 1)
     
     Returns:
-        Tuple[int, int, int]: (piso, cara, score) de la mejor posición
-        None si no hay posiciones válidas
+        str: "ARRIBA", "IZQ", "ABAJO" o "DER"
     """
-    # Obtener la matriz de la arka
-    if isinstance(arka_data, dict):
-        arka = arka_data["matriz"]
-    else:
-        arka = arka_data
-    
-    mejor_score = -1  # Inicializamos con un score muy bajo
-    mejor_posicion = None
-    
-    # Recorremos TODAS las posiciones de la arka (4x4)
-    for piso in range(arka_data["pisos"]):
-        for cara in range(4):
-            # Solo evaluamos posiciones válidas (que cumplan restricciones)
-            if es_valida(arka_data, piso, cara, modulo_id):
-                # Calculamos el score de esta posición
-                score = calcular_score(arka_data, piso, cara, modulo_id)
-                
-                # Si este score es mejor que el anterior, lo guardamos
-                if score > mejor_score:
-                    mejor_score = score
-                    mejor_posicion = (piso, cara, score)
-    
-    return mejor_posicion  # Retornamos la mejor posición encontrada
+    if n < 1:
+        raise ValueError("n debe ser >= 1")
+    tramo, _ = _tramo_espiral(n - 1)
+    return DIRECCIONES[tramo % 4]
 
-def agregar_modulo(arkas: List[Dict], modulo_id: str) -> bool:
+def coordenada_arka(n: int) -> Tuple[int, int]:
     """
-    Intenta agregar un módulo a las arkas existentes o crear una nueva
+    Posición (x, z) de la arka n en la rejilla de la espiral
     
-    Esta es la función PRINCIPAL de colocación. Sigue esta estrategia:
-    1. Primero intenta colocar en arkas existentes (optimiza espacio)
-    2. Si no puede, crea una nueva arka
-    3. Usa el sistema de scoring para encontrar la mejor posición
+    La arka 1 está en (0, 0). Cada ciclo completo de cuatro tramos desplaza
+    el recorrido (-1, -1), así que la posición sale directamente del número
+    de ciclos completos, los tramos ya recorridos del ciclo actual y los
+    pasos dentro del tramo actual.
     
     Args:
-        arkas: Lista de todas las arkas disponibles
-        modulo_id: ID del módulo que queremos colocar
+        n: Número de arka (>= 1)
     
     Returns:
-        bool: True si se colocó exitosamente, False si no se pudo colocar
+        Tuple[int, int]: (x, z) en unidades de rejilla
     """
-    # ESTRATEGIA 1: Intentar colocar en alguna arka existente
-    # Esto optimiza el uso del espacio (menos arkas = mejor eficiencia)
-    for i, arka_data in enumerate(arkas):
-        posicion = encontrar_mejor_posicion(arka_data, modulo_id)
-        
-        if posicion is not None:  # Si encontramos una posición válida
-            piso, cara, score = posicion
-            arka_data["matriz"][piso][cara] = modulo_id  # Colocamos el módulo
-            print(f"Módulo {modulo_id} colocado en Arka {arka_data['numero']}, Piso {piso+1}, Cara {cara+1} (Score: {score})")
-            return True  # Éxito: módulo colocado
-    
-    # ESTRATEGIA 2: Si no se pudo colocar en arkas existentes, crear nueva arka
-    # Esto garantiza que siempre podamos colocar el módulo
-    nueva_arka_data = nueva_arka()  # Creamos arka vacía
-    posicion = encontrar_mejor_posicion(nueva_arka_data, modulo_id)
-    
-    if posicion is not None:  # Debería ser siempre válido en arka vacía
-        piso, cara, score = posicion
-        nueva_arka_data["matriz"][piso][cara] = modulo_id  # Colocamos el módulo
-        arkas.append(nueva_arka_data)  # Añadimos la nueva arka a la lista
-        print(f"Módulo {modulo_id} colocado en NUEVA Arka {nueva_arka_data['numero']}, Piso {piso+1}, Cara {cara+1} (Score: {score})")
-        return True  # Éxito: módulo colocado en nueva arka
-    
-    return False  # Error: no se pudo colocar (no debería pasar nunca)
+    if n < 1:
+        raise ValueError("n debe ser >= 1")
+    pasos = n - 1
+    tramo, inicio = _tramo_espiral(pasos)
+    ciclos, resto = divmod(tramo, 4)
+    largo = 2 * ciclos + 1  # Longitud de los dos primeros tramos del ciclo
+    x = z = -ciclos
+    if resto >= 1:
+        z += largo           # Tramo ARRIBA completo
+    if resto >= 2:
+        x += largo           # Tramo IZQ completo
+    if resto >= 3:
+        z -= largo + 1       # Tramo ABAJO completo
+    dx, dz = DESPLAZAMIENTOS[DIRECCIONES[resto]]
+    avance = pasos - inicio
+    return x + dx * avance, z + dz * avance
 
 def ordenar_modulos_por_prioridad(inventario: Dict[str, int]) -> List[Tuple[str, int]]:
     """
@@ -766,47 +673,568 @@ def ordenar_modulos_por_prioridad(inventario: Dict[str, int]) -> List[Tuple[str,
     
     return ordenados
 
-def colocar_inventario_completo(inventario: Dict[str, int]) -> List[Dict]:
+# =============================================================================
+# REPRESENTACIÓN COMPACTA DE ARKAS
+# =============================================================================
+# Durante la colocación cada arka es un ArkaCompacta:
+# - codigos: bytearray de pisos*4 con el código entero de cada hueco
+#   (índice piso*4 + cara, 0 = vacío, ver CODIGO_DE_MODULO)
+# - libres: máscara de bits de los huecos vacíos (bit piso*4 + cara)
+# - incompletos: máscara de bits de los pisos con algún hueco vacío (bit piso)
+# Una arka llena tiene libres == 0 y se descarta sin mirar sus huecos.
+# El formato de diccionario ({"numero", "matriz", ...}) solo se genera al
+# entregar el resultado a Fase3 (ver colocar_inventario_completo).
+
+class ArkaCompacta:
+    """Arka en colocación: códigos de módulo enteros y máscaras de huecos libres"""
+
+    __slots__ = ("numero", "pisos", "direccion_actual", "direccion_anterior",
+                 "codigos", "libres", "incompletos")
+
+    def __init__(self, numero: int, pisos: int, direccion_actual: str,
+                 direccion_anterior: Optional[str], codigos: bytearray):
+        self.numero = numero
+        self.pisos = pisos
+        self.direccion_actual = direccion_actual
+        self.direccion_anterior = direccion_anterior
+        self.codigos = codigos
+        self.libres = 0
+        self.incompletos = 0
+        for indice, codigo in enumerate(codigos):
+            if codigo == 0:
+                self.libres |= 1 << indice
+                self.incompletos |= 1 << (indice >> 2)
+
+    def colocar(self, piso: int, cara: int, codigo: int):
+        """Ocupa un hueco y actualiza las máscaras"""
+        indice = piso * 4 + cara
+        self.codigos[indice] = codigo
+        self.libres &= ~(1 << indice)
+        if not (self.libres >> (piso * 4)) & 0xF:
+            self.incompletos &= ~(1 << piso)
+
+    def a_matriz(self) -> List[List[Optional[str]]]:
+        """Matriz [piso][cara] con IDs de módulo (None = vacío)"""
+        return [[MODULO_DE_CODIGO[codigo] for codigo in self.codigos[piso * 4:piso * 4 + 4]]
+                for piso in range(self.pisos)]
+
+    def a_diccionario(self) -> Dict:
+        """Arka en el formato de diccionario de nueva_arka (el que consume Fase3)"""
+        return {
+            "numero": self.numero,
+            "matriz": self.a_matriz(),
+            "direccion_actual": self.direccion_actual,
+            "direccion_anterior": self.direccion_anterior,
+            "pisos": self.pisos
+        }
+
+def compactar(arka_data) -> ArkaCompacta:
     """
-    Coloca todo el inventario en las arkas
-    
-    Esta es la función COORDINADORA que ejecuta todo el algoritmo:
-    1. Ordena los módulos por prioridad
-    2. Coloca cada módulo usando el sistema de scoring
-    3. Maneja errores y proporciona feedback
+    Convierte una arka (diccionario o matriz) a ArkaCompacta
     
-    Args:
-        inventario: Diccionario con todos los módulos y sus cantidades
-    
-    Returns:
-        List[List[List]]: Lista de arkas con todos los módulos colocados
+    Una ArkaCompacta se devuelve tal cual. Una matriz suelta se convierte con
+    número 0 y sin direcciones.
     """
-    # REINICIAR CONTADOR GLOBAL para cada ejecución
-    global contador_arkas
-    contador_arkas = 0
-    
-    arkas = []  # Lista vacía de arkas (empezamos sin ninguna)
-    modulos_ordenados = ordenar_modulos_por_prioridad(inventario)  # Ordenamos por prioridad
-    
-    print("=== INICIANDO COLOCACIÓN DE MÓDULOS ===")
-    print(f"Total de módulos a colocar: {sum(inventario.values())}")
-    print(f"Arkas iniciales: {len(arkas)}")
-    print()
-    
-    # BUCLE PRINCIPAL: Colocamos cada tipo de módulo
-    for modulo_id, cantidad in modulos_ordenados:
-        print(f"Colocando {cantidad} módulo(s) de tipo {modulo_id}...")
+    if isinstance(arka_data, ArkaCompacta):
+        return arka_data
+    if isinstance(arka_data, dict):
+        matriz = arka_data["matriz"]
+        numero = arka_data["numero"]
+        direccion_actual = arka_data["direccion_actual"]
+        direccion_anterior = arka_data["direccion_anterior"]
+    else:
+        matriz = arka_data
+        numero, direccion_actual, direccion_anterior = 0, None, None
+    codigos = bytearray(0 if modulo is None else CODIGO_DE_MODULO[modulo]
+                        for fila in matriz for modulo in fila)
+    return ArkaCompacta(numero, len(matriz), direccion_actual, direccion_anterior, codigos)
+
+def penalizacion_pisos(arka: ArkaCompacta, piso: int) -> int:
+    """-5 puntos por cada piso inferior a `piso` con algún hueco vacío (paso 3 del score)"""
+    return (arka.incompletos & ((1 << piso) - 1)).bit_count() * 5
+
+# Marca de hueco no válido en la cache de scores (None = sin calcular)
+NO_VALIDA = object()
+
+# =============================================================================
+# CONTEXTO DE COLOCACIÓN (ESTADO POR EJECUCIÓN)
+# =============================================================================
+
+class ContextoColocacion:
+    """
+    Motor de colocación con todo el estado de UNA ejecución
+    
+    Cada contexto tiene su propio contador de arkas, su lista de arkas y sus
+    tablas de reglas, de modo que varias colocaciones pueden ejecutarse en
+    paralelo (en hilos distintos del mismo proceso) sin locks ni estado global.
+    
+    Las tablas por defecto son las definidas en este módulo; se copian al
+    crear el contexto para que una ejecución no pueda alterar a otra. Las
+    reglas se usan compiladas (ver REGLAS COMPILADAS): con las tablas por
+    defecto se reutilizan las compiladas al importar el módulo.
+    
+    Las arkas del contexto son ArkaCompacta; colocar_inventario_completo
+    devuelve diccionarios.
+    
+    CACHE DE SCORES:
+    Con cache_scores=True el contexto guarda, por arka y tipo de módulo, la
+    validez y la parte del score de cada hueco que depende de sus vecinos
+    (pasos 1, 2 y 4 de calcular_score). Colocar un módulo en (piso, cara) solo
+    cambia esa parte en sus dos vecinos horizontales y en el hueco de encima
+    (regla sanitaria), que son los únicos que se invalidan. La penalización
+    por pisos inferiores incompletos se calcula siempre con la máscara.
+    evaluaciones_score cuenta los huecos evaluados desde cero y
+    huecos_evaluados todos los huecos consultados; modulos_colocados cuenta
+    los módulos colocados (los tres se acumulan durante la vida del contexto).
+    
+    Uso:
+        arkas = ContextoColocacion().colocar_inventario_completo(inventario)
+    """
+
+    def __init__(self,
+                 restricciones: Optional[List[Tuple[str, str]]] = None,
+                 prioridades_colocacion: Optional[List[Tuple[str, str]]] = None,
+                 pisos_preferidos: Optional[Dict[str, List[int]]] = None,
+                 cache_scores: bool = True):
+        self.contador_arkas = 0
+        self.arkas: List[ArkaCompacta] = []
+        self.restricciones_prohibidas = list(restricciones_prohibidas if restricciones is None else restricciones)
+        self.prioridades = list(prioridades if prioridades_colocacion is None else prioridades_colocacion)
+        self.pisos_prioritarios = dict(pisos_prioritarios if pisos_preferidos is None else pisos_preferidos)
+        self._bits_prohibidos = BITS_PROHIBIDOS if restricciones is None else compilar_bits_prohibidos(
+            compilar_restricciones(self.restricciones_prohibidas))
+        self._puntos_prioridad = TABLA_PUNTOS if prioridades_colocacion is None else compilar_tabla_puntos(
+            compilar_prioridades(self.prioridades))
+        self._bits_pisos = BITS_PISOS_PRIORITARIOS if pisos_preferidos is None else compilar_bits_pisos(
+            self.pisos_prioritarios)
+
+        # Primera arka que aún puede admitir cada código de módulo (ver agregar_modulo)
+        self._primera_candidata: Dict[int, int] = {}
+
+        # Cache de scores, paralela a self.arkas: código → score parcial por hueco
+        self.cache_scores = cache_scores
+        self._scores: List[Dict[int, List]] = []
+        self.evaluaciones_score = 0
+        self.huecos_evaluados = 0
+        self.modulos_colocados = 0
+
+    def nueva_arka(self) -> ArkaCompacta:
+        """
+        Crea la siguiente arka del contexto
+        
+        Incrementa el contador del contexto ANTES de asignar el número
+        
+        Returns:
+            ArkaCompacta: Arka vacía con sus conexiones 009 reservadas
+        """
+        self.contador_arkas += 1
+        return compactar(nueva_arka(self.contador_arkas))
+
+    def es_valida(self, arka_data, piso: int, cara: int, modulo_id) -> bool:
+        """
+        Verifica si es válido colocar un módulo en una posición específica
+        
+        Esta función es CRÍTICA porque verifica:
+        1. Que la posición esté vacía
+        2. Que no viole ninguna restricción con módulos horizontalmente adyacentes
+        3. Regla especial para módulos sanitarios: solo pueden estar en piso 1+ si hay otro sanitario debajo
+        
+        IMPORTANTE: Solo verifica restricciones con módulos de IZQUIERDA y DERECHA
+        - Cara 0 y Cara 3 son adyacentes entre sí (como un cilindro)
+        - Módulos sanitarios (012, 013) requieren otro sanitario debajo si están en piso 1+
+        
+        Args:
+            arka_data: Arka (ArkaCompacta, diccionario o matriz)
+            piso: Piso donde queremos colocar (0-3)
+            cara: Cara donde queremos colocar (0-3)
+            modulo_id: ID del módulo que queremos colocar (o su código entero)
+        
+        Returns:
+            bool: True si es válido colocar, False si no
+        """
+        arka = arka_data if type(arka_data) is ArkaCompacta else compactar(arka_data)
+        codigo = modulo_id if type(modulo_id) is int else CODIGO_DE_MODULO[modulo_id]
+        indice = piso * 4 + cara
+        
+        # PASO 1: Verificar que la posición esté vacía
+        if not (arka.libres >> indice) & 1:
+            return False
+        
+        # PASO 2: Verificar restricciones SOLO con módulos horizontalmente adyacentes
+        # Solo verificamos izquierda y derecha (no arriba, abajo, ni diagonales).
+        # Los huecos vacíos tienen código 0, que nunca está prohibido.
+        codigos = arka.codigos
+        prohibidos = self._bits_prohibidos[codigo]
+        if (prohibidos >> codigos[indice - cara + (cara - 1) % 4]) & 1:  # Módulo de la IZQUIERDA
+            return False
+        if (prohibidos >> codigos[indice - cara + (cara + 1) % 4]) & 1:  # Módulo de la DERECHA
+            return False
+        
+        # PASO 3: Regla especial para módulos sanitarios
+        # Los módulos sanitarios (012, 013) solo pueden estar en piso 1 o superior
+        # si hay otro módulo sanitario justo debajo
+        if piso > 0 and (BITS_SANITARIOS >> codigo) & 1:
+            if not (BITS_SANITARIOS >> codigos[indice - 4]) & 1:  # Si no hay sanitario debajo
+                return False
+        
+        return True  # Si llegamos aquí, es válido colocar el módulo
+
+    def calcular_score(self, arka_data, piso: int, cara: int, modulo_id) -> int:
+        """
+        Calcula el score de una posición para un módulo específico
+        
+        Esta función es el CORAZÓN del algoritmo de optimización.
+        Evalúa qué tan "buena" es una posición para colocar un módulo.
+        
+        Sistema de puntuación:
+        - +10 puntos por cada prioridad satisfecha con módulos horizontalmente adyacentes
+        - +15 puntos por estar en piso prioritario (si está definido)
+        - -5 puntos por cada piso inferior incompleto (incentiva completar de abajo hacia arriba)
+        - +1 punto por cada espacio horizontalmente adyacente vacío (flexibilidad futura)
+        
+        IMPORTANTE: Solo considera módulos de IZQUIERDA y DERECHA
+        - Cara 0 y Cara 3 son adyacentes entre sí (como un cilindro)
+        
+        Args:
+            arka_data: Arka (ArkaCompacta, diccionario o matriz)
+            piso: Piso a evaluar (0-3)
+            cara: Cara a evaluar (0-3)
+            modulo_id: ID del módulo que queremos colocar (o su código entero)
+        
+        Returns:
+            int: Score de la posición (mayor = mejor)
+        """
+        arka = arka_data if type(arka_data) is ArkaCompacta else compactar(arka_data)
+        codigo = modulo_id if type(modulo_id) is int else CODIGO_DE_MODULO[modulo_id]
+        
+        # PASO 3: Penalizar pisos inferiores incompletos (incentiva completar de abajo hacia arriba)
+        return self._score_vecinos(arka, piso, cara, codigo) - penalizacion_pisos(arka, piso)
+
+    def _score_vecinos(self, arka: ArkaCompacta, piso: int, cara: int, codigo: int) -> int:
+        """Pasos 1, 2 y 4 de calcular_score: solo dependen del piso del hueco"""
+        base = piso * 4
+        modulo_izquierda = arka.codigos[base + (cara - 1) % 4]  # Cara 0 y 3 son adyacentes
+        modulo_derecha = arka.codigos[base + (cara + 1) % 4]
+        
+        # PASO 1: Prioridades con los módulos de IZQUIERDA y DERECHA en ambos
+        # sentidos (la fila del hueco vacío, código 0, vale 0)
+        puntos = self._puntos_prioridad[codigo]
+        score = puntos[modulo_izquierda] + puntos[modulo_derecha]
+        
+        # PASO 2: Bonus por piso prioritario
+        if (self._bits_pisos[codigo] >> piso) & 1:
+            score += 15  # +15 puntos por estar en piso prioritario
+        
+        # PASO 4: Bonus por flexibilidad futura
+        # +1 punto por cada espacio horizontalmente adyacente vacío
+        score += (modulo_izquierda == 0) + (modulo_derecha == 0)
+        
+        return score
+
+    def encontrar_mejor_posicion(self, arka_data, modulo_id,
+                                 cache: Optional[List] = None) -> Tuple[int, int, int]:
+        """
+        Encuentra la mejor posición para un módulo en una arka
+        
+        Esta función busca en todas las posiciones LIBRES de la arka y encuentra
+        la que tenga el mayor score (mejor optimización).
+        
+        Proceso:
+        1. Recorre los huecos vacíos en orden (piso, cara), como el recorrido 4x4
+        2. Para cada posición válida, calcula su score
+        3. Guarda la posición con el mayor score (en empate, la primera)
+        
+        Args:
+            arka_data: Arka (ArkaCompacta, diccionario o matriz)
+            modulo_id: ID del módulo que queremos colocar (o su código entero)
+            cache: Scores parciales de esta arka y este módulo por hueco (None =
+                   sin calcular), ver CACHE DE SCORES en ContextoColocacion
+        
+        Returns:
+            Tuple[int, int, int]: (piso, cara, score) de la mejor posición
+            None si no hay posiciones válidas
+        """
+        arka = arka_data if type(arka_data) is ArkaCompacta else compactar(arka_data)
+        codigo = modulo_id if type(modulo_id) is int else CODIGO_DE_MODULO[modulo_id]
+        
+        mejor_score = -1  # Inicializamos con un score muy bajo
+        mejor_posicion = None
+        
+        # Recorremos los bits a 1 de menor a mayor: mismo orden que piso, cara
+        libres = arka.libres
+        while libres:
+            bit = libres & -libres
+            libres ^= bit
+            indice = bit.bit_length() - 1
+            piso, cara = divmod(indice, 4)
+            self.huecos_evaluados += 1
+            
+            parcial = None if cache is None else cache[indice]
+            if parcial is None:
+                self.evaluaciones_score += 1
+                # Solo puntuamos posiciones válidas (que cumplan restricciones)
+                if self.es_valida(arka, piso, cara, codigo):
+                    parcial = self._score_vecinos(arka, piso, cara, codigo)
+                else:
+                    parcial = NO_VALIDA
+                if cache is not None:
+                    cache[indice] = parcial
+            if parcial is NO_VALIDA:
+                continue
+            
+            # Score completo: parte de vecinos menos pisos inferiores incompletos
+            score = parcial - penalizacion_pisos(arka, piso)
+            
+            # Si este score es mejor que el anterior, lo guardamos
+            if score > mejor_score:
+                mejor_score = score
+                mejor_posicion = (piso, cara, score)
+        
+        return mejor_posicion  # Retornamos la mejor posición encontrada
+
+    def _cache_de(self, indice: int, codigo: int) -> Optional[List]:
+        """Scores parciales cacheados de la arka `indice` para un código de módulo"""
+        if not self.cache_scores:
+            return None
+        caches = self._scores[indice]
+        cache = caches.get(codigo)
+        if cache is None:
+            cache = caches[codigo] = [None] * (self.arkas[indice].pisos * 4)
+        return cache
+
+    def _colocar(self, indice: int, piso: int, cara: int, codigo: int):
+        """Coloca un módulo en la arka `indice` del contexto"""
+        arka = self.arkas[indice]
+        arka.colocar(piso, cara, codigo)
+        self.modulos_colocados += 1
+        
+        # Invalidar los huecos cuyo score parcial o validez depende del ocupado:
+        # vecinos horizontales y el de encima
+        base = piso * 4
+        afectados = [base + (cara - 1) % 4, base + (cara + 1) % 4]
+        if piso + 1 < arka.pisos:
+            afectados.append(base + 4 + cara)
+        for cache in self._scores[indice].values():
+            for hueco in afectados:
+                cache[hueco] = None
         
-        # Colocamos cada instancia del módulo
-        for _ in range(cantidad):
-            if not agregar_modulo(arkas, modulo_id):
-                print(f"ERROR: No se pudo colocar el módulo {modulo_id}")
-                return arkas  # Si hay error, retornamos lo que tengamos
+        # Un sanitario puede habilitar el hueco de encima para otro sanitario:
+        # esa arka vuelve a ser candidata para ellos
+        if (BITS_SANITARIOS >> codigo) & 1:
+            for sanitario in CODIGOS_SANITARIOS:
+                if self._primera_candidata.get(sanitario, 0) > indice:
+                    self._primera_candidata[sanitario] = indice
+
+    def agregar_modulo(self, modulo_id: str) -> bool:
+        """
+        Intenta agregar un módulo a las arkas del contexto o crear una nueva
+        
+        Esta es la función PRINCIPAL de colocación. Sigue esta estrategia:
+        1. Primero intenta colocar en arkas existentes (optimiza espacio)
+        2. Si no puede, crea una nueva arka
+        3. Usa el sistema de scoring para encontrar la mejor posición
+        
+        Args:
+            modulo_id: ID del módulo que queremos colocar
+        
+        Returns:
+            bool: True si se colocó exitosamente, False si no se pudo colocar
+        
+        ÍNDICE DE HUECOS LIBRES:
+        Colocar un módulo solo ocupa huecos y añade vecinos, así que una arka
+        donde no cabe un tipo de módulo no vuelve a admitirlo (salvo los
+        sanitarios, ver _colocar). Por eso se guarda, por tipo de módulo, la
+        primera arka que aún puede admitirlo, y las arkas llenas (máscara 0) se
+        saltan sin recorrerlas. El resultado es idéntico al primer ajuste
+        recorriendo todas las arkas.
+        """
+        codigo = CODIGO_DE_MODULO[modulo_id]
+        self._scores.extend({} for _ in range(len(self.arkas) - len(self._scores)))
+        
+        # ESTRATEGIA 1: Intentar colocar en alguna arka existente
+        # Esto optimiza el uso del espacio (menos arkas = mejor eficiencia)
+        for i in range(self._primera_candidata.get(codigo, 0), len(self.arkas)):
+            arka = self.arkas[i]
+            if not arka.libres:  # Arka llena
+                continue
+            posicion = self.encontrar_mejor_posicion(arka, codigo, self._cache_de(i, codigo))
+            
+            if posicion is not None:  # Si encontramos una posición válida
+                piso, cara, score = posicion
+                self._primera_candidata[codigo] = i
+                self._colocar(i, piso, cara, codigo)  # Colocamos el módulo
+                logger.debug("Módulo %s colocado en Arka %d, Piso %d, Cara %d (Score: %d)",
+                             modulo_id, arka.numero, piso + 1, cara + 1, score)
+                return True  # Éxito: módulo colocado
+        
+        # ESTRATEGIA 2: Si no se pudo colocar en arkas existentes, crear nueva arka
+        # Esto garantiza que siempre podamos colocar el módulo
+        self._primera_candidata[codigo] = len(self.arkas)
+        arka = self.nueva_arka()  # Creamos arka vacía
+        cache = [None] * (arka.pisos * 4) if self.cache_scores else None
+        posicion = self.encontrar_mejor_posicion(arka, codigo, cache)
+        
+        if posicion is not None:  # Debería ser siempre válido en arka vacía
+            piso, cara, score = posicion
+            self.arkas.append(arka)  # Añadimos la nueva arka a la lista
+            self._scores.append({codigo: cache} if cache is not None else {})
+            self._colocar(len(self.arkas) - 1, piso, cara, codigo)  # Colocamos el módulo
+            logger.debug("Módulo %s colocado en NUEVA Arka %d, Piso %d, Cara %d (Score: %d)",
+                         modulo_id, arka.numero, piso + 1, cara + 1, score)
+            return True  # Éxito: módulo colocado en nueva arka
+        
+        return False  # Error: no se pudo colocar (no debería pasar nunca)
+
+    def colocar_inventario_completo(self, inventario: Dict[str, int]) -> List[Dict]:
+        """
+        Coloca todo el inventario en las arkas
+        
+        Esta es la función COORDINADORA que ejecuta todo el algoritmo:
+        1. Ordena los módulos por prioridad
+        2. Coloca cada módulo usando el sistema de scoring
+        3. Maneja errores y proporciona feedback
+        
+        La colocación trabaja con ArkaCompacta; el resultado se convierte al
+        formato de diccionario solo al final, para Fase3.
+        
+        Args:
+            inventario: Diccionario con todos los módulos y sus cantidades
+        
+        Returns:
+            List[Dict]: Lista de arkas con todos los módulos colocados
+        """
+        # REINICIAR ESTADO del contexto para cada ejecución
+        self.contador_arkas = 0
+        self.arkas = []  # Lista vacía de arkas (empezamos sin ninguna)
+        self._primera_candidata = {}
+        self._scores = []
+        modulos_ordenados = ordenar_modulos_por_prioridad(inventario)  # Ordenamos por prioridad
+        
+        logger.debug("Iniciando colocación: %d módulos a colocar", sum(inventario.values()))
+        
+        # BUCLE PRINCIPAL: Colocamos cada tipo de módulo
+        for modulo_id, cantidad in modulos_ordenados:
+            logger.debug("Colocando %d módulo(s) de tipo %s", cantidad, modulo_id)
+            
+            # Colocamos cada instancia del módulo
+            for _ in range(cantidad):
+                if not self.agregar_modulo(modulo_id):
+                    logger.error("No se pudo colocar el módulo %s", modulo_id)
+                    # Si hay error, retornamos lo que tengamos
+                    return [arka.a_diccionario() for arka in self.arkas]
+        
+        logger.debug("Colocación completada: %d arkas utilizadas", len(self.arkas))
+        return cleaning_postresultado([arka.a_diccionario() for arka in self.arkas])
+
+    def colocar_inventario_incremental(self, inventario: Dict[str, int]) -> Iterator[Dict]:
+        """
+        Igual que colocar_inventario_completo, pero entrega cada arka en cuanto
+        es definitiva, con la limpieza ya aplicada
+        
+        Una arka es definitiva cuando ningún módulo pendiente puede acabar en
+        ella: está llena, o está antes de la primera arka candidata de todos los
+        tipos pendientes (ver ÍNDICE DE HUECOS LIBRES en agregar_modulo; un tipo
+        que aún no se ha intentado colocar puede ir a cualquier arka). La
+        última arka existente nunca se entrega antes de terminar, porque si
+        resulta ser la última pierde su conexión 009 (cleaning_postresultado).
+        
+        Las arkas entregadas (en orden) son las mismas que devuelve
+        colocar_inventario_completo.
+        
+        Args:
+            inventario: Diccionario con todos los módulos y sus cantidades
+        
+        Yields:
+            Dict: Cada arka en formato de diccionario
+        """
+        self.contador_arkas = 0
+        self.arkas = []
+        self._primera_candidata = {}
+        self._scores = []
+        modulos_ordenados = ordenar_modulos_por_prioridad(inventario)
+        pendientes = {CODIGO_DE_MODULO[modulo_id]: cantidad for modulo_id, cantidad in modulos_ordenados}
+        entregadas = 0
+        
+        for modulo_id, cantidad in modulos_ordenados:
+            codigo = CODIGO_DE_MODULO[modulo_id]
+            for _ in range(cantidad):
+                if not self.agregar_modulo(modulo_id):
+                    logger.error("No se pudo colocar el módulo %s", modulo_id)
+                    for arka in self.arkas[entregadas:]:
+                        yield arka.a_diccionario()
+                    return
+                pendientes[codigo] -= 1
+                if not pendientes[codigo]:
+                    del pendientes[codigo]
+                
+                frontera = None
+                while entregadas < len(self.arkas) - 1:
+                    if self.arkas[entregadas].libres:
+                        if frontera is None:
+                            frontera = min((self._primera_candidata.get(c, 0) for c in pendientes),
+                                           default=len(self.arkas))
+                        if entregadas >= frontera:
+                            break
+                    arka_data = self.arkas[entregadas].a_diccionario()
+                    rellenar_huecos(arka_data)
+                    entregadas += 1
+                    yield arka_data
+        
+        for arka in self.arkas[entregadas:]:
+            arka_data = arka.a_diccionario()
+            if arka is self.arkas[-1]:
+                quitar_conexion_final(arka_data)
+            rellenar_huecos(arka_data)
+            yield arka_data
+
+# =============================================================================
+# INTERFAZ FUNCIONAL (COMPATIBILIDAD)
+# =============================================================================
+# Las consultas de reglas solo leen las tablas, así que comparten un contexto
+# por defecto. Las funciones que crean arkas usan un contexto propio por
+# llamada, por lo que todas son seguras en hilos concurrentes.
+
+_contexto_reglas = ContextoColocacion()
+
+def es_valida(arka_data, piso: int, cara: int, modulo_id: str) -> bool:
+    """Ver ContextoColocacion.es_valida"""
+    return _contexto_reglas.es_valida(arka_data, piso, cara, modulo_id)
+
+def calcular_score(arka_data, piso: int, cara: int, modulo_id: str) -> int:
+    """Ver ContextoColocacion.calcular_score"""
+    return _contexto_reglas.calcular_score(arka_data, piso, cara, modulo_id)
+
+def encontrar_mejor_posicion(arka_data, modulo_id: str) -> Tuple[int, int, int]:
+    """Ver ContextoColocacion.encontrar_mejor_posicion"""
+    return _contexto_reglas.encontrar_mejor_posicion(arka_data, modulo_id)
+
+def agregar_modulo(arkas: List[Dict], modulo_id: str) -> bool:
+    """
+    Ver ContextoColocacion.agregar_modulo
     
-    print(f"\n=== COLOCACIÓN COMPLETADA ===")
-    print(f"Total de arkas utilizadas: {len(arkas)}")
-    arkas = cleaning_postresultado(arkas)
-    return arkas
+    Las arkas nuevas se numeran a continuación de las ya existentes en `arkas`.
+    Como antes, `arkas` se modifica en su sitio: se actualizan sus matrices y
+    se añaden las arkas nuevas como diccionarios.
+    """
+    contexto = ContextoColocacion()
+    contexto.arkas = [compactar(arka_data) for arka_data in arkas]
+    contexto.contador_arkas = len(arkas)
+    colocado = contexto.agregar_modulo(modulo_id)
+    
+    existentes = len(arkas)
+    for arka_data, arka in zip(arkas, contexto.arkas):
+        for fila, fila_nueva in zip(arka_data["matriz"], arka.a_matriz()):
+            fila[:] = fila_nueva
+    arkas.extend(arka.a_diccionario() for arka in contexto.arkas[existentes:])
+    return colocado
+
+def colocar_inventario_completo(inventario: Dict[str, int]) -> List[Dict]:
+    """Ver ContextoColocacion.colocar_inventario_completo"""
+    return ContextoColocacion().colocar_inventario_completo(inventario)
+
+def colocar_inventario_incremental(inventario: Dict[str, int]) -> Iterator[Dict]:
+    """Ver ContextoColocacion.colocar_inventario_incremental"""
+    return ContextoColocacion().colocar_inventario_incremental(inventario)
 
 def visualizar_arkas(arkas: List[Dict]):
     """
@@ -857,7 +1285,7 @@ def visualizar_arkas(arkas: List[Dict]):
             print(f"Piso {piso+1}: {modulos_piso}")
         print()
 
-def calcular_estadisticas(arkas: List[Dict]):
+def calcular_estadisticas(arkas: List[Dict], inventario: Optional[Dict[str, int]] = None) -> Dict[str, float]:
     """
     Calcula estadísticas de la colocación
     
@@ -867,23 +1295,47 @@ def calcular_estadisticas(arkas: List[Dict]):
     - Posiciones ocupadas vs totales
     - Estadísticas de reglas de dormitorios
     
+    Las arkas de colocar_inventario_completo ya están limpias: todos los
+    huecos vacíos tienen un 006 de relleno (cleaning_postresultado) y,
+    sin más información, la eficiencia sería siempre del 100%. Con el
+    inventario colocado, los 006 que no son del inventario cuentan como
+    huecos vacíos.
+    
     Args:
         arkas: Lista de arkas para analizar
+        inventario: Inventario de Fase1 colocado en las arkas (opcional)
+        
+    Returns:
+        Dict: {"arkas", "ocupadas", "totales", "eficiencia"} (eficiencia en %)
     """
     total_posiciones = sum(arka_data["pisos"] * 4 for arka_data in arkas)
     posiciones_ocupadas = sum(1 for arka_data in arkas for piso in arka_data["matriz"] for cara in piso if cara is not None)
+    if inventario is not None:
+        rellenos = sum(piso.count("006") for arka_data in arkas for piso in arka_data["matriz"]) - inventario.get("006", 0)
+        posiciones_ocupadas -= max(rellenos, 0)
     eficiencia = (posiciones_ocupadas / total_posiciones) * 100 if total_posiciones > 0 else 0
-    
+    return {
+        "arkas": len(arkas),
+        "ocupadas": posiciones_ocupadas,
+        "totales": total_posiciones,
+        "eficiencia": eficiencia,
+    }
+
+def mostrar_estadisticas(arkas: List[Dict], inventario: Optional[Dict[str, int]] = None):
+    """Muestra por consola las estadísticas de calcular_estadisticas"""
+    estadisticas = calcular_estadisticas(arkas, inventario)
     print(f"\n=== ESTADÍSTICAS ===")
-    print(f"Total de arkas: {len(arkas)}")
-    print(f"Posiciones ocupadas: {posiciones_ocupadas}")
-    print(f"Posiciones totales: {total_posiciones}")
-    print(f"Eficiencia de uso: {eficiencia:.1f}%")
+    print(f"Total de arkas: {estadisticas['arkas']}")
+    print(f"Posiciones ocupadas: {estadisticas['ocupadas']}")
+    print(f"Posiciones totales: {estadisticas['totales']}")
+    print(f"Eficiencia de uso: {estadisticas['eficiencia']:.1f}%")
 
 # =============================================================================
 # EJECUCIÓN PRINCIPAL DEL ALGORITMO
 # =============================================================================
 if __name__ == "__main__":
+    # Traza completa de la colocación (nivel DEBUG) en la consola
+    logging.basicConfig(level=logging.DEBUG, format="%(message)s")
     print("=== ALGORITMO DE ORDENACIÓN DE ARKAS ===")
     # Obtener inventario de módulos desde Fase1
     inventario = Fase1.calcular_modulos_arka(30, 500, False)
@@ -905,4 +1357,4 @@ if __name__ == "__main__":
     visualizar_arkas(arkas_resultado)
     
     # PASO 3: Mostrar estadísticas de eficiencia
-    calcular_estadisticas(arkas_resultado)
\ No newline at end of file
+    mostrar_estadisticas(arkas_resultado, inventario[0])
\ No newline at end of file
@@ -3,6 +3,8 @@ import json
 from datetime import datetime
 import numpy as np
 import math
+import orjson
+from typing import Dict, List, NamedTuple
 
 constantes = {
     "altura_modulo": 3.1,
@@ -19,6 +21,15 @@ constantes = {
     "360_grados": [0, 6.28318, 0]
 }
 
+def generar_timestamp():
+    """
+    Marca de tiempo de generación (metadata.generatedAt)
+    
+    Returns:
+        str: Fecha y hora actual en ISO 8601 con sufijo "Z"
+    """
+    return datetime.now().isoformat() + "Z"
+
 def id_a_modulo(modulo_id):
     """
     Convierte el ID numérico del módulo al nombre del archivo
@@ -62,12 +73,209 @@ def id_a_modulo(modulo_id):
     
     return mapeo_modulos.get(modulo_id, f"unknown_module_{modulo_id}")
 
+def posicion_base_arka(numero_arka):
+    """
+    Posición 3D de la base (módulo 001) de una arka
+    
+    Se calcula directamente a partir de su coordenada en la espiral
+    (Fase2.coordenada_arka), sin recorrer las arkas anteriores.
+    
+    Args:
+        numero_arka: Número de la arka (1, 2, 3, ...)
+        
+    Returns:
+        np.ndarray: Posición [x, y, z] de la base
+    """
+    if numero_arka == 1:
+        return np.array([0, 0, 0])
+    separacion = 1*constantes["ancho_centro"]+3*constantes["ancho_circ"]
+    x, z = Fase2.coordenada_arka(numero_arka)
+    return np.array([x * separacion, 0, z * separacion])
+
+# =============================================================================
+# GEOMETRÍA VECTORIZADA (ESTRUCTURA DE ARRAYS)
+# =============================================================================
+# Cada arka aporta, en este orden, como máximo 4 + 5*pisos módulos:
+#   001 base, 010 access core, 011 torre (uno por piso), 004 techo,
+#   caras A-D de cada piso, 009 conexión con la siguiente arka
+# Se construye una plantilla de filas para TODAS las arkas a la vez con
+# arrays (arkas, filas) y se descartan con una máscara las filas que no
+# existen (pisos que la arka no tiene, huecos vacíos, access cores sobrantes
+# y la conexión de la última arka). El orden resultante es el mismo que el
+# del recorrido arka → piso → cara.
+#
+# Las posiciones se calculan como ((base + altura) + desplazamiento) +
+# desplazamiento_conexión, en el mismo orden de sumas que el cálculo módulo
+# a módulo, para obtener exactamente los mismos valores de coma flotante.
+
+ALTURA_MODULO = constantes["altura_modulo"]
+ANCHO_CARA = constantes["ancho_modelo"]
+ANCHO_CARA_009 = constantes["ancho_centro"]/2 + constantes["ancho_circ"]/2
+ANCHO_CONEXION_CIRC = 1.5*constantes["ancho_circ"]
+ANCHO_CONEXION_CENTRO = 0.5*constantes["ancho_centro"]
+
+# Cara A-D: (eje del desplazamiento, signo, rotación)
+CARAS = (
+    (2, -1.0, constantes["0_grados"]),
+    (0, -1.0, constantes["90_grados_derecha"]),
+    (2, 1.0, constantes["180_grados"]),
+    (0, 1.0, constantes["270_grados_derecha"]),
+)
+
+# Conexión 009 según la dirección hacia la siguiente arka: (eje, signo, rotación)
+CONEXIONES = {
+    "ARRIBA": (2, 1.0, constantes["0_grados"]),
+    "IZQ": (0, 1.0, constantes["270_grados_derecha"]),
+    "ABAJO": (2, -1.0, constantes["180_grados"]),
+    "DER": (0, -1.0, constantes["90_grados_derecha"]),
+}
+
+# Nombre de archivo por código entero de módulo (ver Fase2.CODIGO_DE_MODULO)
+NOMBRES_POR_CODIGO = tuple(id_a_modulo(modulo) if modulo else None for modulo in Fase2.MODULO_DE_CODIGO)
+
+CODIGO_001 = Fase2.CODIGO_DE_MODULO["001"]
+CODIGO_004 = Fase2.CODIGO_DE_MODULO["004"]
+CODIGO_009 = Fase2.CODIGO_DE_MODULO["009"]
+CODIGO_010 = Fase2.CODIGO_DE_MODULO["010"]
+CODIGO_011 = Fase2.CODIGO_DE_MODULO["011"]
+
+class LayoutModulos(NamedTuple):
+    """
+    Módulos de un layout en estructura de arrays
+    
+    - codigos: uint8[n], código de cada módulo (Fase2.CODIGO_DE_MODULO)
+    - posiciones: float64[n, 3]
+    - rotaciones: float64[n, 3]
+    La escala es siempre [1, 1, 1].
+    """
+    codigos: np.ndarray
+    posiciones: np.ndarray
+    rotaciones: np.ndarray
+
+    def nombres(self) -> List[str]:
+        """Nombre de archivo de cada módulo (campo "id" del JSON)"""
+        return [NOMBRES_POR_CODIGO[codigo] for codigo in self.codigos.tolist()]
+
+    def a_diccionarios(self) -> List[Dict]:
+        """Módulos en el formato del JSON de respuesta"""
+        return [
+            {"id": nombre, "position": posicion, "rotation": rotacion, "scale": [1, 1, 1]}
+            for nombre, posicion, rotacion in zip(self.nombres(), self.posiciones.tolist(), self.rotaciones.tolist())
+        ]
+
+def numero_access_cores(P, T):
+    """Número de módulos 010: uno por cada 6 pasajeros, el doble si T > 600"""
+    if T <= 600:
+        return math.ceil(P / 6)
+    return math.ceil(P / 6) * 2
+
+def calcular_layout(arkas_resultado, P, T, hay_siguiente=False):
+    """
+    Calcula posiciones y rotaciones de todos los módulos de todas las arkas a la vez
+    
+    Args:
+        arkas_resultado: Lista de arkas resultado de Fase2 (o un tramo consecutivo)
+        P: Número de pasajeros
+        T: Duración de la misión en días
+        hay_siguiente: Si la última arka de la lista tiene una arka siguiente
+                       (y por tanto su conexión 009), al calcular por tramos
+        
+    Returns:
+        tuple: (LayoutModulos, posición_base_anterior, posición_base_actual), con
+               las posiciones base de la última arka (None si no hay arkas)
+    """
+    n = len(arkas_resultado)
+    if n == 0:
+        vacio = np.zeros((0, 3))
+        return LayoutModulos(np.zeros(0, dtype=np.uint8), vacio, vacio.copy()), None, None
+    
+    pisos = np.array([arka["pisos"] for arka in arkas_resultado])
+    numeros = np.array([arka["numero"] for arka in arkas_resultado])
+    pisos_max = int(pisos.max())
+    columna_torre = 2
+    columna_techo = columna_torre + pisos_max
+    columna_caras = columna_techo + 1
+    columna_conexion = columna_caras + 4 * pisos_max
+    filas = columna_conexion + 1
+    
+    # Bases de cada arka en la espiral
+    separacion = 1*constantes["ancho_centro"]+3*constantes["ancho_circ"]
+    coordenadas = np.array([Fase2.coordenada_arka(arka["numero"]) for arka in arkas_resultado], dtype=np.float64)
+    bases = np.zeros((n, 3))
+    bases[:, 0] = coordenadas[:, 0] * separacion
+    bases[:, 2] = coordenadas[:, 1] * separacion
+    
+    # Caras de cada piso como códigos (0 = vacío o piso inexistente)
+    caras = np.zeros((n, pisos_max, 4), dtype=np.uint8)
+    for i, arka in enumerate(arkas_resultado):
+        caras[i, :arka["pisos"]] = [[0 if modulo is None else Fase2.CODIGO_DE_MODULO[modulo] for modulo in fila]
+                                    for fila in arka["matriz"]]
+    
+    codigos = np.zeros((n, filas), dtype=np.uint8)
+    altura = np.zeros((n, filas))
+    desplazamiento = np.zeros((n, filas, 3))
+    desplazamiento_conexion = np.zeros((n, filas, 3))
+    rotaciones = np.zeros((n, filas, 3))
+    mascara = np.zeros((n, filas), dtype=bool)
+    niveles = np.arange(pisos_max)
+    
+    # 001 base y 010 access core
+    codigos[:, 0] = CODIGO_001
+    mascara[:, 0] = True
+    codigos[:, 1] = CODIGO_010
+    mascara[:, 1] = numeros <= numero_access_cores(P, T)
+    
+    # 011 torre (un módulo por piso) y 004 techo
+    torre = slice(columna_torre, columna_techo)
+    codigos[:, torre] = CODIGO_011
+    altura[:, torre] = (niveles + 1) * ALTURA_MODULO
+    mascara[:, torre] = niveles < pisos[:, None]
+    codigos[:, columna_techo] = CODIGO_004
+    altura[:, columna_techo] = (pisos + 1) * ALTURA_MODULO
+    mascara[:, columna_techo] = True
+    
+    # Caras A-D de cada piso
+    codigos_caras = codigos[:, columna_caras:columna_conexion].reshape(n, pisos_max, 4)
+    codigos_caras[:] = caras
+    altura[:, columna_caras:columna_conexion] = np.repeat((niveles + 1) * ALTURA_MODULO, 4)
+    mascara[:, columna_caras:columna_conexion] = (caras != 0).reshape(n, -1)
+    anchos = np.where(caras == CODIGO_009, ANCHO_CARA_009, ANCHO_CARA)
+    desplazamiento_caras = desplazamiento[:, columna_caras:columna_conexion].reshape(n, pisos_max, 4, 3)
+    rotaciones_caras = rotaciones[:, columna_caras:columna_conexion].reshape(n, pisos_max, 4, 3)
+    for cara, (eje, signo, rotacion) in enumerate(CARAS):
+        desplazamiento_caras[:, :, cara, eje] = signo * anchos[:, :, cara]
+        rotaciones_caras[:, :, cara] = rotacion
+    
+    # 009 conexión hacia la siguiente arka (la última no tiene)
+    codigos[:, columna_conexion] = CODIGO_009
+    altura[:, columna_conexion] = (2) * ALTURA_MODULO
+    con_conexion = n if hay_siguiente else n - 1
+    mascara[:con_conexion, columna_conexion] = True
+    for i, arka in enumerate(arkas_resultado[:con_conexion]):
+        eje, signo, rotacion = CONEXIONES[arka["direccion_actual"]]
+        desplazamiento[i, columna_conexion, eje] = signo * ANCHO_CONEXION_CIRC
+        desplazamiento_conexion[i, columna_conexion, eje] = signo * ANCHO_CONEXION_CENTRO
+        rotaciones[i, columna_conexion] = rotacion
+    
+    centros = bases[:, None, :] + altura[:, :, None] * np.array([0.0, 1.0, 0.0])
+    posiciones = (centros + desplazamiento) + desplazamiento_conexion
+    
+    layout = LayoutModulos(codigos[mascara], posiciones[mascara], rotaciones[mascara])
+    posicion_base = posicion_base_arka(arkas_resultado[-1]["numero"]).tolist()
+    return layout, posicion_base, posicion_base
+
 def añadir_modulos_por_arka(arkas_resultado, P, T, TipoC):
     """
     Añade módulos específicos por cada arka en estructura vertical:
     - 1 módulo 001 (base)
-    - 4 módulos 011 (torre vertical de 4 niveles)
+    - 1 módulo 010 (access core) en las primeras arkas, según P y T
+    - 1 módulo 011 por piso (torre vertical)
     - 1 módulo 004 (techo)
+    - Los módulos de las caras de cada piso
+    - 1 módulo 009 de conexión con la siguiente arka
+    
+    Los valores se calculan con calcular_layout y solo aquí se convierten a
+    diccionarios.
     
     Args:
         arkas_resultado: Lista de arkas resultado
@@ -75,167 +283,8 @@ def añadir_modulos_por_arka(arkas_resultado, P, T, TipoC):
     Returns:
         tuple: (lista_de_módulos, posición_base_anterior, posición_base_actual)
     """
-    modulos_adicionales = []
-    posicion_base_anterior = None
-    posicion_base_actual = None
-    number_of_access_core = 0
-    if T <= 600:
-        number_of_access_core = math.ceil(P / 6)
-    else: 
-        number_of_access_core = math.ceil(P / 6) * 2
-    
-    for i, arka in enumerate(arkas_resultado):
-        numero_arka = arka["numero"]
-        es_ultima_arka = (i == len(arkas_resultado) - 1)
-        
-        if numero_arka == 1:
-            posicion_base_actual = np.array([0, 0, 0])
-        else:
-            if arka["direccion_anterior"] == "ARRIBA":
-                posicion_base_actual = np.array([0, 0, 1*constantes["ancho_centro"]+3*constantes["ancho_circ"]]) + posicion_base_anterior
-            elif arka["direccion_anterior"] == "IZQ":
-                posicion_base_actual = np.array([1*constantes["ancho_centro"]+3*constantes["ancho_circ"], 0, 0]) + posicion_base_anterior
-            elif arka["direccion_anterior"] == "ABAJO":
-                posicion_base_actual = np.array([0, 0, -1*constantes["ancho_centro"]-3*constantes["ancho_circ"]]) + posicion_base_anterior
-            elif arka["direccion_anterior"] == "DER":
-                posicion_base_actual = np.array([-1*constantes["ancho_centro"]-3*constantes["ancho_circ"], 0, 0]) + posicion_base_anterior
-            
-      
-        # Guardar posición base anterior
-        posicion_base_anterior = posicion_base_actual
-        
-        # 1 módulo 001 (base) - en el centro de la arka
-        modulo_001 = {
-            "id": id_a_modulo("001"),
-            "position": posicion_base_actual.tolist(),
-            "rotation": [0, 0, 0],
-            "scale": [1, 1, 1]
-        }
-        modulos_adicionales.append(modulo_001)
-        
-        # 1 módulo 010 (access core) - en el centro de la arka
-        print(number_of_access_core-1)
-        print(i)
-        if number_of_access_core-1 >= i:
-            modulo_010 = {
-                "id": id_a_modulo("010"),
-                "position": posicion_base_actual.tolist(),
-                "rotation": [0, 0, 0],
-                "scale": [1, 1, 1]
-            }
-            modulos_adicionales.append(modulo_010)
-        
-        # 4 módulos 011 (torre vertical) - uno encima del otro
-        for nivel in range(arka["pisos"]):
-            posicion_torre = posicion_base_actual + np.array([0, (nivel + 1) * constantes["altura_modulo"], 0])
-            modulo_011 = {
-                "id": id_a_modulo("011"),
-                "position": posicion_torre.tolist(),
-                "rotation": [0, 0, 0],
-                "scale": [1, 1, 1]
-            }
-            modulos_adicionales.append(modulo_011)
-        
-        # 1 módulo 004 (techo) - en la parte superior de la torre
-        posicion_techo = posicion_base_actual + np.array([0, (arka["pisos"] + 1) * constantes["altura_modulo"], 0])
-        modulo_004 = {
-            "id": id_a_modulo("004"),
-            "position": posicion_techo.tolist(),  # 5 niveles de altura (base + 4 torre + techo)
-            "rotation": [0, 0, 0],
-            "scale": [1, 1, 1]
-        }
-        modulos_adicionales.append(modulo_004)
-        
-        #Arkas por piso
-        for piso in range(arka["pisos"]):
-            
-            print(f"Arka {numero_arka} - Piso {piso+1} - Es última: {es_ultima_arka}")          
-            
-            centro_piso = posicion_base_actual + np.array([0, (piso+1) * constantes["altura_modulo"], 0])
-            if arka["matriz"][piso][0] == "009":
-                ancho_especial = constantes["ancho_centro"]/2 + constantes["ancho_circ"]/2
-            else:
-                ancho_especial = constantes["ancho_modelo"]
-                
-            piso_cara_A = {
-                "id": id_a_modulo(arka["matriz"][piso][0]),
-                "position": [centro_piso[0], centro_piso[1], centro_piso[2] - ancho_especial],
-                "rotation": constantes["0_grados"],
-                "scale": [1, 1, 1]
-            }
-            
-            if arka["matriz"][piso][0] is not None:
-                modulos_adicionales.append(piso_cara_A)
-                
-            if arka["matriz"][piso][1] == "009":
-                ancho_especial = constantes["ancho_centro"]/2 + constantes["ancho_circ"]/2
-            else:
-                ancho_especial = constantes["ancho_modelo"]
-            
-            piso_cara_B = {
-                "id": id_a_modulo(arka["matriz"][piso][1]),
-                "position": [centro_piso[0] - ancho_especial, centro_piso[1], centro_piso[2]],
-                "rotation": constantes["90_grados_derecha"],
-                "scale": [1, 1, 1]
-            }
-            
-            if arka["matriz"][piso][1] is not None:
-                modulos_adicionales.append(piso_cara_B)
-            
-            if arka["matriz"][piso][2] == "009":
-                ancho_especial = constantes["ancho_centro"]/2 + constantes["ancho_circ"]/2
-            else:
-                ancho_especial = constantes["ancho_modelo"]
-            
-            piso_cara_C = {
-                "id": id_a_modulo(arka["matriz"][piso][2]),
-                "position": [centro_piso[0], centro_piso[1], centro_piso[2] + ancho_especial],
-                "rotation": constantes["180_grados"],
-                "scale": [1, 1, 1]
-            }
-            
-            if arka["matriz"][piso][2] is not None:
-                modulos_adicionales.append(piso_cara_C)
-                
-            if arka["matriz"][piso][3] == "009":
-                ancho_especial = constantes["ancho_centro"]/2 + constantes["ancho_circ"]/2
-            else:
-                ancho_especial = constantes["ancho_modelo"]
-            
-            piso_cara_D = {
-                "id": id_a_modulo(arka["matriz"][piso][3]),
-                "position": [centro_piso[0] + ancho_especial, centro_piso[1], centro_piso[2]],
-                "rotation": constantes["270_grados_derecha"],
-                "scale": [1, 1, 1]
-            }
-            if arka["matriz"][piso][3] is not None:
-                modulos_adicionales.append(piso_cara_D)         
-            
-        if not es_ultima_arka:
-            print(arka["direccion_actual"])
-            centro_piso2 = posicion_base_actual + np.array([0, (2) * constantes["altura_modulo"], 0])
-            if arka["direccion_actual"] == "ARRIBA":
-                posicion_099 =  [centro_piso2[0], centro_piso2[1], centro_piso2[2] + 1.5*constantes["ancho_circ"]+0.5*constantes["ancho_centro"]]
-                rotation_099 = constantes["0_grados"]
-            elif arka["direccion_actual"] == "IZQ":
-                posicion_099 = [centro_piso2[0] + 1.5*constantes["ancho_circ"]+0.5*constantes["ancho_centro"], centro_piso2[1], centro_piso2[2]]
-                rotation_099 = constantes["270_grados_derecha"]
-            elif arka["direccion_actual"] == "ABAJO":
-                posicion_099 = [centro_piso2[0], centro_piso2[1], centro_piso2[2] - 1.5*constantes["ancho_circ"]-0.5*constantes["ancho_centro"]]
-                rotation_099 = constantes["180_grados"]
-            elif arka["direccion_actual"] == "DER":
-                posicion_099 = [centro_piso2[0] - 1.5*constantes["ancho_circ"]-0.5*constantes["ancho_centro"], centro_piso2[1], centro_piso2[2]]
-                rotation_099 = constantes["90_grados_derecha"]
-            
-            direccion_actual_099 = {
-                "id": id_a_modulo("009"),
-                "position": posicion_099,
-                "rotation": rotation_099,
-                "scale": [1, 1, 1]
-            }
-            modulos_adicionales.append(direccion_actual_099)
-    
-    return modulos_adicionales, posicion_base_anterior.tolist() if posicion_base_anterior is not None else None, posicion_base_actual.tolist()
+    layout, posicion_base_anterior, posicion_base_actual = calcular_layout(arkas_resultado, P, T)
+    return layout.a_diccionarios(), posicion_base_anterior, posicion_base_actual
 
 def generar_json_solo_001_011_004(arkas_resultado, passengers=30, duration=500, terrain="moon", isScientific=True):
     """
@@ -265,7 +314,7 @@ def generar_json_solo_001_011_004(arkas_resultado, passengers=30, duration=500,
         "totalModules": len(modulos_adicionales),
         "modules": modulos_adicionales,
         "metadata": {
-            "generatedAt": datetime.now().isoformat() + "Z",
+            "generatedAt": generar_timestamp(),
             "algorithmVersion": "v3.0.0",
             "estimatedCost": len(modulos_adicionales) * 3500,
             "currency": "ARKHA",
@@ -277,6 +326,138 @@ def generar_json_solo_001_011_004(arkas_resultado, passengers=30, duration=500,
     
     return json_result
 
+# =============================================================================
+# SERIALIZACIÓN DIRECTA A BYTES
+# =============================================================================
+# El cuerpo de la respuesta se escribe directamente desde LayoutModulos, sin
+# crear un diccionario por módulo ni revalidarlo con Pydantic. orjson formatea
+# de una vez los arrays de posiciones y rotaciones; cada módulo se compone con
+# una plantilla de bytes. El resultado es idéntico (byte a byte) a
+# MissionLayoutResponse(...).model_dump_json(): mismos campos y en el mismo
+# orden, números de coma flotante con el mismo formato y sin los metadatos que
+# el modelo no declara. verificar_respuesta.py lo comprueba.
+
+_PLANTILLA_MODULO = b'{"id":"%s","position":[%s],"rotation":[%s],"scale":[1.0,1.0,1.0]}'
+_NOMBRES_BYTES = tuple(nombre.encode() if nombre else b"" for nombre in NOMBRES_POR_CODIGO)
+
+def _filas_json(valores):
+    """Array float64[n, 3] → lista de b"x,y,z" (una por fila)"""
+    return orjson.dumps(valores, option=orjson.OPT_SERIALIZE_NUMPY)[2:-2].split(b"],[")
+
+def _modulos_json(layout):
+    """Módulos de un layout como elementos JSON separados por comas (sin corchetes)"""
+    if not len(layout.codigos):
+        return b""
+    return b",".join([
+        _PLANTILLA_MODULO % (_NOMBRES_BYTES[codigo], posicion, rotacion)
+        for codigo, posicion, rotacion in zip(layout.codigos.tolist(),
+                                              _filas_json(layout.posiciones),
+                                              _filas_json(layout.rotaciones))
+    ])
+
+def _parametros_json(passengers, duration, terrain, isScientific):
+    """Objeto "parameters" de la respuesta"""
+    return orjson.dumps({
+        "passengers": passengers,
+        "duration": duration,
+        "terrain": terrain,
+        "isScientific": isScientific
+    })
+
+def serializar_layout(layout, passengers, duration, terrain, isScientific, generatedAt=None):
+    """
+    Serializa un layout con el formato de MissionLayoutResponse
+    
+    Args:
+        layout: LayoutModulos calculado con calcular_layout
+        passengers, duration, terrain, isScientific: Parámetros de la misión
+        generatedAt: Marca de tiempo (por defecto, la actual)
+        
+    Returns:
+        bytes: Cuerpo JSON de la respuesta
+    """
+    total = len(layout.codigos)
+    parametros = _parametros_json(passengers, duration, terrain, isScientific)
+    metadata = orjson.dumps({
+        "generatedAt": generatedAt if generatedAt is not None else generar_timestamp(),
+        "algorithmVersion": "v3.0.0",
+        "estimatedCost": total * 3500,
+        "currency": "ARKHA"
+    })
+    return (b'{"parameters":' + parametros + b',"totalModules":' + str(total).encode()
+            + b',"modules":[' + _modulos_json(layout) + b'],"metadata":' + metadata + b'}')
+
+def generar_json_bytes(arkas_resultado, passengers=30, duration=500, terrain="moon", isScientific=True):
+    """
+    Igual que generar_json_solo_001_011_004 pero devuelve directamente el
+    cuerpo JSON de la respuesta de la API (ver serializar_layout)
+    """
+    layout, _, _ = calcular_layout(arkas_resultado, passengers, duration)
+    return serializar_layout(layout, passengers, duration, terrain, isScientific)
+
+# =============================================================================
+# SALIDA EN STREAMING (NDJSON)
+# =============================================================================
+# Una línea JSON por registro, en este orden:
+#   {"type":"header","parameters":{...},"metadata":{"generatedAt",...}}
+#   {"type":"arka","numero":n,"pisos":p,"totalModules":k,"modules":[...]}  (una por arka)
+#   {"type":"summary","totalArkas":...,"totalModules":...,"estimatedCost":...}
+# Los módulos de los registros "arka", concatenados, son exactamente los de
+# "modules" en la respuesta JSON completa. Cada arka se serializa en cuanto
+# Fase2 la entrega (ver Fase2.ContextoColocacion.colocar_inventario_incremental);
+# para saber si lleva conexión 009 se espera a la siguiente o al final.
+
+def _linea_arka(arka, P, T, hay_siguiente):
+    """Registro NDJSON de una arka y su número de módulos"""
+    layout, _, _ = calcular_layout([arka], P, T, hay_siguiente)
+    total = len(layout.codigos)
+    linea = (b'{"type":"arka","numero":' + str(arka["numero"]).encode()
+             + b',"pisos":' + str(arka["pisos"]).encode()
+             + b',"totalModules":' + str(total).encode()
+             + b',"modules":[' + _modulos_json(layout) + b']}\n')
+    return linea, total
+
+def generar_ndjson(arkas, passengers=30, duration=500, terrain="moon", isScientific=True, generatedAt=None):
+    """
+    Genera el layout como líneas NDJSON, arka por arka
+    
+    Args:
+        arkas: Iterable de arkas de Fase2 en orden (lista o generador)
+        passengers, duration, terrain, isScientific: Parámetros de la misión
+        generatedAt: Marca de tiempo (por defecto, la actual)
+        
+    Yields:
+        bytes: Cada línea NDJSON, terminada en "\n"
+    """
+    yield (b'{"type":"header","parameters":' + _parametros_json(passengers, duration, terrain, isScientific)
+           + b',"metadata":' + orjson.dumps({
+               "generatedAt": generatedAt if generatedAt is not None else generar_timestamp(),
+               "algorithmVersion": "v3.0.0",
+               "currency": "ARKHA"
+           }) + b'}\n')
+    
+    total_arkas = 0
+    total_modulos = 0
+    anterior = None
+    for arka in arkas:
+        if anterior is not None:
+            linea, total = _linea_arka(anterior, passengers, duration, True)
+            total_modulos += total
+            yield linea
+        anterior = arka
+        total_arkas += 1
+    if anterior is not None:
+        linea, total = _linea_arka(anterior, passengers, duration, False)
+        total_modulos += total
+        yield linea
+    
+    yield orjson.dumps({
+        "type": "summary",
+        "totalArkas": total_arkas,
+        "totalModules": total_modulos,
+        "estimatedCost": total_modulos * 3500
+    }) + b"\n"
+
 # Ejecutar el proceso
 if __name__ == "__main__":
     P = 30
@@ -0,0 +1,265 @@
+"""
+===============================================================================
+BARRIDO DE PARÁMETROS DE MISIÓN
+===============================================================================
+
+Resume en una tabla compacta el resultado de todas las misiones de un rango
+de pasajeros y duraciones (arkas, módulos totales, coste estimado y
+eficiencia de llenado de Fase2.calcular_estadisticas, sin contar los 006 de
+relleno de la limpieza) sin colocar cada misión por separado.
+
+DEDUPLICACIÓN:
+- El inventario de Fase1 solo cambia con T en los límites de
+  tabla_inventario.LIMITES_BANDAS y, hasta T = 365, cada día (los módulos
+  STORAGE dependen de min(T, 365)). Cada rango de duraciones se parte en
+  tramos de inventario constante y se evalúa un representante por tramo
+  (Fase1.calcular_modulos_arka_batch).
+- La colocación de Fase2 solo depende del inventario: se ejecuta una vez por
+  inventario distinto, a través de la cache por inventario
+  (cache_colocacion.py), así que los barridos repetidos o solapados
+  reutilizan las colocaciones anteriores.
+- El total de módulos del layout depende además del número de access cores
+  (Fase3.numero_access_cores), que cambia con P y en T = 600 (límite de
+  banda): se cuenta con Fase3.calcular_layout para cada valor distinto.
+- Los tramos de duración consecutivos con el mismo resultado se unen en una
+  fila.
+
+El dominio completo (300 x 3650 x 2 misiones) se reduce a unos 222 000
+tramos y unos 44 000 inventarios distintos. Las colocaciones se reparten en
+paquetes entre procesos (barrer usa un ProcessPoolExecutor propio; POST
+/api/v1/sweep, el pool de lotes de main.py).
+
+USO:
+    python barrido.py [--pasajeros 1 300] [--duraciones 1 3650]
+                      [--cientifica | --no-cientifica] [--procesos N]
+                      [--salida barrido.json]
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+import Fase1
+import Fase2
+import Fase3
+import cache_colocacion
+import tabla_inventario
+
+COSTO_POR_MODULO = 3500  # ARKHA por módulo, igual que metadata.estimatedCost
+
+# Inventarios colocados por tarea enviada al pool
+TAMANO_PAQUETE = 32
+
+# Tarea de colocación: (inventario como tupla de 27 cantidades,
+#                       ((P, T) representante de cada número de access cores, ...))
+Tarea = Tuple[Tuple[int, ...], Tuple[Tuple[int, int], ...]]
+
+# Resultado de una tarea: (arkas, {access cores: módulos totales}, eficiencia %)
+ResultadoTarea = Tuple[int, Dict[int, int], float]
+
+
+class PlanBarrido(NamedTuple):
+    """
+    Tramos del barrido y colocaciones necesarias para resolverlos
+
+    Cada tramo es un (P, TipoC, [desde, hasta]) de inventario constante; los
+    arrays por tramo están ordenados por P, TipoC y duración.
+    """
+    pasajeros: np.ndarray      # int[tramos]
+    cientificas: np.ndarray    # bool[tramos]
+    desde: np.ndarray          # int[tramos], primera duración del tramo
+    hasta: np.ndarray          # int[tramos], última duración del tramo
+    inventario: np.ndarray     # int[tramos], índice en tareas
+    access_cores: np.ndarray   # int[tramos]
+    tareas: List[Tarea]        # una por inventario distinto
+    misiones: int              # misiones (P, T, TipoC) cubiertas
+
+
+def tramos_duracion(T_min: int, T_max: int) -> List[Tuple[int, int]]:
+    """
+    Parte [T_min, T_max] en tramos donde el inventario de Fase1 no cambia
+
+    Hasta T = 365 cada día es un tramo (módulos STORAGE); a partir de ahí
+    solo se corta en los límites de LIMITES_BANDAS.
+
+    Returns:
+        List: (desde, hasta) de cada tramo, ambos inclusive
+    """
+    inicios = set(range(T_min, min(T_max, tabla_inventario.T_ALMACEN_MAX) + 1))
+    inicios.add(T_min)
+    inicios.update(limite + 1 for limite in (tabla_inventario.T_ALMACEN_MAX,) + tabla_inventario.LIMITES_BANDAS
+                   if T_min < limite + 1 <= T_max)
+    inicios = sorted(inicios)
+    return list(zip(inicios, [inicio - 1 for inicio in inicios[1:]] + [T_max]))
+
+
+def planificar(pasajeros: Tuple[int, int], duraciones: Tuple[int, int],
+               cientificas: Sequence[bool] = (False, True)) -> PlanBarrido:
+    """
+    Calcula el inventario de cada tramo y agrupa los inventarios repetidos
+
+    Args:
+        pasajeros: (mínimo, máximo) de P, inclusive
+        duraciones: (mínimo, máximo) de T en días, inclusive
+        cientificas: Valores de TipoC a barrer
+
+    Returns:
+        PlanBarrido: Tramos y tareas de colocación (una por inventario distinto)
+    """
+    tramos = np.array(tramos_duracion(*duraciones), dtype=np.int64)
+    cientificas = sorted(set(bool(c) for c in cientificas))
+    P, C, indice_tramo = np.meshgrid(np.arange(pasajeros[0], pasajeros[1] + 1), cientificas,
+                                     np.arange(len(tramos)), indexing="ij")
+    P, C, indice_tramo = P.ravel(), C.ravel(), indice_tramo.ravel()
+    desde, hasta = tramos[indice_tramo, 0], tramos[indice_tramo, 1]
+
+    modulos, _, _ = Fase1.calcular_modulos_arka_batch(P, desde, C)
+    # Cada inventario como un único valor de 54 bytes: np.unique 1-D es mucho
+    # más rápido que con axis=0
+    filas = np.ascontiguousarray(modulos.astype(np.uint16)).view(np.dtype((np.void, 2 * modulos.shape[1])))
+    _, primera, inventario = np.unique(filas.ravel(), return_index=True, return_inverse=True)
+
+    access_cores = np.array([Fase3.numero_access_cores(p, t) for p, t in zip(P.tolist(), desde.tolist())],
+                            dtype=np.int64)
+
+    # Un (P, T) representante por cada combinación (inventario, access cores)
+    representantes: List[Dict[int, Tuple[int, int]]] = [{} for _ in primera]
+    combinaciones = inventario * (int(access_cores.max()) + 1) + access_cores
+    for i in np.unique(combinaciones, return_index=True)[1].tolist():
+        representantes[inventario[i]].setdefault(int(access_cores[i]), (int(P[i]), int(desde[i])))
+    tareas = [
+        (tuple(modulos[indice].tolist()), tuple(representantes[j].values()))
+        for j, indice in enumerate(primera.tolist())
+    ]
+    return PlanBarrido(P, C, desde, hasta, inventario, access_cores, tareas,
+                       int((hasta - desde + 1).sum()))
+
+
+def colocar_inventarios(tareas: List[Tarea]) -> List[ResultadoTarea]:
+    """
+    Coloca cada inventario con Fase2 y cuenta los módulos de su layout
+
+    Es de nivel superior para poder enviarse a un pool de procesos.
+
+    Returns:
+        List: (arkas, {access cores: módulos totales}, eficiencia %) por tarea
+    """
+    resultados = []
+    for cantidades, representantes in tareas:
+        inventario = dict(zip(tabla_inventario.CODIGOS, cantidades))
+        arkas, _ = cache_colocacion.colocar(inventario)
+        totales = {}
+        for P, T in representantes:
+            layout, _, _ = Fase3.calcular_layout(arkas, P, T)
+            totales[Fase3.numero_access_cores(P, T)] = len(layout.codigos)
+        resultados.append((len(arkas), totales, Fase2.calcular_estadisticas(arkas, inventario)["eficiencia"]))
+    return resultados
+
+
+def paquetes(tareas: List[Tarea], tamano: int = TAMANO_PAQUETE) -> List[List[Tarea]]:
+    """Divide las tareas en paquetes de `tamano` para el pool"""
+    return [tareas[i:i + tamano] for i in range(0, len(tareas), tamano)]
+
+
+def combinar(plan: PlanBarrido, resultados: List[ResultadoTarea]) -> Dict:
+    """
+    Tabla del barrido a partir de los resultados de cada tarea
+
+    Une los tramos consecutivos (mismo P y TipoC) con el mismo resultado.
+
+    Returns:
+        dict: Columnas de la tabla (una posición por fila) y totales del barrido
+    """
+    arkas = np.array([resultado[0] for resultado in resultados], dtype=np.int64)[plan.inventario]
+    eficiencia = np.round(np.array([resultado[2] for resultado in resultados]), 2)[plan.inventario]
+    total_modulos = np.array([resultados[j][1][c] for j, c in zip(plan.inventario.tolist(),
+                                                                   plan.access_cores.tolist())], dtype=np.int64)
+
+    # Nueva fila donde cambia P, TipoC o el resultado respecto al tramo anterior
+    nueva = np.ones(len(arkas), dtype=bool)
+    nueva[1:] = ((plan.pasajeros[1:] != plan.pasajeros[:-1]) | (plan.cientificas[1:] != plan.cientificas[:-1])
+                 | (arkas[1:] != arkas[:-1]) | (total_modulos[1:] != total_modulos[:-1])
+                 | (eficiencia[1:] != eficiencia[:-1]))
+    inicios = np.flatnonzero(nueva)
+    finales = np.append(inicios[1:] - 1, len(arkas) - 1)
+
+    return {
+        "count": int(len(inicios)),
+        "missions": plan.misiones,
+        "segments": int(len(arkas)),
+        "uniqueInventories": len(plan.tareas),
+        "passengers": plan.pasajeros[inicios].tolist(),
+        "isScientific": plan.cientificas[inicios].tolist(),
+        "durationFrom": plan.desde[inicios].tolist(),
+        "durationTo": plan.hasta[finales].tolist(),
+        "arkas": arkas[inicios].tolist(),
+        "totalModules": total_modulos[inicios].tolist(),
+        "estimatedCost": (total_modulos[inicios] * COSTO_POR_MODULO).tolist(),
+        "efficiency": eficiencia[inicios].tolist(),
+    }
+
+
+def barrer(pasajeros: Tuple[int, int] = (1, tabla_inventario.P_MAX),
+           duraciones: Tuple[int, int] = (1, tabla_inventario.T_MAX),
+           cientificas: Sequence[bool] = (False, True), procesos: Optional[int] = None) -> Dict:
+    """
+    Barrido completo: planificar → colocar cada inventario distinto → combinar
+
+    Args:
+        pasajeros: (mínimo, máximo) de P, inclusive
+        duraciones: (mínimo, máximo) de T en días, inclusive
+        cientificas: Valores de TipoC a barrer
+        procesos: Procesos para las colocaciones (por defecto, número de CPUs;
+                  1 = en este proceso)
+
+    Returns:
+        dict: Tabla del barrido (ver combinar)
+    """
+    plan = planificar(pasajeros, duraciones, cientificas)
+    procesos = procesos or os.cpu_count() or 1
+    if procesos == 1:
+        resultados = colocar_inventarios(plan.tareas)
+    else:
+        with ProcessPoolExecutor(max_workers=procesos) as pool:
+            resultados = [resultado for paquete in pool.map(colocar_inventarios, paquetes(plan.tareas))
+                          for resultado in paquete]
+    return combinar(plan, resultados)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Barrido de pasajeros x duraciones con deduplicación por bandas")
+    parser.add_argument("--pasajeros", type=int, nargs=2, default=(1, tabla_inventario.P_MAX),
+                        metavar=("MIN", "MAX"), help="Rango de pasajeros (inclusive)")
+    parser.add_argument("--duraciones", type=int, nargs=2, default=(1, tabla_inventario.T_MAX),
+                        metavar=("MIN", "MAX"), help="Rango de duraciones en días (inclusive)")
+    tipo = parser.add_mutually_exclusive_group()
+    tipo.add_argument("--cientifica", action="store_true", help="Solo misiones científicas")
+    tipo.add_argument("--no-cientifica", action="store_true", help="Solo misiones no científicas")
+    parser.add_argument("--procesos", type=int, help="Procesos para las colocaciones (por defecto, nº CPUs)")
+    parser.add_argument("--salida", help="Archivo JSON con la tabla completa")
+    args = parser.parse_args()
+
+    cientificas = (True,) if args.cientifica else (False,) if args.no_cientifica else (False, True)
+    inicio = time.perf_counter()
+    tabla = barrer(tuple(args.pasajeros), tuple(args.duraciones), cientificas, args.procesos)
+    segundos = time.perf_counter() - inicio
+
+    print(f"{tabla['missions']} misiones → {tabla['segments']} tramos → "
+          f"{tabla['uniqueInventories']} inventarios distintos → {tabla['count']} filas ({segundos:.1f} s)")
+    print(f"{'P':>4}{'científica':>11}{'T desde':>9}{'T hasta':>9}{'arkas':>7}{'módulos':>9}{'coste':>10}{'eficiencia':>12}")
+    for i in range(min(tabla["count"], 20)):
+        print(f"{tabla['passengers'][i]:>4}{'sí' if tabla['isScientific'][i] else 'no':>11}"
+              f"{tabla['durationFrom'][i]:>9}{tabla['durationTo'][i]:>9}{tabla['arkas'][i]:>7}"
+              f"{tabla['totalModules'][i]:>9}{tabla['estimatedCost'][i]:>10}{tabla['efficiency'][i]:>11.1f}%")
+    if tabla["count"] > 20:
+        print(f"... {tabla['count'] - 20} filas más")
+
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(tabla, f)
+        print(f"Tabla guardada en {args.salida}")
@@ -0,0 +1,74 @@
+"""
+===============================================================================
+BENCHMARK DE COLOCACIÓN (FASE 2)
+===============================================================================
+
+Coloca el inventario de Fase1 para P = 1..P_MAX con y sin la cache de scores
+de ContextoColocacion y compara:
+- huecos consultados en encontrar_mejor_posicion
+- scores evaluados desde cero (sin cache, uno por hueco consultado)
+- tiempo total de colocación
+
+También comprueba que ambos modos producen exactamente las mismas arkas.
+
+Con --traza se activa la traza DEBUG de colocación de Fase2 (escrita en
+/dev/null) para medir cuánto cuesta tenerla encendida.
+
+USO:
+    python benchmark_colocacion.py [--p-max 300] [--duracion 365] [--cientifica] [--traza]
+"""
+
+import argparse
+import logging
+import os
+import time
+
+import Fase1
+import Fase2
+
+
+def medir(inventarios, cache_scores: bool):
+    """
+    Coloca todos los inventarios con un mismo contexto
+
+    Returns:
+        Tuple: (arkas de cada inventario, contexto, segundos)
+    """
+    contexto = Fase2.ContextoColocacion(cache_scores=cache_scores)
+    resultados = []
+    inicio = time.perf_counter()
+    for inventario in inventarios:
+        resultados.append(contexto.colocar_inventario_completo(inventario))
+    segundos = time.perf_counter() - inicio
+    return resultados, contexto, segundos
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluaciones de score en la colocación, con y sin cache")
+    parser.add_argument("--p-max", type=int, default=300, help="Pasajeros máximos (se recorre 1..P_MAX)")
+    parser.add_argument("--duracion", type=int, default=365, help="Duración de la misión en días")
+    parser.add_argument("--cientifica", action="store_true", help="Misión científica")
+    parser.add_argument("--traza", action="store_true", help="Activa la traza DEBUG de colocación (a /dev/null)")
+    args = parser.parse_args()
+
+    if args.traza:
+        logging.basicConfig(level=logging.DEBUG, stream=open(os.devnull, "w"),
+                            format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    inventarios = [Fase1.calcular_modulos_arka(P, args.duracion, args.cientifica)[0]
+                   for P in range(1, args.p_max + 1)]
+
+    sin_cache, contexto_sin, segundos_sin = medir(inventarios, cache_scores=False)
+    con_cache, contexto_con, segundos_con = medir(inventarios, cache_scores=True)
+
+    if sin_cache != con_cache:
+        raise SystemExit("ERROR: la cache de scores cambia el resultado de la colocación")
+
+    print(f"P=1..{args.p_max}, T={args.duracion}, científica={args.cientifica}, traza={args.traza}")
+    print(f"{'modo':<12}{'huecos':>12}{'scores':>12}{'segundos':>12}")
+    for nombre, contexto, segundos in (("sin cache", contexto_sin, segundos_sin),
+                                       ("con cache", contexto_con, segundos_con)):
+        print(f"{nombre:<12}{contexto.huecos_evaluados:>12}{contexto.evaluaciones_score:>12}{segundos:>12.2f}")
+
+    reduccion = 1 - contexto_con.evaluaciones_score / max(contexto_sin.evaluaciones_score, 1)
+    print(f"Reducción de evaluaciones de score: {reduccion:.1%}")
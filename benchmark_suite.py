@@ -0,0 +1,324 @@
+"""
+===============================================================================
+SUITE DE BENCHMARKS (FASES Y RUTA HTTP COMPLETA)
+===============================================================================
+
+Mide cada pieza del pipeline para P en {1, 10, 30, 100, 300} y una duración
+por banda de tabla_inventario.LIMITES_BANDAS, y guarda los resultados en JSON
+para comparar entre commits.
+
+MICRO-BENCHMARKS (por misión):
+- fase1.calcular_modulos_arka: reglas de Fase1 (sin la tabla precalculada)
+- fase2.es_valida / fase2.calcular_score: huecos libres de las arkas a mitad
+  de colocación (antes de rellenar con 006) para cada tipo del inventario;
+  el tiempo es por consulta
+- fase2.colocar_inventario_completo
+- fase3.anadir_modulos_por_arka
+- fase2.direccion: arkas 1..1000 (una sola vez, no depende de la misión)
+- fase2.reglas_listas / fase2.reglas_compiladas / fase2.reglas_bits: la
+  consulta de restricción y prioridad de un par (módulo, vecino) recorriendo
+  las listas editables de Fase2 (como antes de compilarlas), con el frozenset
+  y el diccionario compilados, y con las tablas por código entero que usa la
+  colocación; los 27 x 27 pares, una sola vez, tiempo por par
+
+EXTREMO A EXTREMO (ASGI en proceso, sin red):
+- e2e.generate_layout: POST /api/v1/generate-layout con la cache de layouts
+  y la de colocaciones desactivadas
+- e2e.generate_layout_cached: la misma petición servida desde la cache
+
+Cada medida repite el bucle hasta que dura al menos --minimo segundos y
+toma el mejor y la mediana de --repeticiones repeticiones (en µs por llamada).
+
+USO:
+    python benchmark_suite.py [--salida resultados.json] [--comparar anterior.json]
+                              [--umbral 0.10] [--pasajeros 1 10 30 100 300]
+                              [--cientifica] [--sin-e2e]
+
+Con --comparar se muestra la variación de cada medida respecto al archivo
+anterior y el proceso termina con código 1 si alguna empeora más que --umbral.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List
+
+import numpy as np
+
+import Fase1
+import Fase2
+import Fase3
+import tabla_inventario
+
+PASAJEROS = (1, 10, 30, 100, 300)
+DURACIONES = tabla_inventario.LIMITES_BANDAS
+NUM_PARES = (Fase2.NUM_CODIGOS - 1) ** 2
+
+
+def _medir(fn: Callable[[], None], repeticiones: int, minimo: float) -> Dict:
+    """
+    Mejor y mediana (µs por llamada) de `repeticiones` tandas de fn()
+
+    El número de llamadas por tanda se ajusta para que dure al menos `minimo` s.
+    """
+    llamadas = 1
+    while True:
+        inicio = time.perf_counter()
+        for _ in range(llamadas):
+            fn()
+        if time.perf_counter() - inicio >= minimo:
+            break
+        llamadas *= 2
+
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        for _ in range(llamadas):
+            fn()
+        tiempos.append((time.perf_counter() - inicio) / llamadas * 1e6)
+    return {"bestUs": min(tiempos), "medianUs": statistics.median(tiempos), "loops": llamadas}
+
+
+def _consultas_huecos(contexto: Fase2.ContextoColocacion, inventario: Dict[str, int]) -> List[tuple]:
+    """(arka, piso, cara, código) de cada hueco libre y cada tipo del inventario"""
+    codigos = [Fase2.CODIGO_DE_MODULO[modulo] for modulo, cantidad in inventario.items() if cantidad]
+    consultas = []
+    for arka in contexto.arkas:
+        for indice in range(arka.pisos * 4):
+            if (arka.libres >> indice) & 1:
+                piso, cara = divmod(indice, 4)
+                consultas.extend((arka, piso, cara, codigo) for codigo in codigos)
+    return consultas
+
+
+def _reglas_por_par() -> Dict[str, Callable[[], list]]:
+    """
+    (prohibido, puntos de prioridad) de todos los pares de módulos, de tres formas
+
+    Raises:
+        SystemExit: Si las tres formas no dan el mismo resultado
+    """
+    modulos = Fase2.MODULO_DE_CODIGO[1:]
+    pares = [(modulo, vecino) for modulo in modulos for vecino in modulos]
+    pares_codigos = [(Fase2.CODIGO_DE_MODULO[modulo], Fase2.CODIGO_DE_MODULO[vecino]) for modulo, vecino in pares]
+    prohibidas, prioridades = Fase2.restricciones_prohibidas, Fase2.prioridades
+    compiladas, puntos = Fase2.RESTRICCIONES_COMPILADAS, Fase2.PUNTOS_PRIORIDAD
+    bits, tabla = Fase2.BITS_PROHIBIDOS, Fase2.TABLA_PUNTOS
+
+    variantes = {
+        "fase2.reglas_listas": lambda: [
+            ((modulo, vecino) in prohibidas,
+             10 * ((modulo, vecino) in prioridades) + 10 * ((vecino, modulo) in prioridades))
+            for modulo, vecino in pares],
+        "fase2.reglas_compiladas": lambda: [
+            ((modulo, vecino) in compiladas, puntos.get((modulo, vecino), 0))
+            for modulo, vecino in pares],
+        "fase2.reglas_bits": lambda: [
+            (bool(bits[modulo] >> vecino & 1), tabla[modulo][vecino])
+            for modulo, vecino in pares_codigos],
+    }
+    referencia = variantes["fase2.reglas_listas"]()
+    for nombre, consultar in variantes.items():
+        if consultar() != referencia:
+            raise SystemExit(f"ERROR: {nombre} no coincide con las listas editables de Fase2")
+    return variantes
+
+
+def micro_benchmarks(pasajeros, TipoC: bool, repeticiones: int, minimo: float) -> List[Dict]:
+    """Micro-benchmarks de cada fase para todas las misiones"""
+    resultados = []
+
+    def anotar(nombre: str, medida: Dict, **mision):
+        resultados.append({"name": nombre, **mision, **medida})
+        detalle = " ".join(f"{clave}={valor}" for clave, valor in mision.items())
+        print(f"{nombre:<34}{detalle:<40}{medida['bestUs']:>12.2f} µs")
+
+    direcciones = range(1, 1001)
+    anotar("fase2.direccion", _medir(lambda: [Fase2.direccion(n) for n in direcciones], repeticiones, minimo),
+           arkas=len(direcciones))
+
+    for nombre, consultar in _reglas_por_par().items():
+        medida = _medir(consultar, repeticiones, minimo)
+        anotar(nombre, {**medida, "bestUs": medida["bestUs"] / NUM_PARES,
+                        "medianUs": medida["medianUs"] / NUM_PARES}, pares=NUM_PARES)
+
+    for P in pasajeros:
+        for T in DURACIONES:
+            mision = {"passengers": P, "duration": T, "isScientific": TipoC}
+            inventario = Fase1.calcular_modulos_arka(P, T, TipoC)[0]
+            contexto = Fase2.ContextoColocacion()
+            arkas = contexto.colocar_inventario_completo(inventario)
+
+            anotar("fase1.calcular_modulos_arka",
+                   _medir(lambda: Fase1.calcular_modulos_arka(P, T, TipoC), repeticiones, minimo), **mision)
+
+            consultas = _consultas_huecos(contexto, inventario)
+            if consultas:
+                medida = _medir(lambda: [contexto.es_valida(*consulta) for consulta in consultas],
+                                repeticiones, minimo)
+                anotar("fase2.es_valida", {**medida, "bestUs": medida["bestUs"] / len(consultas),
+                                           "medianUs": medida["medianUs"] / len(consultas)}, **mision)
+                validas = [consulta for consulta in consultas if contexto.es_valida(*consulta)]
+                if validas:
+                    medida = _medir(lambda: [contexto.calcular_score(*consulta) for consulta in validas],
+                                    repeticiones, minimo)
+                    anotar("fase2.calcular_score", {**medida, "bestUs": medida["bestUs"] / len(validas),
+                                                    "medianUs": medida["medianUs"] / len(validas)}, **mision)
+
+            anotar("fase2.colocar_inventario_completo",
+                   _medir(lambda: Fase2.colocar_inventario_completo(inventario), repeticiones, minimo), **mision)
+            anotar("fase3.anadir_modulos_por_arka",
+                   _medir(lambda: Fase3.añadir_modulos_por_arka(arkas, P, T, TipoC), repeticiones, minimo),
+                   **mision)
+    return resultados
+
+
+async def _medir_async(fn, repeticiones: int, minimo: float) -> Dict:
+    """Como _medir, para una corrutina"""
+    llamadas = 1
+    while True:
+        inicio = time.perf_counter()
+        for _ in range(llamadas):
+            await fn()
+        if time.perf_counter() - inicio >= minimo:
+            break
+        llamadas *= 2
+
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        for _ in range(llamadas):
+            await fn()
+        tiempos.append((time.perf_counter() - inicio) / llamadas * 1e6)
+    return {"bestUs": min(tiempos), "medianUs": statistics.median(tiempos), "loops": llamadas}
+
+
+async def e2e_benchmarks(pasajeros, TipoC: bool, repeticiones: int, minimo: float) -> List[Dict]:
+    """POST /api/v1/generate-layout en proceso (httpx + ASGI), sin y con cache"""
+    import httpx
+
+    import cache_colocacion
+    import main
+    import tabla_colocaciones
+    from cache_layouts import CacheLayouts
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)  # una línea INFO por petición
+    resultados = []
+    async with main.app.router.lifespan_context(main.app):
+        sin_cache = CacheLayouts(max_bytes=0)
+        con_cache = main.cache
+        colocaciones = cache_colocacion.obtener_cache()
+        tablas = tabla_colocaciones.obtener_tablas()
+        transporte = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transporte, base_url="http://benchmark") as cliente:
+            for P in pasajeros:
+                for T in DURACIONES:
+                    cuerpo = {"passengers": P, "duration": T, "terrain": "moon", "isScientific": TipoC}
+
+                    async def peticion():
+                        respuesta = await cliente.post("/api/v1/generate-layout", json=cuerpo)
+                        respuesta.raise_for_status()
+
+                    mision = {"passengers": P, "duration": T, "isScientific": TipoC}
+                    for nombre, cache in (("e2e.generate_layout", sin_cache),
+                                          ("e2e.generate_layout_cached", con_cache)):
+                        main.cache = cache
+                        cache_colocacion._cache = (cache_colocacion.CacheColocacion(max_bytes=0)
+                                                   if cache is sin_cache else colocaciones)
+                        tabla_colocaciones._tablas = None if cache is sin_cache else tablas
+                        medida = await _medir_async(peticion, repeticiones, minimo)
+                        resultados.append({"name": nombre, **mision, **medida})
+                        print(f"{nombre:<34}{f'passengers={P} duration={T}':<40}{medida['bestUs']:>12.2f} µs")
+        main.cache = con_cache
+        cache_colocacion._cache = colocaciones
+        tabla_colocaciones._tablas = tablas
+    return resultados
+
+
+def _commit() -> str:
+    """Commit actual del repositorio (vacío si no es un repositorio git)"""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return ""
+
+
+def _clave(resultado: Dict) -> tuple:
+    return (resultado["name"], resultado.get("passengers"), resultado.get("duration"),
+            resultado.get("isScientific"), resultado.get("arkas"), resultado.get("pares"))
+
+
+def comparar(anterior: Dict, actual: Dict, umbral: float) -> int:
+    """
+    Muestra la variación de cada medida (mejor tiempo) respecto a `anterior`
+
+    Returns:
+        int: Número de medidas que empeoran más que `umbral`
+    """
+    previos = {_clave(resultado): resultado for resultado in anterior["results"]}
+    regresiones = 0
+    print(f"\nComparación con {anterior['meta'].get('commit') or 'anterior'} (umbral {umbral:.0%})")
+    for resultado in actual["results"]:
+        previo = previos.get(_clave(resultado))
+        if previo is None:
+            continue
+        variacion = resultado["bestUs"] / previo["bestUs"] - 1
+        if variacion > umbral:
+            regresiones += 1
+            marca = "REGRESIÓN"
+        elif variacion < -umbral:
+            marca = "mejora"
+        else:
+            continue
+        mision = f"P={resultado.get('passengers')} T={resultado.get('duration')}" if "passengers" in resultado else ""
+        print(f"{marca:<11}{resultado['name']:<34}{mision:<16}"
+              f"{previo['bestUs']:>10.2f} → {resultado['bestUs']:>10.2f} µs ({variacion:+.1%})")
+    print(f"{regresiones} regresiones")
+    return regresiones
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks de cada fase y de la ruta HTTP completa")
+    parser.add_argument("--salida", default="benchmark_resultados.json", help="Archivo JSON de resultados")
+    parser.add_argument("--comparar", help="JSON de una ejecución anterior con el que comparar")
+    parser.add_argument("--umbral", type=float, default=0.10, help="Empeoramiento relativo que cuenta como regresión")
+    parser.add_argument("--pasajeros", type=int, nargs="+", default=list(PASAJEROS), help="Valores de P")
+    parser.add_argument("--cientifica", action="store_true", help="Misiones científicas")
+    parser.add_argument("--repeticiones", type=int, default=5, help="Tandas por medida")
+    parser.add_argument("--minimo", type=float, default=0.02, help="Duración mínima de cada tanda en segundos")
+    parser.add_argument("--sin-e2e", action="store_true", help="Omite los benchmarks HTTP en proceso")
+    args = parser.parse_args()
+
+    resultados = micro_benchmarks(args.pasajeros, args.cientifica, args.repeticiones, args.minimo)
+    if not args.sin_e2e:
+        resultados += asyncio.run(e2e_benchmarks(args.pasajeros, args.cientifica, args.repeticiones, args.minimo))
+
+    informe = {
+        "meta": {
+            "commit": _commit(),
+            "generatedAt": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "python": sys.version.split()[0],
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "repetitions": args.repeticiones,
+            "minimumSeconds": args.minimo,
+        },
+        "results": resultados,
+    }
+    with open(args.salida, "w", encoding="utf-8") as f:
+        json.dump(informe, f, indent=2, ensure_ascii=False)
+    print(f"\nResultados guardados en {args.salida}: {len(resultados)} medidas")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            if comparar(json.load(f), informe, args.umbral):
+                raise SystemExit(1)
@@ -0,0 +1,307 @@
+"""
+===============================================================================
+CACHE DE COLOCACIONES POR INVENTARIO
+===============================================================================
+
+Fase2.colocar_inventario_completo solo depende del inventario de Fase1, y
+muchas misiones distintas (P, T, TipoC, terreno) tienen el mismo inventario:
+las duraciones de una misma banda, los cuatro terrenos... Esta cache guarda
+la lista de arkas colocadas con una clave derivada del inventario, así que
+acierta en misiones que la cache de layouts (por parámetros exactos, ver
+cache_layouts.py) nunca ha visto. Fase3 añade después lo que depende de P y
+T (número de access cores).
+
+CLAVE:
+- Hash BLAKE2b del vector de cantidades en el orden de
+  tabla_inventario.CODIGOS (uint16), precedido de VERSION_COLOCACION: no
+  depende del orden del diccionario ni de si faltan los módulos a 0.
+
+NIVELES:
+0. Tabla precalculada (tabla_colocaciones.py): todos los inventarios del
+   dominio, construida en el build de la imagen y abierta con memory-map.
+   Sus aciertos no pasan por la cache.
+1. Memoria: LRU acotado por bytes, por proceso y seguro entre hilos
+2. Compartido (opcional): base de datos sqlite (modo WAL) que comparten los
+   workers de uvicorn y los procesos del pool de ejecución. Expulsa las
+   entradas usadas hace más tiempo por encima de un máximo de entradas.
+
+Las arkas se guardan serializadas con orjson (datos planos, sin pickle) y se
+deserializan en cada acierto: quien las recibe puede modificarlas sin
+afectar a la cache. Un error de sqlite (bloqueo, disco lleno...) se registra
+y se trata como un fallo: nunca hace fallar el layout.
+
+CONFIGURACIÓN (variables de entorno):
+- ARKHA_PLACEMENT_CACHE_MAX_BYTES: tamaño máximo en memoria (por defecto 32 MiB, 0 = sin nivel en memoria)
+- ARKHA_PLACEMENT_CACHE_DB: ruta de la base de datos sqlite (vacío = sin nivel compartido)
+- ARKHA_PLACEMENT_CACHE_DB_MAX_ENTRIES: entradas máximas en sqlite (por defecto 100000)
+
+IMPORTANTE: Incrementar VERSION_COLOCACION si cambia el resultado de Fase2
+(también invalida la tabla precalculada, ver tabla_colocaciones.metadatos).
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import orjson
+
+import Fase2
+import tabla_colocaciones
+import tabla_inventario
+
+logger = logging.getLogger(__name__)
+
+VERSION_COLOCACION = 1
+
+ORIGEN_PRECALCULADO = "prebuilt"
+ORIGEN_MEMORIA = "hit"
+ORIGEN_COMPARTIDO = "shared_hit"
+ORIGEN_CALCULADO = "miss"
+
+# Cada cuántas inserciones en sqlite se comprueba el máximo de entradas
+_INTERVALO_EXPULSION = 64
+
+_cache: Optional["CacheColocacion"] = None
+_cache_lock = threading.Lock()
+
+
+def clave_inventario(inventario: Dict[str, int]) -> str:
+    """Hash canónico del inventario (independiente del orden de las claves)"""
+    vector = np.array([inventario.get(codigo, 0) for codigo in tabla_inventario.CODIGOS], dtype="<u2")
+    resumen = hashlib.blake2b(vector.tobytes(), digest_size=16).hexdigest()
+    return f"v{VERSION_COLOCACION}-{resumen}"
+
+
+class CacheColocacion:
+    """
+    Cache LRU de colocaciones de Fase2 por inventario, con nivel sqlite opcional
+
+    Es segura entre hilos: el LRU se modifica bajo un lock y cada hilo (y
+    cada proceso) abre su propia conexión a sqlite.
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024, ruta_db: Optional[str] = None,
+                 max_entradas_db: int = 100000):
+        if max_bytes < 0:
+            raise ValueError("max_bytes debe ser >= 0")
+        if max_entradas_db < 1:
+            raise ValueError("max_entradas_db debe ser >= 1")
+        self.max_bytes = max_bytes
+        self.ruta_db = ruta_db
+        self.max_entradas_db = max_entradas_db
+
+        self._entradas: "OrderedDict[str, bytes]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._inserciones_db = 0
+
+        self.aciertos = 0
+        self.aciertos_compartidos = 0
+        self.fallos = 0
+        self.expulsiones = 0
+        self.expulsiones_compartidas = 0
+
+        if ruta_db:
+            directorio = os.path.dirname(os.path.abspath(ruta_db))
+            os.makedirs(directorio, exist_ok=True)
+            try:
+                self._conexion()  # crea la tabla
+            except sqlite3.Error:
+                logger.warning("No se pudo abrir la cache de colocaciones %s", ruta_db, exc_info=True)
+
+    @classmethod
+    def desde_entorno(cls) -> "CacheColocacion":
+        """Crea la cache a partir de las variables ARKHA_PLACEMENT_CACHE_*"""
+        return cls(
+            max_bytes=int(os.environ.get("ARKHA_PLACEMENT_CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+            ruta_db=os.environ.get("ARKHA_PLACEMENT_CACHE_DB") or None,
+            max_entradas_db=int(os.environ.get("ARKHA_PLACEMENT_CACHE_DB_MAX_ENTRIES", "100000")),
+        )
+
+    def _conexion(self) -> sqlite3.Connection:
+        """Conexión sqlite de este hilo (y proceso: no se reutiliza tras un fork)"""
+        conexion = getattr(self._local, "conexion", None)
+        if conexion is None or self._local.pid != os.getpid():
+            conexion = sqlite3.connect(self.ruta_db, timeout=30, isolation_level=None)
+            conexion.execute("PRAGMA journal_mode=WAL")
+            conexion.execute("PRAGMA synchronous=NORMAL")
+            conexion.execute(
+                "CREATE TABLE IF NOT EXISTS colocaciones "
+                "(clave TEXT PRIMARY KEY, arkas BLOB NOT NULL, usado REAL NOT NULL)"
+            )
+            conexion.execute("CREATE INDEX IF NOT EXISTS colocaciones_usado ON colocaciones (usado)")
+            self._local.conexion = conexion
+            self._local.pid = os.getpid()
+        return conexion
+
+    def obtener(self, inventario: Dict[str, int]) -> Tuple[Optional[List[Dict]], str]:
+        """
+        Busca la colocación de un inventario en memoria y después en sqlite
+
+        Returns:
+            Tuple: (arkas o None, origen: "hit", "shared_hit" o "miss")
+        """
+        clave = clave_inventario(inventario)
+        with self._lock:
+            datos = self._entradas.get(clave)
+            if datos is not None:
+                self._entradas.move_to_end(clave)
+                self.aciertos += 1
+                return orjson.loads(datos), ORIGEN_MEMORIA
+
+        if self.ruta_db:
+            try:
+                conexion = self._conexion()
+                fila = conexion.execute("SELECT arkas FROM colocaciones WHERE clave = ?", (clave,)).fetchone()
+            except sqlite3.Error:
+                logger.warning("No se pudo leer la cache de colocaciones %s", self.ruta_db, exc_info=True)
+                fila = None
+            if fila is not None:
+                try:
+                    conexion.execute("UPDATE colocaciones SET usado = ? WHERE clave = ?", (time.time(), clave))
+                except sqlite3.Error:
+                    logger.debug("No se pudo actualizar el uso de %s", clave, exc_info=True)
+                datos = bytes(fila[0])
+                with self._lock:
+                    self.aciertos_compartidos += 1
+                    self._guardar_en_memoria(clave, datos)
+                return orjson.loads(datos), ORIGEN_COMPARTIDO
+
+        with self._lock:
+            self.fallos += 1
+        return None, ORIGEN_CALCULADO
+
+    def guardar(self, inventario: Dict[str, int], arkas: List[Dict]):
+        """Guarda la colocación en memoria y, si está configurado, en sqlite"""
+        clave = clave_inventario(inventario)
+        datos = orjson.dumps(arkas)
+        with self._lock:
+            self._guardar_en_memoria(clave, datos)
+            self._inserciones_db += 1
+            expulsar = self._inserciones_db % _INTERVALO_EXPULSION == 0
+
+        if self.ruta_db:
+            try:
+                conexion = self._conexion()
+                conexion.execute(
+                    "INSERT OR REPLACE INTO colocaciones (clave, arkas, usado) VALUES (?, ?, ?)",
+                    (clave, datos, time.time()),
+                )
+                if expulsar:
+                    self._expulsar_db(conexion)
+            except sqlite3.Error:
+                logger.warning("No se pudo escribir en la cache de colocaciones %s", self.ruta_db, exc_info=True)
+
+    def _expulsar_db(self, conexion: sqlite3.Connection):
+        """Borra de sqlite las entradas usadas hace más tiempo por encima de max_entradas_db"""
+        borradas = conexion.execute(
+            "DELETE FROM colocaciones WHERE clave IN "
+            "(SELECT clave FROM colocaciones ORDER BY usado DESC LIMIT -1 OFFSET ?)",
+            (self.max_entradas_db,),
+        ).rowcount
+        with self._lock:
+            self.expulsiones_compartidas += max(borradas, 0)
+
+    def _guardar_en_memoria(self, clave: str, datos: bytes):
+        """Inserta en el LRU y expulsa las entradas más antiguas hasta caber (con el lock tomado)"""
+        if len(datos) > self.max_bytes:
+            return
+        anterior = self._entradas.pop(clave, None)
+        if anterior is not None:
+            self._bytes -= len(anterior)
+        self._entradas[clave] = datos
+        self._bytes += len(datos)
+        while self._bytes > self.max_bytes:
+            _, expulsado = self._entradas.popitem(last=False)
+            self._bytes -= len(expulsado)
+            self.expulsiones += 1
+
+    def estadisticas(self) -> Dict[str, Any]:
+        """Contadores de aciertos, fallos y expulsiones, y ocupación en memoria"""
+        with self._lock:
+            return {
+                "entries": len(self._entradas),
+                "bytes": self._bytes,
+                "maxBytes": self.max_bytes,
+                "sharedTier": bool(self.ruta_db),
+                "hits": self.aciertos,
+                "sharedHits": self.aciertos_compartidos,
+                "misses": self.fallos,
+                "evictions": self.expulsiones,
+                "sharedEvictions": self.expulsiones_compartidas,
+            }
+
+
+def obtener_cache() -> CacheColocacion:
+    """Cache de este proceso, creada desde el entorno la primera vez"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = CacheColocacion.desde_entorno()
+    return _cache
+
+
+def buscar(inventario: Dict[str, int]) -> Tuple[Optional[List[Dict]], str]:
+    """
+    Colocación del inventario en la tabla precalculada o en la cache, sin calcularla
+
+    Returns:
+        Tuple: (arkas o None, origen: "prebuilt", "hit", "shared_hit" o "miss")
+    """
+    arkas = tabla_colocaciones.colocacion(inventario)
+    if arkas is not None:
+        return arkas, ORIGEN_PRECALCULADO
+    return obtener_cache().obtener(inventario)
+
+
+def colocar(inventario: Dict[str, int],
+            contexto: Optional[Fase2.ContextoColocacion] = None) -> Tuple[List[Dict], str]:
+    """
+    Fase2.colocar_inventario_completo a través de la tabla precalculada y la cache del proceso
+
+    Args:
+        inventario: Inventario de Fase1
+        contexto: Contexto donde colocar si no está en cache (para leer sus contadores)
+
+    Returns:
+        Tuple: (arkas, origen: "prebuilt", "hit", "shared_hit" o "miss")
+    """
+    arkas, origen = buscar(inventario)
+    if arkas is None:
+        arkas = (contexto or Fase2.ContextoColocacion()).colocar_inventario_completo(inventario)
+        obtener_cache().guardar(inventario, arkas)
+    return arkas, origen
+
+
+def colocar_incremental(inventario: Dict[str, int]) -> Tuple[Iterator[Dict], str]:
+    """
+    Como colocar, pero entregando las arkas una a una
+
+    Si la colocación no está en la tabla ni en la cache se calcula con
+    Fase2.colocar_inventario_incremental (cada arka sale en cuanto es
+    definitiva) y se guarda en la cache al terminar.
+
+    Returns:
+        Tuple: (iterador de arkas, origen: "prebuilt", "hit", "shared_hit" o "miss")
+    """
+    arkas, origen = buscar(inventario)
+    if arkas is not None:
+        return iter(arkas), origen
+    return _colocar_y_guardar(inventario), origen
+
+
+def _colocar_y_guardar(inventario: Dict[str, int]) -> Iterator[Dict]:
+    """Colocación incremental que guarda el resultado en la cache si se recorre entera"""
+    arkas = []
+    for arka in Fase2.ContextoColocacion().colocar_inventario_incremental(inventario):
+        arkas.append(arka)
+        yield arka
+    obtener_cache().guardar(inventario, arkas)
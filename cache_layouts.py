@@ -0,0 +1,168 @@
+"""
+===============================================================================
+CACHE DE RESULTADOS DE LAYOUTS
+===============================================================================
+
+Para unos mismos (passengers, duration, terrain, isScientific) el pipeline
+Fase1 → Fase2 → Fase3 es determinista salvo metadata.generatedAt, así que se
+guarda el cuerpo JSON ya serializado y, en cada acierto, solo se reescribe la
+marca de tiempo. El formato binario ARKL (layout_binario.py) se guarda con
+la misma clave más "bin"; no lleva marca de tiempo. El NDJSON completo
+(clave más "ndjson") sí la lleva, en su cabecera.
+
+NIVELES:
+1. Memoria: LRU acotado por bytes (suma del tamaño de los cuerpos guardados)
+2. Disco (opcional): un archivo por misión, sobrevive a reinicios y se
+   comparte entre workers de uvicorn. Al leerse se promueve a memoria.
+
+CONFIGURACIÓN (variables de entorno):
+- ARKHA_CACHE_MAX_BYTES: tamaño máximo en memoria (por defecto 64 MiB, 0 = sin nivel en memoria)
+- ARKHA_CACHE_DIR: directorio del nivel en disco (vacío = sin nivel en disco)
+
+IMPORTANTE: Incrementar VERSION_CACHE si cambia el resultado del algoritmo,
+para no servir layouts antiguos desde disco.
+"""
+
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import Fase3
+
+VERSION_CACHE = 2
+
+# (passengers, duration, terrain, isScientific) para el JSON; las demás
+# representaciones añaden su formato al final, p. ej. (..., "bin")
+ClaveLayout = Tuple
+
+# Representaciones que, como el JSON, llevan metadata.generatedAt (en el NDJSON, en la cabecera)
+FORMATOS_CON_MARCA = ("ndjson",)
+
+_PATRON_TIMESTAMP = re.compile(rb'"generatedAt":\s*"[^"]*"')
+
+
+def parchear_timestamp(cuerpo: bytes, timestamp: Optional[str] = None) -> bytes:
+    """Sustituye metadata.generatedAt del cuerpo JSON por la hora actual (o la indicada)"""
+    if timestamp is None:
+        timestamp = Fase3.generar_timestamp()
+    return _PATRON_TIMESTAMP.sub(b'"generatedAt":"' + timestamp.encode() + b'"', cuerpo, count=1)
+
+
+class CacheLayouts:
+    """
+    Cache LRU de cuerpos de respuesta acotado por bytes, con nivel en disco opcional
+
+    Es segura entre hilos: las operaciones sobre el LRU se hacen bajo un lock.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, directorio: Optional[str] = None):
+        if max_bytes < 0:
+            raise ValueError("max_bytes debe ser >= 0")
+        self.max_bytes = max_bytes
+        self.directorio = directorio
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+
+        self._entradas: "OrderedDict[ClaveLayout, bytes]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.aciertos = 0
+        self.aciertos_disco = 0
+        self.fallos = 0
+        self.expulsiones = 0
+
+    @classmethod
+    def desde_entorno(cls) -> "CacheLayouts":
+        """Crea la cache a partir de ARKHA_CACHE_MAX_BYTES y ARKHA_CACHE_DIR"""
+        return cls(
+            max_bytes=int(os.environ.get("ARKHA_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+            directorio=os.environ.get("ARKHA_CACHE_DIR") or None,
+        )
+
+    def _ruta(self, clave: ClaveLayout) -> str:
+        P, T, terrain, TipoC, *formato = clave
+        extension = formato[0] if formato else "json"
+        return os.path.join(self.directorio, f"v{VERSION_CACHE}_{P}_{T}_{terrain}_{int(TipoC)}.{extension}")
+
+    def obtener(self, clave: ClaveLayout) -> Optional[bytes]:
+        """
+        Busca un layout en memoria y después en disco
+
+        Returns:
+            bytes: Cuerpo guardado (el JSON con generatedAt actualizado), o None si no está
+        """
+        with self._lock:
+            cuerpo = self._entradas.get(clave)
+            if cuerpo is not None:
+                self._entradas.move_to_end(clave)
+                self.aciertos += 1
+                return self._actualizar(clave, cuerpo)
+
+        if self.directorio:
+            try:
+                with open(self._ruta(clave), "rb") as f:
+                    cuerpo = f.read()
+            except FileNotFoundError:
+                cuerpo = None
+            if cuerpo:
+                with self._lock:
+                    self.aciertos_disco += 1
+                    self._guardar_en_memoria(clave, cuerpo)
+                return self._actualizar(clave, cuerpo)
+
+        with self._lock:
+            self.fallos += 1
+        return None
+
+    @staticmethod
+    def _actualizar(clave: ClaveLayout, cuerpo: bytes) -> bytes:
+        """Pone la hora actual en generatedAt (solo el JSON y el NDJSON llevan marca de tiempo)"""
+        return parchear_timestamp(cuerpo) if len(clave) == 4 or clave[4] in FORMATOS_CON_MARCA else cuerpo
+
+    def guardar(self, clave: ClaveLayout, cuerpo: bytes):
+        """Guarda el cuerpo serializado en memoria y, si está configurado, en disco"""
+        with self._lock:
+            self._guardar_en_memoria(clave, cuerpo)
+
+        if self.directorio:
+            # Escritura atómica: otro worker nunca ve un archivo a medias
+            fd, temporal = tempfile.mkstemp(dir=self.directorio, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(cuerpo)
+                os.replace(temporal, self._ruta(clave))
+            except OSError:
+                if os.path.exists(temporal):
+                    os.unlink(temporal)
+
+    def _guardar_en_memoria(self, clave: ClaveLayout, cuerpo: bytes):
+        """Inserta en el LRU y expulsa las entradas más antiguas hasta caber (con el lock tomado)"""
+        if len(cuerpo) > self.max_bytes:
+            return
+        anterior = self._entradas.pop(clave, None)
+        if anterior is not None:
+            self._bytes -= len(anterior)
+        self._entradas[clave] = cuerpo
+        self._bytes += len(cuerpo)
+        while self._bytes > self.max_bytes:
+            _, expulsado = self._entradas.popitem(last=False)
+            self._bytes -= len(expulsado)
+            self.expulsiones += 1
+
+    def estadisticas(self) -> Dict[str, Any]:
+        """Contadores de aciertos, fallos y expulsiones, y ocupación actual"""
+        with self._lock:
+            return {
+                "entries": len(self._entradas),
+                "bytes": self._bytes,
+                "maxBytes": self.max_bytes,
+                "diskTier": bool(self.directorio),
+                "hits": self.aciertos,
+                "diskHits": self.aciertos_disco,
+                "misses": self.fallos,
+                "evictions": self.expulsiones,
+            }
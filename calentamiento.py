@@ -0,0 +1,249 @@
+"""
+===============================================================================
+CALENTAMIENTO DE LA CACHE DE COLOCACIONES AL ARRANCAR
+===============================================================================
+
+Tras un despliegue, las primeras peticiones calculan todas sus colocaciones.
+Con ARKHA_WARMUP configurado, el servicio precalcula al arrancar las
+colocaciones de un conjunto de misiones (o de todos los inventarios del
+dominio) en el pool de procesos de lotes del worker (ejecutor_lotes de
+main.py, ARKHA_BATCH_*: no se crea otro pool) y las guarda en la cache de
+colocaciones (cache_colocacion.py). GET /ready responde 503 hasta que
+termina, para que el orquestador solo envíe tráfico con la cache caliente;
+GET /health sigue indicando solo que el proceso está vivo.
+
+MODOS (ARKHA_WARMUP):
+- vacío: sin calentamiento (/ready responde 200 desde el arranque)
+- "all": todos los inventarios distintos del dominio (unos 44 000, ver
+  barrido.planificar)
+- ruta a un archivo JSONL: una misión por línea, con passengers, duration e
+  isScientific (terrain se ignora: no cambia el inventario)
+
+PERSISTENCIA:
+- Con ARKHA_PLACEMENT_CACHE_DB, los procesos escriben en la base sqlite: el
+  resultado sobrevive a reinicios (el siguiente arranque solo encuentra
+  aciertos) y lo comparten los workers de uvicorn y del pool.
+- Sin ella, las colocaciones vuelven a este proceso y se guardan en su LRU en
+  memoria (caben las que permita ARKHA_PLACEMENT_CACHE_MAX_BYTES): cada
+  worker de uvicorn tiene que calentar la suya.
+
+En los dos casos, un flock sobre <db>.warmup.lock (sin base de datos,
+arkha-warmup.lock en el directorio temporal) hace que solo un worker de
+uvicorn caliente a la vez: con N workers nunca hay N pools calculando a la
+vez. Con base de datos, los siguientes solo encuentran aciertos; sin ella,
+cada uno calcula lo suyo por turnos, así que con varios workers conviene
+configurar la base de datos.
+
+Con la tabla precalculada de la imagen (tabla_colocaciones.py), las
+misiones del dominio ya no calculan nada y el calentamiento solo recorre la
+tabla (sus colocaciones no se copian a la cache).
+
+Si el calentamiento falla, se registra el error y el servicio pasa a estar
+listo igualmente: la cache es una optimización, no un requisito.
+
+CONFIGURACIÓN (variables de entorno):
+- ARKHA_WARMUP: "", "all" o ruta a un JSONL de misiones
+- ARKHA_WARMUP_WORKERS: paquetes de inventarios a la vez en el pool de lotes
+  (por defecto, sus workers: ARKHA_BATCH_WORKERS)
+"""
+
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import barrido
+import cache_colocacion
+import tabla_inventario
+from ejecutor import ColaLlenaError, EjecutorLayout
+
+logger = logging.getLogger(__name__)
+
+MODO_TODO = "all"
+
+# Bloqueo entre workers de uvicorn sin base de datos compartida
+RUTA_BLOQUEO = os.path.join(tempfile.gettempdir(), "arkha-warmup.lock")
+
+ESTADO_DESACTIVADO = "disabled"
+ESTADO_PENDIENTE = "pending"
+ESTADO_EN_CURSO = "warming"
+ESTADO_LISTO = "ready"
+ESTADO_FALLIDO = "failed"
+
+Inventario = Tuple[int, ...]  # cantidades en el orden de tabla_inventario.CODIGOS
+
+
+def inventarios_de_misiones(ruta: str) -> List[Inventario]:
+    """
+    Inventarios distintos de las misiones de un archivo JSONL (en orden de aparición)
+
+    Raises:
+        ValueError: Si una línea no es una misión válida
+    """
+    vistos = {}
+    with open(ruta, encoding="utf-8") as f:
+        for numero, linea in enumerate(f, 1):
+            if not linea.strip():
+                continue
+            try:
+                mision = json.loads(linea)
+                P, T = int(mision["passengers"]), int(mision["duration"])
+                TipoC = bool(mision.get("isScientific", False))
+            except (ValueError, KeyError, TypeError) as e:
+                raise ValueError(f"{ruta}:{numero}: misión no válida ({e})") from e
+            inventario = tabla_inventario.calcular_modulos_arka(P, T, TipoC)[0]
+            cantidades = tuple(inventario[codigo] for codigo in tabla_inventario.CODIGOS)
+            vistos.setdefault(cantidades, None)
+    return list(vistos)
+
+
+def inventarios_del_dominio() -> List[Inventario]:
+    """Todos los inventarios distintos de P en 1..300, T en 1..3650 y ambos tipos"""
+    plan = barrido.planificar((1, tabla_inventario.P_MAX), (1, tabla_inventario.T_MAX))
+    return [cantidades for cantidades, _ in plan.tareas]
+
+
+def calentar_paquete(inventarios: List[Inventario], devolver: bool) -> Tuple[List[Tuple[Dict, List[Dict]]], int, int]:
+    """
+    Coloca cada inventario a través de la cache de colocaciones del proceso
+
+    Es de nivel superior para poder enviarse a un pool de procesos.
+
+    Args:
+        inventarios: Cantidades de cada inventario
+        devolver: Si se devuelven las arkas (cuando no hay nivel sqlite compartido)
+
+    Returns:
+        Tuple: ([(inventario, arkas)] si devolver, inventarios procesados, calculados de cero)
+    """
+    devueltas = []
+    calculados = 0
+    for cantidades in inventarios:
+        inventario = dict(zip(tabla_inventario.CODIGOS, cantidades))
+        arkas, origen = cache_colocacion.colocar(inventario)
+        calculados += origen == cache_colocacion.ORIGEN_CALCULADO
+        if devolver and origen != cache_colocacion.ORIGEN_PRECALCULADO:
+            devueltas.append((inventario, arkas))
+    return devueltas, len(inventarios), calculados
+
+
+class Calentamiento:
+    """
+    Estado y ejecución del calentamiento de un worker de uvicorn
+
+    Solo se modifica desde el event loop, así que no necesita locks.
+    """
+
+    def __init__(self, modo: str = "", workers: Optional[int] = None):
+        self.modo = modo
+        self.workers = workers
+        self.estado = ESTADO_PENDIENTE if modo else ESTADO_DESACTIVADO
+        self.total = 0
+        self.completados = 0
+        self.calculados = 0
+        self.segundos: Optional[float] = None
+        self.error: Optional[str] = None
+        self._inicio: Optional[float] = None
+
+    @classmethod
+    def desde_entorno(cls) -> "Calentamiento":
+        """Crea el calentamiento a partir de ARKHA_WARMUP y ARKHA_WARMUP_WORKERS"""
+        workers = os.environ.get("ARKHA_WARMUP_WORKERS")
+        return cls(
+            modo=os.environ.get("ARKHA_WARMUP", "").strip(),
+            workers=int(workers) if workers else None,
+        )
+
+    @property
+    def listo(self) -> bool:
+        """Si el servicio puede recibir tráfico (terminado, fallido o desactivado)"""
+        return self.estado in (ESTADO_DESACTIVADO, ESTADO_LISTO, ESTADO_FALLIDO)
+
+    def inventarios(self) -> List[Inventario]:
+        """Inventarios a calentar según el modo"""
+        if self.modo == MODO_TODO:
+            return inventarios_del_dominio()
+        return inventarios_de_misiones(self.modo)
+
+    async def ejecutar(self, pool: EjecutorLayout):
+        """
+        Calienta la cache de colocaciones
+
+        Args:
+            pool: Ejecutor de procesos del worker (el de lotes); el
+                  calentamiento ocupa como mucho `workers` de sus huecos
+        """
+        if self.estado != ESTADO_PENDIENTE:
+            return
+        self.estado = ESTADO_EN_CURSO
+        self._inicio = time.perf_counter()
+        cache = cache_colocacion.obtener_cache()
+        bloqueo = None
+        try:
+            inventarios = await asyncio.to_thread(self.inventarios)
+            self.total = len(inventarios)
+            logger.info("Calentando la cache de colocaciones: %d inventarios (%s)", self.total, self.modo)
+
+            # Un solo worker de uvicorn calienta a la vez (ver PERSISTENCIA)
+            bloqueo = open(f"{cache.ruta_db}.warmup.lock" if cache.ruta_db else RUTA_BLOQUEO, "w")
+            await asyncio.to_thread(fcntl.flock, bloqueo, fcntl.LOCK_EX)
+
+            devolver = not cache.ruta_db
+            semaforo = asyncio.Semaphore(min(self.workers or pool.workers, pool.capacidad))
+
+            async def calentar(paquete: List[Inventario]):
+                async with semaforo:
+                    while True:
+                        try:
+                            resultado, _, _ = await pool.ejecutar(calentar_paquete, paquete, devolver)
+                            return resultado
+                        except ColaLlenaError as e:
+                            # Peticiones de lotes ocupando el pool: esperar, no fallar
+                            await asyncio.sleep(e.retry_after)
+
+            tareas = [asyncio.ensure_future(calentar(paquete)) for paquete in barrido.paquetes(inventarios)]
+            try:
+                for siguiente in asyncio.as_completed(tareas):
+                    devueltas, procesados, calculados = await siguiente
+                    for inventario, arkas in devueltas:
+                        cache.guardar(inventario, arkas)
+                    self.completados += procesados
+                    self.calculados += calculados
+            finally:
+                for tarea in tareas:
+                    tarea.cancel()
+
+            self.estado = ESTADO_LISTO
+            self.segundos = time.perf_counter() - self._inicio
+            logger.info("Cache de colocaciones caliente: %d inventarios (%d calculados) en %.1f s",
+                        self.total, self.calculados, self.segundos)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.estado = ESTADO_FALLIDO
+            self.error = str(e)
+            self.segundos = time.perf_counter() - self._inicio
+            logger.exception("Falló el calentamiento de la cache de colocaciones; el servicio queda listo sin él")
+        finally:
+            if bloqueo is not None:
+                bloqueo.close()
+
+    def estadisticas(self) -> Dict[str, Any]:
+        """Estado y progreso del calentamiento"""
+        segundos = self.segundos
+        if segundos is None and self._inicio is not None:
+            segundos = time.perf_counter() - self._inicio
+        return {
+            "status": self.estado,
+            "ready": self.listo,
+            "mode": self.modo or None,
+            "inventories": self.total,
+            "completed": self.completados,
+            "computed": self.calculados,
+            "seconds": segundos,
+            "error": self.error,
+        }
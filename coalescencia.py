@@ -0,0 +1,123 @@
+"""
+===============================================================================
+COALESCENCIA DE PETICIONES IDÉNTICAS (SINGLE-FLIGHT)
+===============================================================================
+
+Cuando muchas peticiones con los mismos parámetros llegan a la vez, solo la
+primera (líder) calcula el resultado; las demás esperan esa misma tarea.
+
+DENTRO DE UN WORKER:
+- Las peticiones en vuelo se guardan en un diccionario clave → asyncio.Task.
+  El cálculo es una tarea independiente, así que si el cliente líder se
+  desconecta las peticiones que esperan no se cancelan.
+
+ENTRE WORKERS DE UVICORN (opcional):
+- Si se indica un directorio de bloqueos, el líder toma un flock exclusivo
+  sobre <directorio>/<clave>.lock mientras calcula. Un worker que encuentra el
+  bloqueo tomado espera a que se libere y consulta el almacén compartido
+  (la cache en disco) antes de calcular por su cuenta.
+- El sistema operativo libera el flock si el proceso muere, así que no quedan
+  bloqueos huérfanos.
+"""
+
+import asyncio
+import fcntl
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+ORIGEN_LIDER = "leader"
+ORIGEN_COALESCIDA = "coalesced"
+ORIGEN_OTRO_WORKER = "worker"
+
+
+class Coalescedor:
+    """
+    Agrupa cálculos idénticos en vuelo
+
+    Solo se usa desde el event loop, así que el diccionario de tareas en
+    vuelo no necesita locks.
+    """
+
+    def __init__(self, directorio_bloqueos: Optional[str] = None,
+                 espera_max: float = 60.0, intervalo: float = 0.05):
+        self.directorio_bloqueos = directorio_bloqueos
+        if directorio_bloqueos:
+            os.makedirs(directorio_bloqueos, exist_ok=True)
+        self.espera_max = espera_max
+        self.intervalo = intervalo
+
+        self._en_vuelo: Dict[Hashable, asyncio.Task] = {}
+        self.lideres = 0
+        self.coalescidas = 0
+        self.coalescidas_entre_workers = 0
+
+    async def ejecutar(self, clave: Hashable,
+                       calcular: Callable[[], Awaitable[Any]],
+                       consultar_compartido: Optional[Callable[[], Optional[Any]]] = None) -> Tuple[Any, str]:
+        """
+        Devuelve el resultado de calcular(), compartiéndolo entre peticiones idénticas
+
+        Args:
+            clave: Identifica peticiones idénticas
+            calcular: Corrutina que calcula (y publica en el almacén compartido) el resultado
+            consultar_compartido: Busca el resultado en el almacén compartido entre
+                workers; se llama tras esperar el bloqueo de otro worker
+
+        Returns:
+            Tuple: (resultado, origen) con origen "leader", "coalesced" o "worker"
+        """
+        tarea = self._en_vuelo.get(clave)
+        if tarea is not None:
+            self.coalescidas += 1
+            resultado, _ = await asyncio.shield(tarea)
+            return resultado, ORIGEN_COALESCIDA
+
+        tarea = asyncio.ensure_future(self._calcular_con_bloqueo(clave, calcular, consultar_compartido))
+        self._en_vuelo[clave] = tarea
+        tarea.add_done_callback(lambda _: self._en_vuelo.pop(clave, None))
+        return await asyncio.shield(tarea)
+
+    async def _calcular_con_bloqueo(self, clave: Hashable,
+                                    calcular: Callable[[], Awaitable[Any]],
+                                    consultar_compartido: Optional[Callable[[], Optional[Any]]]) -> Tuple[Any, str]:
+        """Toma el bloqueo entre workers (si está configurado) y calcula"""
+        if not self.directorio_bloqueos:
+            self.lideres += 1
+            return await calcular(), ORIGEN_LIDER
+
+        nombre = "_".join(str(parte) for parte in (clave if isinstance(clave, tuple) else (clave,)))
+        fd = os.open(os.path.join(self.directorio_bloqueos, f"{nombre}.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            espero_a_otro = False
+            limite = time.monotonic() + self.espera_max
+            while True:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if time.monotonic() >= limite:
+                        break  # Se calcula sin bloqueo antes que esperar indefinidamente
+                    espero_a_otro = True
+                    await asyncio.sleep(self.intervalo)
+
+            if espero_a_otro and consultar_compartido is not None:
+                resultado = consultar_compartido()
+                if resultado is not None:
+                    self.coalescidas_entre_workers += 1
+                    return resultado, ORIGEN_OTRO_WORKER
+
+            self.lideres += 1
+            return await calcular(), ORIGEN_LIDER
+        finally:
+            os.close(fd)  # Cerrar el descriptor libera el flock
+
+    def estadisticas(self) -> Dict[str, Any]:
+        """Contadores de peticiones calculadas y coalescidas"""
+        return {
+            "inFlight": len(self._en_vuelo),
+            "leaders": self.lideres,
+            "coalesced": self.coalescidas,
+            "coalescedAcrossWorkers": self.coalescidas_entre_workers,
+            "crossWorker": bool(self.directorio_bloqueos),
+        }
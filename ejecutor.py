@@ -0,0 +1,256 @@
+"""
+===============================================================================
+EJECUTOR ACOTADO DE LAYOUTS
+===============================================================================
+
+Ejecuta el trabajo pesado (Fase1 → Fase2 → Fase3) fuera del event loop de
+uvicorn para que /health y el resto de peticiones sigan respondiendo mientras
+se calcula un layout grande.
+
+MODOS:
+- "thread": pool de hilos dentro del proceso del worker de uvicorn
+- "process": pool de procesos (aprovecha varios núcleos, evita el GIL)
+
+CONTROL DE CARGA:
+- Como máximo `workers` trabajos se ejecutan a la vez
+- Como máximo `max_cola` trabajos esperan turno; el resto se rechaza con
+  ColaLlenaError (la API lo traduce a 503 + Retry-After)
+- Las respuestas en streaming (NDJSON) se calculan fuera del pool mientras
+  se envían, pero ocupan un hueco con reservar() y cuentan en el mismo límite.
+  Además, como máximo `workers` de ellas calculan a la vez (turno()); las
+  demás esperan con su hueco ocupado, como los trabajos en cola
+
+MÉTRICAS:
+- Tiempo de espera en cola y tiempo de ejecución se miden por separado para
+  poder dimensionar el número de workers
+
+CONFIGURACIÓN (variables de entorno):
+- ARKHA_EXECUTOR_MODE: "thread" (por defecto) o "process"
+- ARKHA_EXECUTOR_WORKERS: número de workers (por defecto, número de CPUs)
+- ARKHA_EXECUTOR_MAX_QUEUE: trabajos en espera permitidos (por defecto 16)
+- ARKHA_EXECUTOR_RETRY_AFTER: segundos sugeridos en Retry-After (por defecto 1)
+
+El pool de los lotes de layouts (POST /api/v1/generate-layout/batch) es otro
+EjecutorLayout con las mismas variables bajo el prefijo ARKHA_BATCH_ (modo
+"process" y cola de 64 trabajos por defecto).
+"""
+
+import asyncio
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+MODOS_VALIDOS = ("thread", "process")
+
+
+class ColaLlenaError(Exception):
+    """La cola del ejecutor está llena y el trabajo no se acepta"""
+
+    def __init__(self, en_curso: int, capacidad: int, retry_after: int):
+        super().__init__(f"Cola de layouts llena ({en_curso}/{capacidad} trabajos)")
+        self.retry_after = retry_after
+
+
+class Reserva:
+    """
+    Hueco del ejecutor ocupado por un trabajo que no pasa por su pool
+
+    Lo usan las respuestas en streaming, que se calculan mientras se envían.
+    liberar() se puede llamar varias veces (solo libera la primera).
+    """
+
+    def __init__(self, ejecutor: "EjecutorLayout"):
+        self._ejecutor = ejecutor
+        self._liberada = False
+
+    def liberar(self):
+        """Devuelve el hueco al ejecutor (desde el event loop)"""
+        if not self._liberada:
+            self._liberada = True
+            self._ejecutor._liberar()
+
+
+def _ejecutar_medido(fn: Callable, args: tuple) -> Tuple[Any, float, float]:
+    """
+    Ejecuta fn(*args) dentro del worker midiendo cuándo empieza y cuánto tarda
+
+    Se ejecuta en el hilo/proceso del pool, por eso el instante de inicio
+    usa el reloj de pared (comparable entre procesos).
+
+    Returns:
+        Tuple: (resultado, instante_inicio, duracion_en_segundos)
+    """
+    inicio = time.time()
+    t0 = time.perf_counter()
+    resultado = fn(*args)
+    return resultado, inicio, time.perf_counter() - t0
+
+
+class EjecutorLayout:
+    """
+    Pool de workers con profundidad de cola acotada
+
+    El contador de trabajos en curso solo se modifica desde el event loop,
+    así que no necesita locks.
+    """
+
+    def __init__(self, modo: str = "thread", workers: Optional[int] = None,
+                 max_cola: int = 16, retry_after: int = 1):
+        if modo not in MODOS_VALIDOS:
+            raise ValueError(f"Modo de ejecución no válido: {modo} (usar {MODOS_VALIDOS})")
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if workers < 1:
+            raise ValueError("workers debe ser >= 1")
+        if max_cola < 0:
+            raise ValueError("max_cola debe ser >= 0")
+
+        self.modo = modo
+        self.workers = workers
+        self.max_cola = max_cola
+        self.retry_after = retry_after
+        self._pool: Executor = (
+            ThreadPoolExecutor(max_workers=workers, thread_name_prefix="arkha-layout")
+            if modo == "thread"
+            else ProcessPoolExecutor(max_workers=workers)
+        )
+
+        # Trabajos reservados (ver reservar) que calculan a la vez fuera del pool
+        self._turnos = asyncio.Semaphore(workers)
+
+        self._en_curso = 0
+        self._completados = 0
+        self._fallidos = 0
+        self._rechazados = 0
+        self._espera_total = 0.0
+        self._espera_max = 0.0
+        self._ejecucion_total = 0.0
+        self._ejecucion_max = 0.0
+
+    @classmethod
+    def desde_entorno(cls, prefijo: str = "ARKHA_EXECUTOR", modo: str = "thread",
+                      max_cola: int = 16) -> "EjecutorLayout":
+        """
+        Crea el ejecutor a partir de las variables de entorno <prefijo>_*
+
+        Args:
+            prefijo: Prefijo de MODE, WORKERS, MAX_QUEUE y RETRY_AFTER
+            modo: Modo si <prefijo>_MODE no está definida
+            max_cola: Cola si <prefijo>_MAX_QUEUE no está definida
+        """
+        workers = os.environ.get(f"{prefijo}_WORKERS")
+        return cls(
+            modo=os.environ.get(f"{prefijo}_MODE", modo),
+            workers=int(workers) if workers else None,
+            max_cola=int(os.environ.get(f"{prefijo}_MAX_QUEUE", str(max_cola))),
+            retry_after=int(os.environ.get(f"{prefijo}_RETRY_AFTER", "1")),
+        )
+
+    @property
+    def capacidad(self) -> int:
+        """Número máximo de trabajos admitidos a la vez (ejecutando + en cola)"""
+        return self.workers + self.max_cola
+
+    async def ejecutar(self, fn: Callable, *args) -> Tuple[Any, float, float]:
+        """
+        Envía fn(*args) al pool y espera el resultado sin bloquear el event loop
+
+        Args:
+            fn: Función de nivel superior (debe poder serializarse en modo "process")
+            *args: Argumentos de la función
+
+        Returns:
+            Tuple: (resultado, espera_en_cola_s, ejecucion_s)
+
+        Raises:
+            ColaLlenaError: Si ya hay `capacidad` trabajos admitidos
+        """
+        if self._en_curso >= self.capacidad:
+            self._rechazados += 1
+            raise ColaLlenaError(self._en_curso, self.capacidad, self.retry_after)
+
+        envio = time.time()
+        loop = asyncio.get_running_loop()
+        try:
+            futuro = self._pool.submit(_ejecutar_medido, fn, args)
+        except Exception:
+            self._fallidos += 1
+            raise
+        self._en_curso += 1
+        # El hueco se libera cuando termina el trabajo en el pool, no cuando
+        # deja de esperarlo la petición: si el cliente se desconecta, el
+        # trabajo sigue ocupando un worker hasta acabar
+        futuro.add_done_callback(lambda _: self._liberar_desde_pool(loop))
+        try:
+            resultado, inicio, ejecucion = await asyncio.wrap_future(futuro)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self._fallidos += 1
+            raise
+
+        espera = max(0.0, inicio - envio)
+        self._completados += 1
+        self._espera_total += espera
+        self._espera_max = max(self._espera_max, espera)
+        self._ejecucion_total += ejecucion
+        self._ejecucion_max = max(self._ejecucion_max, ejecucion)
+        return resultado, espera, ejecucion
+
+    def reservar(self) -> Reserva:
+        """
+        Ocupa un hueco para un trabajo que se ejecuta fuera del pool
+
+        Cuenta en la capacidad igual que un trabajo de ejecutar(): si el
+        ejecutor está lleno se rechaza.
+
+        Raises:
+            ColaLlenaError: Si ya hay `capacidad` trabajos admitidos
+        """
+        if self._en_curso >= self.capacidad:
+            self._rechazados += 1
+            raise ColaLlenaError(self._en_curso, self.capacidad, self.retry_after)
+        self._en_curso += 1
+        return Reserva(self)
+
+    def turno(self) -> asyncio.Semaphore:
+        """
+        Turno de cálculo de un trabajo reservado (usar con `async with`)
+
+        Los trabajos reservados calculan fuera del pool; el turno limita a
+        `workers` los que lo hacen a la vez, igual que en el pool.
+        """
+        return self._turnos
+
+    def _liberar_desde_pool(self, loop: asyncio.AbstractEventLoop):
+        """Libera un hueco desde el hilo que completa el futuro del pool"""
+        try:
+            loop.call_soon_threadsafe(self._liberar)
+        except RuntimeError:
+            pass  # event loop cerrado: ya no hay peticiones que admitir
+
+    def _liberar(self):
+        """Libera un hueco (en el event loop)"""
+        self._en_curso -= 1
+
+    def estadisticas(self) -> Dict[str, Any]:
+        """Resumen de carga y tiempos acumulados del ejecutor"""
+        completados = self._completados
+        return {
+            "mode": self.modo,
+            "workers": self.workers,
+            "maxQueue": self.max_cola,
+            "inFlight": self._en_curso,
+            "completed": completados,
+            "failed": self._fallidos,
+            "rejected": self._rechazados,
+            "queueWaitAvgMs": (self._espera_total / completados * 1000) if completados else 0.0,
+            "queueWaitMaxMs": self._espera_max * 1000,
+            "runTimeAvgMs": (self._ejecucion_total / completados * 1000) if completados else 0.0,
+            "runTimeMaxMs": self._ejecucion_max * 1000,
+        }
+
+    def cerrar(self):
+        """Libera los workers del pool"""
+        self._pool.shutdown(wait=False, cancel_futures=True)
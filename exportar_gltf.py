@@ -0,0 +1,195 @@
+"""
+===============================================================================
+EXPORTACIÓN DEL HÁBITAT A glTF BINARIO (GLB) CON INSTANCIAS
+===============================================================================
+
+Un hábitat son sobre todo copias de los 27 tipos de módulo, así que la escena
+tiene UN nodo por tipo de módulo presente y las copias se describen con la
+extensión EXT_mesh_gpu_instancing (atributos TRANSLATION y ROTATION por
+instancia). El visor hace una llamada de dibujo por tipo, no por módulo.
+
+MALLAS:
+- Cada tipo tiene su malla, con nombre igual al id del módulo (Fase3.id_a_modulo)
+  y extras.uri = <uri_base><id>.glb, el modelo real que el visor debe cargar.
+- La geometría incluida es un cubo unitario compartido, solo como marcador
+  para visores que no sustituyan la malla.
+
+ROTACIONES:
+- Las rotaciones del layout son ángulos de Euler [x, y, z] en radianes
+  (orden XYZ, el de three.js); se convierten a cuaterniones [x, y, z, w].
+
+USO:
+    python exportar_gltf.py --passengers 30 --duration 500 --terrain moon \\
+        [--scientific] [--uri-base modules/] [-o habitat.glb]
+"""
+
+import argparse
+import struct
+from typing import Dict, List
+
+import numpy as np
+import orjson
+
+import Fase3
+
+MEDIA_TYPE = "model/gltf-binary"
+
+_MAGIC_GLB = 0x46546C67  # "glTF"
+_CHUNK_JSON = 0x4E4F534A  # "JSON"
+_CHUNK_BIN = 0x004E4942  # "BIN\0"
+
+_FLOAT = 5126
+_UNSIGNED_SHORT = 5123
+_ARRAY_BUFFER = 34962
+_ELEMENT_ARRAY_BUFFER = 34963
+
+# Cubo unitario centrado en el origen (marcador de cada tipo de módulo)
+_CUBO_VERTICES = np.array(
+    [[x, y, z] for x in (-0.5, 0.5) for y in (-0.5, 0.5) for z in (-0.5, 0.5)],
+    dtype="<f4",
+)
+_CUBO_INDICES = np.array([
+    0, 1, 3, 0, 3, 2,  # x = -0.5
+    4, 6, 7, 4, 7, 5,  # x = +0.5
+    0, 4, 5, 0, 5, 1,  # y = -0.5
+    2, 3, 7, 2, 7, 6,  # y = +0.5
+    0, 2, 6, 0, 6, 4,  # z = -0.5
+    1, 5, 7, 1, 7, 3,  # z = +0.5
+], dtype="<u2")
+
+
+def euler_a_cuaternion(rotaciones: np.ndarray) -> np.ndarray:
+    """
+    Ángulos de Euler XYZ (radianes) → cuaterniones [x, y, z, w]
+
+    Args:
+        rotaciones: float[n, 3]
+
+    Returns:
+        np.ndarray: float32[n, 4]
+    """
+    mitad = np.asarray(rotaciones, dtype=np.float64) / 2
+    c1, c2, c3 = np.cos(mitad).T
+    s1, s2, s3 = np.sin(mitad).T
+    return np.stack([
+        s1 * c2 * c3 + c1 * s2 * s3,
+        c1 * s2 * c3 - s1 * c2 * s3,
+        c1 * c2 * s3 + s1 * s2 * c3,
+        c1 * c2 * c3 - s1 * s2 * s3,
+    ], axis=1).astype("<f4")
+
+
+class _Buffer:
+    """Acumula bufferViews y accessors sobre el único buffer binario del GLB"""
+
+    def __init__(self):
+        self.partes: List[bytes] = []
+        self.longitud = 0
+        self.buffer_views: List[Dict] = []
+        self.accessors: List[Dict] = []
+
+    def accessor(self, datos: np.ndarray, tipo: str, componente: int,
+                 destino: int = None, limites: bool = False) -> int:
+        """Añade `datos` (alineados a 4 bytes) como bufferView + accessor y devuelve su índice"""
+        crudo = datos.tobytes()
+        vista = {"buffer": 0, "byteOffset": self.longitud, "byteLength": len(crudo)}
+        if destino is not None:
+            vista["target"] = destino
+        self.partes.append(crudo + b"\0" * (-len(crudo) % 4))
+        self.longitud += len(self.partes[-1])
+        self.buffer_views.append(vista)
+
+        accessor = {
+            "bufferView": len(self.buffer_views) - 1,
+            "componentType": componente,
+            "count": len(datos),
+            "type": tipo,
+        }
+        if limites:
+            accessor["min"] = datos.min(axis=0).tolist()
+            accessor["max"] = datos.max(axis=0).tolist()
+        self.accessors.append(accessor)
+        return len(self.accessors) - 1
+
+
+def exportar_glb(layout: Fase3.LayoutModulos, uri_base: str = "") -> bytes:
+    """
+    Escena GLB con un nodo instanciado por tipo de módulo
+
+    Args:
+        layout: LayoutModulos calculado con Fase3.calcular_layout
+        uri_base: Prefijo de extras.uri de cada malla (p. ej. "modules/")
+
+    Returns:
+        bytes: Archivo GLB
+    """
+    buffer = _Buffer()
+    posicion_cubo = buffer.accessor(_CUBO_VERTICES, "VEC3", _FLOAT, _ARRAY_BUFFER, limites=True)
+    indices_cubo = buffer.accessor(_CUBO_INDICES, "SCALAR", _UNSIGNED_SHORT, _ELEMENT_ARRAY_BUFFER)
+
+    traslaciones = layout.posiciones.astype("<f4")
+    cuaterniones = euler_a_cuaternion(layout.rotaciones)
+
+    mallas = []
+    nodos = []
+    for codigo in np.unique(layout.codigos).tolist():
+        nombre = Fase3.NOMBRES_POR_CODIGO[codigo]
+        seleccion = layout.codigos == codigo
+        mallas.append({
+            "name": nombre,
+            "primitives": [{"attributes": {"POSITION": posicion_cubo}, "indices": indices_cubo}],
+            "extras": {"uri": f"{uri_base}{nombre}.glb", "moduleId": nombre},
+        })
+        nodos.append({
+            "name": nombre,
+            "mesh": len(mallas) - 1,
+            "extensions": {
+                "EXT_mesh_gpu_instancing": {
+                    "attributes": {
+                        "TRANSLATION": buffer.accessor(traslaciones[seleccion], "VEC3", _FLOAT),
+                        "ROTATION": buffer.accessor(cuaterniones[seleccion], "VEC4", _FLOAT),
+                    }
+                }
+            },
+        })
+
+    binario = b"".join(buffer.partes)
+    gltf = {
+        "asset": {"version": "2.0", "generator": "ARKHA Module Manager"},
+        "extensionsUsed": ["EXT_mesh_gpu_instancing"],
+        "scene": 0,
+        "scenes": [{"name": "habitat", "nodes": list(range(len(nodos)))}],
+        "nodes": nodos,
+        "meshes": mallas,
+        "accessors": buffer.accessors,
+        "bufferViews": buffer.buffer_views,
+        "buffers": [{"byteLength": len(binario)}],
+    }
+    json_chunk = orjson.dumps(gltf)
+    json_chunk += b" " * (-len(json_chunk) % 4)
+
+    longitud_total = 12 + 8 + len(json_chunk) + 8 + len(binario)
+    return b"".join((
+        struct.pack("<III", _MAGIC_GLB, 2, longitud_total),
+        struct.pack("<II", len(json_chunk), _CHUNK_JSON), json_chunk,
+        struct.pack("<II", len(binario), _CHUNK_BIN), binario,
+    ))
+
+
+if __name__ == "__main__":
+    import pipeline
+
+    parser = argparse.ArgumentParser(description="Exporta el hábitat de una misión a GLB con instancias")
+    parser.add_argument("--passengers", type=int, required=True, help="Número de pasajeros (1-300)")
+    parser.add_argument("--duration", type=int, required=True, help="Duración de la misión en días (1-3650)")
+    parser.add_argument("--terrain", choices=("moon", "mars", "asteroid"), default="moon", help="Tipo de terreno")
+    parser.add_argument("--scientific", action="store_true", help="Misión científica")
+    parser.add_argument("--uri-base", default="", help="Prefijo de las URIs de los modelos de módulo")
+    parser.add_argument("-o", "--output", default="habitat.glb", help="Archivo GLB de salida")
+    args = parser.parse_args()
+
+    glb = pipeline.generar_layout_glb(args.passengers, args.duration, args.terrain,
+                                      args.scientific, args.uri_base)
+    with open(args.output, "wb") as f:
+        f.write(glb)
+    print(f"GLB guardado en {args.output}: {len(glb)} bytes")
@@ -0,0 +1,130 @@
+"""
+===============================================================================
+FORMATO BINARIO DE LAYOUTS (ARKL)
+===============================================================================
+
+Versión compacta de la respuesta de generate-layout para el visor 3D. Todos
+los enteros y floats son little-endian y cada sección empieza en un múltiplo
+de 4 bytes, así que el visor puede leer los arrays sin copiarlos
+(Uint8Array / Float32Array sobre el mismo ArrayBuffer).
+
+CABECERA (32 bytes):
+    offset  tipo     campo
+    0       4 bytes  magic "ARKL"
+    4       uint16   versión del formato (1)
+    6       uint16   tamaño de la cabecera en bytes (32)
+    8       uint32   n: número de módulos
+    12      uint32   número de nombres en la tabla de nombres
+    16      uint32   bytes de la tabla de nombres (con relleno)
+    20      uint16   passengers
+    22      uint16   duration
+    24      uint8    terrain (índice en TERRENOS)
+    25      uint8    isScientific (0 / 1)
+    26      uint16   reservado (0)
+    28      uint32   número de arkas
+
+SECCIONES (a continuación de la cabecera):
+    tabla de nombres   nombres de archivo de los 27 módulos ("001".."027")
+                       en UTF-8 separados por "\\n", rellenada con ceros
+                       hasta múltiplo de 4
+    tipos              uint8[n]: índice de cada módulo en la tabla de nombres,
+                       rellenado con ceros hasta múltiplo de 4
+    posiciones         float32[n * 3]: x, y, z de cada módulo
+    rotaciones         float32[n * 3]: x, y, z en radianes
+
+La escala no se transmite: siempre es [1, 1, 1]. La tabla de nombres es el
+catálogo completo, de modo que los índices de tipo son estables entre layouts.
+
+decodificar_layout es la referencia del decodificador; el README incluye la
+versión en JavaScript para el visor.
+"""
+
+import struct
+from typing import Dict
+
+import numpy as np
+
+import Fase3
+
+MAGIC = b"ARKL"
+VERSION_FORMATO = 1
+TERRENOS = ("moon", "mars", "asteroid")
+MEDIA_TYPE = "application/vnd.arkha.layout"
+
+_CABECERA = struct.Struct("<4sHHIIIHHBBHI")
+
+# Catálogo completo: el tipo de un módulo es su código de Fase2 menos 1
+NOMBRES = tuple(Fase3.NOMBRES_POR_CODIGO[1:])
+_TABLA_NOMBRES = "\n".join(NOMBRES).encode()
+_TABLA_NOMBRES += b"\0" * (-len(_TABLA_NOMBRES) % 4)
+
+
+def codificar_layout(layout: Fase3.LayoutModulos, passengers: int, duration: int,
+                     terrain: str, isScientific: bool, total_arkas: int) -> bytes:
+    """
+    Empaqueta un layout en el formato ARKL
+
+    Args:
+        layout: LayoutModulos calculado con Fase3.calcular_layout
+        passengers, duration, terrain, isScientific: Parámetros de la misión
+        total_arkas: Número de arkas del layout
+
+    Returns:
+        bytes: Buffer ARKL
+    """
+    n = len(layout.codigos)
+    cabecera = _CABECERA.pack(
+        MAGIC, VERSION_FORMATO, _CABECERA.size, n, len(NOMBRES), len(_TABLA_NOMBRES),
+        passengers, duration, TERRENOS.index(terrain), int(isScientific), 0, total_arkas,
+    )
+    tipos = (layout.codigos - 1).astype(np.uint8).tobytes()
+    tipos += b"\0" * (-n % 4)
+    return b"".join((
+        cabecera,
+        _TABLA_NOMBRES,
+        tipos,
+        layout.posiciones.astype("<f4").tobytes(),
+        layout.rotaciones.astype("<f4").tobytes(),
+    ))
+
+
+def decodificar_layout(datos: bytes) -> Dict:
+    """
+    Lee un buffer ARKL sin copiar los arrays
+
+    Returns:
+        Dict: parámetros, totalArkas, nombres, tipos uint8[n] y posiciones /
+              rotaciones float32[n, 3]
+
+    Raises:
+        ValueError: Si el buffer no es ARKL o su versión no está soportada
+    """
+    (magic, version, tamano_cabecera, n, num_nombres, bytes_nombres,
+     passengers, duration, terrain, cientifica, _, total_arkas) = _CABECERA.unpack_from(datos, 0)
+    if magic != MAGIC:
+        raise ValueError("El buffer no es un layout ARKL")
+    if version != VERSION_FORMATO:
+        raise ValueError(f"Versión de formato ARKL no soportada: {version}")
+
+    offset = tamano_cabecera
+    nombres = bytes(datos[offset:offset + bytes_nombres]).rstrip(b"\0").decode().split("\n")[:num_nombres]
+    offset += bytes_nombres
+    tipos = np.frombuffer(datos, dtype=np.uint8, count=n, offset=offset)
+    offset += n + (-n % 4)
+    posiciones = np.frombuffer(datos, dtype="<f4", count=n * 3, offset=offset).reshape(n, 3)
+    offset += n * 12
+    rotaciones = np.frombuffer(datos, dtype="<f4", count=n * 3, offset=offset).reshape(n, 3)
+
+    return {
+        "parameters": {
+            "passengers": passengers,
+            "duration": duration,
+            "terrain": TERRENOS[terrain],
+            "isScientific": bool(cientifica),
+        },
+        "totalArkas": total_arkas,
+        "nombres": nombres,
+        "tipos": tipos,
+        "posiciones": posiciones,
+        "rotaciones": rotaciones,
+    }
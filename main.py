@@ -7,27 +7,70 @@ de misión.
 
 API Endpoints:
 - POST /api/v1/generate-layout: Genera un layout de módulos
+- GET/POST /api/v1/generate-layout.bin: El mismo layout en formato binario ARKL
+- GET/POST /api/v1/generate-layout.glb: El mismo layout como escena glTF binaria con instancias
+- GET/POST /api/v1/generate-layout.ndjson: El mismo layout en streaming, una línea por arka
+- POST /api/v1/generate-layout/batch: Layouts de muchas misiones en paralelo (en orden)
+- POST /api/v1/generate-layout/batch.ndjson: Los mismos layouts en streaming, según terminan
+- POST /api/v1/inventory/batch: Inventario de Fase1 para muchas misiones
+- POST /api/v1/sweep: Barrido de pasajeros x duraciones (arkas, módulos, coste y eficiencia)
+- GET /api/v1/executor/stats: Carga y tiempos del pool de ejecución
+- GET /api/v1/cache/stats: Aciertos, fallos y expulsiones de la cache de layouts
+- GET /api/v1/coalescing/stats: Peticiones idénticas agrupadas en un solo cálculo
+- GET /metrics: Métricas en formato de exposición de Prometheus
 - GET /health: Health check del servicio
+- GET /ready: Preparado para recibir tráfico (cache de colocaciones caliente)
 - GET /docs: Documentación Swagger automática
 
 AUTOR: Sistema de Gestión de Módulos ARKHA
 VERSIÓN: 1.0.0
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
-from typing import List, Literal, Optional
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+from pydantic import BaseModel, Field, ValidationError, model_validator
+from typing import Annotated, Any, AsyncIterator, Dict, List, Literal, Optional, Tuple
 from datetime import datetime
+import asyncio
+import logging
+import os
+import orjson
 import uvicorn
-import Fase1
-import Fase2
-import Fase3
+import barrido
+import cache_colocacion
+import calentamiento
+import pipeline
+import exportar_gltf
+import layout_binario
+import metricas
+from ejecutor import EjecutorLayout, ColaLlenaError, Reserva
+from cache_layouts import CacheLayouts
+from coalescencia import Coalescedor, ORIGEN_LIDER
 
 # =============================================================================
 # CONFIGURACIÓN DE LA APLICACIÓN
 # =============================================================================
 
+logger = logging.getLogger(__name__)
+
+def configurar_logging():
+    """
+    Configura el logger raíz desde ARKHA_LOG_LEVEL al arrancar el servidor
+    
+    Hay un logger por módulo (Fase2, main, ...); ARKHA_LOG_LEVEL=DEBUG activa
+    la traza de colocación de Fase2: una línea por módulo colocado. Se llama
+    al arrancar (evento startup o __main__), no al importar, para no cambiar
+    el logging de las herramientas que importan main; si el logger raíz ya
+    tiene handlers, no hace nada (logging.basicConfig).
+    """
+    logging.basicConfig(
+        level=os.environ.get("ARKHA_LOG_LEVEL", "INFO").upper(),
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+
 app = FastAPI(
     title="ARKHA Module Manager API",
     description="Microservicio para generar layouts óptimos de módulos espaciales ARKHA",
@@ -45,6 +88,55 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Pool acotado donde se ejecutan Fase1 → Fase2 → Fase3 (ver ejecutor.py)
+ejecutor: Optional[EjecutorLayout] = None
+
+# Pool de procesos de los lotes de layouts (ARKHA_BATCH_*), separado del
+# anterior para que un lote grande no deje sin workers a las peticiones sueltas
+ejecutor_lotes: Optional[EjecutorLayout] = None
+
+# Cache de cuerpos de respuesta de generate-layout (ver cache_layouts.py)
+cache: Optional[CacheLayouts] = None
+
+# Bytes máximos que un stream NDJSON acumula para guardarlo en la cache de
+# layouts (el mayor del dominio, 300 pasajeros, ocupa ~150 KB)
+MAX_BYTES_CACHE_NDJSON = int(os.environ.get("ARKHA_NDJSON_CACHE_MAX_BYTES", str(1024 * 1024)))
+
+# Agrupa peticiones idénticas en vuelo (ver coalescencia.py). Con el nivel en
+# disco de la cache activo, también coordina a los workers de uvicorn.
+coalescedor: Optional[Coalescedor] = None
+
+# Calentamiento de la cache de colocaciones al arrancar (ver calentamiento.py);
+# GET /ready responde 503 hasta que termina
+calentador: Optional[calentamiento.Calentamiento] = None
+_tarea_calentamiento: Optional[asyncio.Task] = None
+
+@app.on_event("startup")
+async def iniciar_ejecutor():
+    global ejecutor, ejecutor_lotes, cache, coalescedor, calentador, _tarea_calentamiento
+    configurar_logging()
+    ejecutor = EjecutorLayout.desde_entorno()
+    ejecutor_lotes = EjecutorLayout.desde_entorno("ARKHA_BATCH", modo="process", max_cola=64)
+    cache = CacheLayouts.desde_entorno()
+    # La cache por inventario se crea en cada proceso al primer uso; crearla
+    # aquí hace que una ruta ARKHA_PLACEMENT_CACHE_DB no válida falle al arrancar
+    cache_colocacion.obtener_cache()
+    coalescedor = Coalescedor(
+        directorio_bloqueos=os.path.join(cache.directorio, "locks") if cache.directorio else None
+    )
+    calentador = calentamiento.Calentamiento.desde_entorno()
+    if not calentador.listo:
+        _tarea_calentamiento = asyncio.create_task(calentador.ejecutar(ejecutor_lotes))
+
+@app.on_event("shutdown")
+async def cerrar_ejecutor():
+    if _tarea_calentamiento is not None:
+        _tarea_calentamiento.cancel()
+    if ejecutor is not None:
+        ejecutor.cerrar()
+    if ejecutor_lotes is not None:
+        ejecutor_lotes.cerrar()
+
 # =============================================================================
 # MODELOS DE DATOS (PYDANTIC)
 # =============================================================================
@@ -130,6 +222,147 @@ class MissionLayoutResponse(BaseModel):
             }
         }
 
+class InventoryBatchRequest(BaseModel):
+    """Misiones candidatas en formato columnar (una posición por misión)"""
+    passengers: List[Annotated[int, Field(ge=1, le=300)]] = Field(..., min_length=1, max_length=100000, description="Número de pasajeros de cada misión (1-300)")
+    duration: List[Annotated[int, Field(ge=1, le=3650)]] = Field(..., min_length=1, max_length=100000, description="Duración de cada misión en días (1-3650)")
+    isScientific: List[bool] = Field(..., min_length=1, max_length=100000, description="Si cada misión es científica")
+
+    @model_validator(mode="after")
+    def mismas_longitudes(self):
+        if not len(self.passengers) == len(self.duration) == len(self.isScientific):
+            raise ValueError("passengers, duration e isScientific deben tener la misma longitud")
+        return self
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "passengers": [10, 30, 300],
+                "duration": [90, 500, 3650],
+                "isScientific": [False, False, True]
+            }
+        }
+
+class InventoryBatchResponse(BaseModel):
+    """Matriz de inventario de Fase1 para un lote de misiones"""
+    count: int = Field(..., ge=0, description="Número de misiones del lote")
+    columns: List[str] = Field(..., description="Código de módulo de cada columna de la matriz")
+    modules: List[List[int]] = Field(..., description="Matriz [misión][módulo] con la cantidad necesaria")
+    totalModules: List[int] = Field(..., description="Total de módulos de inventario por misión")
+    minimumModules: List[int] = Field(..., description="Total mínimo incluyendo access, base, powercore, circulación y transcore")
+
+class LayoutBatchRequest(BaseModel):
+    """Lote de misiones cuyo layout completo se quiere generar"""
+    missions: List[Dict[str, Any]] = Field(..., min_length=1, max_length=1000, description="Parámetros de cada misión (MissionParameters); cada una se valida por separado")
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "missions": [
+                    {"passengers": 10, "duration": 90, "terrain": "moon", "isScientific": False},
+                    {"passengers": 30, "duration": 500, "terrain": "mars", "isScientific": True}
+                ]
+            }
+        }
+
+class LayoutBatchItem(BaseModel):
+    """Resultado de una misión del lote"""
+    index: int = Field(..., ge=0, description="Posición de la misión en el lote")
+    status: int = Field(..., description="200, 422 (parámetros no válidos), 503 (pool ocupado) o 500")
+    layout: Optional[MissionLayoutResponse] = Field(default=None, description="Layout generado (status 200)")
+    error: Optional[str] = Field(default=None, description="Descripción del error (status != 200)")
+    detail: Optional[List[Dict[str, Any]]] = Field(default=None, description="Errores de validación (status 422)")
+
+class LayoutBatchResponse(BaseModel):
+    """Layouts de un lote de misiones, en el orden de la petición"""
+    count: int = Field(..., ge=0, description="Número de misiones del lote")
+    unique: int = Field(..., ge=0, description="Misiones distintas calculadas (los duplicados comparten resultado)")
+    results: List[LayoutBatchItem] = Field(..., description="Un resultado por misión, en el orden de la petición")
+
+class SweepRequest(BaseModel):
+    """Rangos de parámetros del barrido (inclusive)"""
+    passengersMin: int = Field(default=1, ge=1, le=300, description="Pasajeros mínimos")
+    passengersMax: int = Field(default=300, ge=1, le=300, description="Pasajeros máximos")
+    durationMin: int = Field(default=1, ge=1, le=3650, description="Duración mínima en días")
+    durationMax: int = Field(default=3650, ge=1, le=3650, description="Duración máxima en días")
+    isScientific: List[bool] = Field(default=[False, True], min_length=1, max_length=2, description="Tipos de misión a barrer")
+
+    @model_validator(mode="after")
+    def rangos_ordenados(self):
+        if self.passengersMin > self.passengersMax or self.durationMin > self.durationMax:
+            raise ValueError("Los mínimos no pueden ser mayores que los máximos")
+        return self
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "passengersMin": 10,
+                "passengersMax": 30,
+                "durationMin": 1,
+                "durationMax": 3650,
+                "isScientific": [False, True]
+            }
+        }
+
+class SweepResponse(BaseModel):
+    """Tabla del barrido: una posición de cada lista por fila"""
+    count: int = Field(..., ge=0, description="Filas de la tabla")
+    missions: int = Field(..., ge=0, description="Misiones (passengers, duration, isScientific) cubiertas")
+    segments: int = Field(..., ge=0, description="Tramos de inventario constante evaluados")
+    uniqueInventories: int = Field(..., ge=0, description="Inventarios distintos (colocaciones de Fase2 ejecutadas)")
+    passengers: List[int] = Field(..., description="Pasajeros de cada fila")
+    isScientific: List[bool] = Field(..., description="Tipo de misión de cada fila")
+    durationFrom: List[int] = Field(..., description="Primera duración (días) con este resultado")
+    durationTo: List[int] = Field(..., description="Última duración (días) con este resultado")
+    arkas: List[int] = Field(..., description="Arkas del layout")
+    totalModules: List[int] = Field(..., description="Módulos totales del layout")
+    estimatedCost: List[int] = Field(..., description="Costo estimado en tokens ARKHA")
+    efficiency: List[float] = Field(..., description="Posiciones ocupadas por el inventario / posiciones totales de las arkas (%); los 006 de relleno de la limpieza cuentan como huecos")
+
+class ExecutorStats(BaseModel):
+    """Estado del pool de ejecución de layouts"""
+    mode: str = Field(..., description="Modo de ejecución (thread o process)")
+    workers: int = Field(..., description="Número de workers del pool")
+    maxQueue: int = Field(..., description="Trabajos que pueden esperar en cola")
+    inFlight: int = Field(..., description="Trabajos admitidos ahora mismo (ejecutando + en cola)")
+    completed: int = Field(..., description="Trabajos completados")
+    failed: int = Field(..., description="Trabajos que terminaron con error")
+    rejected: int = Field(..., description="Trabajos rechazados por cola llena (503)")
+    queueWaitAvgMs: float = Field(..., description="Espera media en cola (ms)")
+    queueWaitMaxMs: float = Field(..., description="Espera máxima en cola (ms)")
+    runTimeAvgMs: float = Field(..., description="Tiempo medio de ejecución (ms)")
+    runTimeMaxMs: float = Field(..., description="Tiempo máximo de ejecución (ms)")
+
+class CacheStats(BaseModel):
+    """Estado de la cache de layouts"""
+    entries: int = Field(..., description="Layouts guardados en memoria")
+    bytes: int = Field(..., description="Bytes ocupados en memoria")
+    maxBytes: int = Field(..., description="Límite de bytes en memoria")
+    diskTier: bool = Field(..., description="Si el nivel en disco está activo")
+    hits: int = Field(..., description="Aciertos en memoria")
+    diskHits: int = Field(..., description="Aciertos en disco")
+    misses: int = Field(..., description="Fallos (layout calculado)")
+    evictions: int = Field(..., description="Expulsiones del LRU en memoria")
+
+class CoalescingStats(BaseModel):
+    """Estado de la coalescencia de peticiones idénticas"""
+    inFlight: int = Field(..., description="Cálculos en vuelo en este worker")
+    leaders: int = Field(..., description="Peticiones que calcularon el layout")
+    coalesced: int = Field(..., description="Peticiones que esperaron el cálculo de otra en este worker")
+    coalescedAcrossWorkers: int = Field(..., description="Peticiones servidas con el cálculo de otro worker")
+    crossWorker: bool = Field(..., description="Si la coordinación entre workers está activa")
+
+class ReadinessResponse(BaseModel):
+    """Estado de preparación del servicio (calentamiento de la cache de colocaciones)"""
+    status: str = Field(..., description="disabled, pending, warming, ready o failed")
+    ready: bool = Field(..., description="Si el servicio puede recibir tráfico")
+    mode: Optional[str] = Field(default=None, description="ARKHA_WARMUP: all o ruta del JSONL de misiones")
+    inventories: int = Field(..., description="Inventarios distintos a calentar")
+    completed: int = Field(..., description="Inventarios ya en la cache")
+    computed: int = Field(..., description="Inventarios calculados de cero (el resto ya estaba en sqlite)")
+    seconds: Optional[float] = Field(default=None, description="Duración del calentamiento (en curso o total)")
+    error: Optional[str] = Field(default=None, description="Error si el calentamiento falló")
+
 class HealthResponse(BaseModel):
     """Respuesta del health check"""
     status: str
@@ -147,7 +380,9 @@ async def root():
         "message": "ARKHA Module Manager API",
         "version": "1.0.0",
         "docs": "/docs",
-        "health": "/health"
+        "health": "/health",
+        "ready": "/ready",
+        "metrics": "/metrics"
     }
 
 @app.get("/health", response_model=HealthResponse, tags=["Health"])
@@ -163,6 +398,33 @@ async def health_check():
         timestamp=datetime.utcnow().isoformat() + "Z"
     )
 
+@app.get("/ready", response_model=ReadinessResponse, responses={503: {"model": ReadinessResponse}}, tags=["Health"])
+async def ready(response: Response):
+    """
+    Readiness del servicio, separado de /health (liveness)
+    
+    Responde 503 mientras se calienta la cache de colocaciones al arrancar
+    (ARKHA_WARMUP, ver calentamiento.py) y 200 cuando termina, si falla o si
+    no hay calentamiento configurado.
+    """
+    estadisticas = calentador.estadisticas()
+    if not estadisticas["ready"]:
+        response.status_code = 503
+    return estadisticas
+
+@app.get("/metrics", response_class=Response, tags=["Health"])
+async def metrics():
+    """
+    Métricas del proceso en formato de exposición de texto de Prometheus
+    
+    Histogramas por fase (fase1, fase2, fase3, serializacion) y tramo de
+    pasajeros, contadores de la colocación (arkas, módulos, huecos evaluados)
+    y peticiones de layout por formato y resultado (ver metricas.py).
+    """
+    metricas.TRABAJOS_EN_CURSO.fijar(ejecutor.estadisticas()["inFlight"])
+    metricas.BYTES_CACHE.fijar(cache.estadisticas()["bytes"])
+    return Response(content=metricas.REGISTRO.exponer(), media_type=metricas.MEDIA_TYPE)
+
 @app.post("/api/v1/generate-layout", response_model=MissionLayoutResponse, tags=["Layout Generation"])
 async def generate_layout(parameters: MissionParameters):
     """
@@ -181,6 +443,20 @@ async def generate_layout(parameters: MissionParameters):
     - Optimización de espacio
     - Pisos prioritarios para cada tipo de módulo
     
+    El cálculo se ejecuta en el pool de ejecutor.py, fuera del event loop.
+    La cabecera Server-Timing informa por separado del tiempo de espera en
+    cola (queue) y del tiempo de ejecución (run).
+    
+    El cuerpo serializado se guarda en la cache de layouts; las peticiones
+    repetidas solo actualizan metadata.generatedAt (cabecera X-Cache: HIT).
+    Las peticiones idénticas simultáneas comparten un único cálculo
+    (cabecera X-Cache: COALESCED).
+    
+    El cuerpo se serializa directamente desde los arrays de Fase3 (ver
+    Fase3.serializar_layout) sin revalidarlo con Pydantic; response_model
+    solo documenta el esquema. verificar_respuesta.py comprueba que coincide
+    con MissionLayoutResponse.
+    
     Args:
         parameters: Parámetros de la misión (MissionParameters)
     
@@ -188,46 +464,483 @@ async def generate_layout(parameters: MissionParameters):
         MissionLayoutResponse: Layout completo con posiciones de módulos
     
     Raises:
-        HTTPException: Si hay errores en la generación del layout
+        HTTPException: 503 si la cola de trabajo está llena,
+                       500 si hay errores en la generación del layout
+    """
+    return await responder_layout(parameters, pipeline.generar_layout_json, "application/json")
+
+@app.post(
+    "/api/v1/generate-layout.bin",
+    response_class=Response,
+    responses={200: {"content": {layout_binario.MEDIA_TYPE: {}},
+                     "description": "Layout en formato binario ARKL (ver layout_binario.py)"}},
+    tags=["Layout Generation"],
+)
+async def generate_layout_bin(parameters: MissionParameters):
+    """
+    Genera el layout en formato binario ARKL
+    
+    Mismo layout que /api/v1/generate-layout, empaquetado para el visor 3D:
+    cabecera, tabla de nombres de módulo, tipos uint8 y posiciones /
+    rotaciones float32 little-endian (ver layout_binario.py y el README).
+    """
+    return await responder_layout(parameters, pipeline.generar_layout_binario, layout_binario.MEDIA_TYPE, "bin")
+
+@app.get(
+    "/api/v1/generate-layout.bin",
+    response_class=Response,
+    responses={200: {"content": {layout_binario.MEDIA_TYPE: {}},
+                     "description": "Layout en formato binario ARKL (ver layout_binario.py)"}},
+    tags=["Layout Generation"],
+)
+async def generate_layout_bin_get(parameters: MissionParameters = Depends()):
+    """
+    Igual que POST /api/v1/generate-layout.bin con los parámetros en la query
+    
+    Permite que el visor use la URL directamente (fetch / caché del navegador).
+    """
+    return await responder_layout(parameters, pipeline.generar_layout_binario, layout_binario.MEDIA_TYPE, "bin")
+
+@app.post(
+    "/api/v1/generate-layout.glb",
+    response_class=Response,
+    responses={200: {"content": {exportar_gltf.MEDIA_TYPE: {}},
+                     "description": "Escena glTF binaria con EXT_mesh_gpu_instancing (ver exportar_gltf.py)"}},
+    tags=["Layout Generation"],
+)
+async def generate_layout_glb(parameters: MissionParameters):
+    """
+    Genera el layout como escena glTF binaria (GLB)
+    
+    Un nodo por tipo de módulo con sus copias como instancias
+    (EXT_mesh_gpu_instancing). Cada malla lleva en extras.uri el modelo del
+    módulo ("<id>.glb") que el visor debe cargar en lugar del marcador.
+    """
+    return await responder_layout(parameters, pipeline.generar_layout_glb, exportar_gltf.MEDIA_TYPE, "glb")
+
+@app.get(
+    "/api/v1/generate-layout.glb",
+    response_class=Response,
+    responses={200: {"content": {exportar_gltf.MEDIA_TYPE: {}},
+                     "description": "Escena glTF binaria con EXT_mesh_gpu_instancing (ver exportar_gltf.py)"}},
+    tags=["Layout Generation"],
+)
+async def generate_layout_glb_get(parameters: MissionParameters = Depends()):
+    """
+    Igual que POST /api/v1/generate-layout.glb con los parámetros en la query
+    
+    Permite abrir la escena directamente desde un cargador glTF (GLTFLoader.load(url)).
+    """
+    return await responder_layout(parameters, pipeline.generar_layout_glb, exportar_gltf.MEDIA_TYPE, "glb")
+
+@app.post(
+    "/api/v1/generate-layout.ndjson",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"application/x-ndjson": {}},
+                     "description": "Cabecera, un registro por arka y resumen (ver Fase3.generar_ndjson)"}},
+    tags=["Layout Generation"],
+)
+async def generate_layout_ndjson(parameters: MissionParameters):
+    """
+    Genera el layout en streaming, una línea NDJSON por arka
+    
+    La primera línea es la cabecera (parameters y metadata), después un
+    registro por arka con sus módulos (base, torre, techo, caras y conexión
+    009) en cuanto la colocación la da por definitiva, y al final un resumen
+    con totalModules y estimatedCost.
+    
+    Si el NDJSON completo está en la cache de layouts se devuelve de una vez
+    (X-Cache: HIT). Si no, la respuesta ocupa un hueco del pool de ejecución
+    mientras se genera (503 + Retry-After si está lleno) y el generador se
+    recorre en el threadpool de Starlette con un turno del ejecutor: como
+    máximo ejecutor.workers streams calculan a la vez, también en modo
+    "process" (donde se calculan en este proceso, no en el pool). La
+    colocación sale de la tabla precalculada o de la cache por inventario si
+    está (ver cache_colocacion.colocar_incremental).
+
+    Mientras se envía, el cuerpo se acumula para guardarlo en la cache de
+    layouts al terminar, hasta MAX_BYTES_CACHE_NDJSON: un cuerpo mayor se
+    envía sin guardarse y deja de acumularse.
+    """
+    clave = (parameters.passengers, parameters.duration, parameters.terrain, parameters.isScientific, "ndjson")
+    cuerpo = cache.obtener(clave)
+    if cuerpo is not None:
+        metricas.PETICIONES_LAYOUT.incrementar(format="ndjson", result="hit")
+        return Response(content=cuerpo, media_type="application/x-ndjson", headers={"X-Cache": "HIT"})
+
+    try:
+        reserva = ejecutor.reservar()
+    except ColaLlenaError as e:
+        metricas.PETICIONES_LAYOUT.incrementar(format="ndjson", result="rejected")
+        raise HTTPException(
+            status_code=503,
+            detail=f"Servicio ocupado: {str(e)}",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    metricas.PETICIONES_LAYOUT.incrementar(format="ndjson", result="miss")
+    # Si el cliente se desconecta antes de empezar, el generador no llega a
+    # ejecutarse: la tarea de fondo libera el hueco en ese caso
+    return StreamingResponse(
+        _lineas_ndjson(parameters, clave, reserva),
+        media_type="application/x-ndjson",
+        headers={"X-Cache": "MISS"},
+        background=BackgroundTask(reserva.liberar),
+    )
+
+async def _lineas_ndjson(parameters: MissionParameters, clave: Tuple, reserva: Reserva) -> AsyncIterator[bytes]:
+    """Líneas NDJSON del pipeline, calculadas en el threadpool; guarda el cuerpo y libera el hueco al terminar"""
+    lineas: Optional[List[bytes]] = []
+    acumulados = 0
+    try:
+        async with ejecutor.turno():
+            generador = await run_in_threadpool(
+                pipeline.generar_layout_ndjson, parameters.passengers, parameters.duration,
+                parameters.terrain, parameters.isScientific,
+            )
+            async for linea in iterate_in_threadpool(generador):
+                if lineas is not None:
+                    acumulados += len(linea)
+                    lineas.append(linea)
+                    if acumulados > MAX_BYTES_CACHE_NDJSON:
+                        lineas = None
+                yield linea
+        if lineas is not None:
+            cache.guardar(clave, b"".join(lineas))
+    except Exception:
+        metricas.PETICIONES_LAYOUT.incrementar(format="ndjson", result="error")
+        logger.exception("Error generando layout NDJSON %s", parameters)
+        raise
+    finally:
+        reserva.liberar()
+
+@app.get(
+    "/api/v1/generate-layout.ndjson",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"application/x-ndjson": {}},
+                     "description": "Cabecera, un registro por arka y resumen (ver Fase3.generar_ndjson)"}},
+    tags=["Layout Generation"],
+)
+async def generate_layout_ndjson_get(parameters: MissionParameters = Depends()):
+    """Igual que POST /api/v1/generate-layout.ndjson con los parámetros en la query"""
+    return await generate_layout_ndjson(parameters)
+
+async def calcular_con_cache(parameters: MissionParameters, generar, formato: Optional[str] = None,
+                             pool: Optional[EjecutorLayout] = None) -> Tuple[bytes, Dict[str, str]]:
+    """
+    Cache → coalescencia → pool de ejecución para un layout serializado
+    
+    Args:
+        parameters: Parámetros de la misión
+        generar: Función de pipeline que devuelve el cuerpo en bytes
+        formato: Sufijo de la clave de cache (None para el JSON)
+        pool: Ejecutor donde calcularlo (por defecto, el de las peticiones sueltas)
+    
+    Returns:
+        Tuple: (cuerpo, cabeceras X-Cache y Server-Timing)
+    
+    Raises:
+        ColaLlenaError: Si la cola del pool está llena
     """
+    pool = pool or ejecutor
+    etiqueta = formato or "json"
+    P = parameters.passengers
+    T = parameters.duration
+    TipoC = parameters.isScientific
+    terrain = parameters.terrain
+    clave = (P, T, terrain, TipoC) if formato is None else (P, T, terrain, TipoC, formato)
+
     try:
-        # TODO: Aquí irá la lógica de Fase1.py y Fase2.py
-        
-        P = parameters.passengers
-        T = parameters.duration
-        TipoC = parameters.isScientific
-        terrain = parameters.terrain
-        inventario = Fase1.calcular_modulos_arka(P, T, TipoC)
-        arkas_resultado = Fase2.colocar_inventario_completo(inventario[0])
-        json_result = Fase3.generar_json_solo_001_011_004(arkas_resultado, P, T, terrain, TipoC)
-        return json_result
-    
-        '''
-        response = MissionLayoutResponse(
-            parameters=parameters,
-            totalModules=len(example_modules),
-            modules=example_modules,
-            metadata=MissionMetadata(
-                generatedAt=datetime.utcnow().isoformat() + "Z",
-                algorithmVersion="v2.1.0",
-                estimatedCost=45000,
-                currency="ARKHA"
+        cuerpo = cache.obtener(clave)
+        if cuerpo is not None:
+            metricas.PETICIONES_LAYOUT.incrementar(format=etiqueta, result="hit")
+            return cuerpo, {"X-Cache": "HIT"}
+
+        async def calcular():
+            (cuerpo, mediciones), espera, ejecucion = await pool.ejecutar(
+                pipeline.con_mediciones, generar, P, T, terrain, TipoC
             )
+            metricas.registrar_layout(P, mediciones, espera)
+            cache.guardar(clave, cuerpo)
+            return cuerpo, f"queue;dur={espera * 1000:.1f}, run;dur={ejecucion * 1000:.1f}"
+
+        def consultar_cache():
+            cuerpo = cache.obtener(clave)
+            return (cuerpo, "") if cuerpo is not None else None
+
+        (cuerpo, server_timing), origen = await coalescedor.ejecutar(clave, calcular, consultar_cache)
+    except ColaLlenaError:
+        metricas.PETICIONES_LAYOUT.incrementar(format=etiqueta, result="rejected")
+        raise
+    except Exception:
+        metricas.PETICIONES_LAYOUT.incrementar(format=etiqueta, result="error")
+        raise
+
+    headers = {"X-Cache": "MISS" if origen == ORIGEN_LIDER else "COALESCED"}
+    metricas.PETICIONES_LAYOUT.incrementar(format=etiqueta, result=headers["X-Cache"].lower())
+    if server_timing:
+        headers["Server-Timing"] = server_timing
+    return cuerpo, headers
+
+async def responder_layout(parameters: MissionParameters, generar, media_type: str, formato: Optional[str] = None) -> Response:
+    """
+    Respuesta HTTP de calcular_con_cache para un layout serializado
+    
+    Args:
+        parameters: Parámetros de la misión
+        generar: Función de pipeline que devuelve el cuerpo en bytes
+        media_type: Content-Type de la respuesta
+        formato: Sufijo de la clave de cache (None para el JSON)
+    
+    Raises:
+        HTTPException: 503 si la cola de trabajo está llena,
+                       500 si hay errores en la generación del layout
+    """
+    try:
+        cuerpo, headers = await calcular_con_cache(parameters, generar, formato)
+        return Response(content=cuerpo, media_type=media_type, headers=headers)
+    except ColaLlenaError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Servicio ocupado: {str(e)}",
+            headers={"Retry-After": str(e.retry_after)}
         )
-        
-        return response
-        '''
     except Exception as e:
+        logger.exception("Error generando layout %s", parameters)
         raise HTTPException(
             status_code=500,
             detail=f"Error generando layout: {str(e)}"
         )
 
+async def _resultados_lote(missions: List[Dict[str, Any]]) -> AsyncIterator[Tuple[List[int], int, bytes]]:
+    """
+    Calcula los layouts de un lote y los entrega según terminan
+    
+    Las misiones repetidas se calculan una sola vez. Como mucho
+    ejecutor_lotes.workers misiones del lote están en el pool a la vez, así
+    el lote no llena la cola que comparte con otros lotes.
+    
+    Yields:
+        Tuple: (posiciones de las misiones, status, fragmento JSON del resultado sin "index")
+    """
+    posiciones: Dict[Tuple, List[int]] = {}
+    parametros: Dict[Tuple, MissionParameters] = {}
+    for indice, mision in enumerate(missions):
+        try:
+            parameters = MissionParameters.model_validate(mision)
+        except ValidationError as e:
+            yield [indice], 422, orjson.dumps({
+                "status": 422,
+                "error": "Parámetros de misión no válidos",
+                "detail": e.errors(include_url=False, include_context=False),
+            })
+            continue
+        clave = (parameters.passengers, parameters.duration, parameters.terrain, parameters.isScientific)
+        posiciones.setdefault(clave, []).append(indice)
+        parametros.setdefault(clave, parameters)
+
+    semaforo = asyncio.Semaphore(ejecutor_lotes.workers)
+
+    async def calcular(clave: Tuple) -> Tuple[List[int], int, bytes]:
+        async with semaforo:
+            try:
+                cuerpo, _ = await calcular_con_cache(parametros[clave], pipeline.generar_layout_json,
+                                                     pool=ejecutor_lotes)
+                return posiciones[clave], 200, b'{"status":200,"layout":' + cuerpo + b"}"
+            except ColaLlenaError as e:
+                return posiciones[clave], 503, orjson.dumps({"status": 503, "error": f"Servicio ocupado: {str(e)}"})
+            except Exception as e:
+                logger.exception("Error generando layout %s en un lote", clave)
+                return posiciones[clave], 500, orjson.dumps({"status": 500, "error": f"Error generando layout: {str(e)}"})
+
+    tareas = [asyncio.ensure_future(calcular(clave)) for clave in posiciones]
+    try:
+        for siguiente in asyncio.as_completed(tareas):
+            yield await siguiente
+    finally:
+        # Si el cliente se desconecta a mitad del streaming
+        for tarea in tareas:
+            tarea.cancel()
+
+def _con_indice(indice: int, fragmento: bytes) -> bytes:
+    """Antepone "index" al fragmento JSON de un resultado del lote"""
+    return b'{"index":' + str(indice).encode() + b"," + fragmento[1:]
+
+@app.post("/api/v1/generate-layout/batch", response_model=LayoutBatchResponse, tags=["Layout Generation"])
+async def generate_layout_batch(request: LayoutBatchRequest):
+    """
+    Genera el layout completo de muchas misiones en paralelo
+    
+    Pensado para estudios de escenarios con cientos de variantes de misión.
+    Las misiones repetidas se calculan una vez y el resto se reparte entre
+    los núcleos con el pool de procesos de los lotes (ARKHA_BATCH_*),
+    pasando por la cache y la coalescencia igual que /api/v1/generate-layout.
+    
+    Los resultados vuelven en el orden de la petición, cada uno con su status:
+    una misión no válida (422), rechazada por cola llena (503) o fallida (500)
+    no invalida el resto del lote.
+    
+    Returns:
+        LayoutBatchResponse: Un resultado por misión
+    """
+    fragmentos: List[Optional[bytes]] = [None] * len(request.missions)
+    unicas = 0
+    async for indices, status, fragmento in _resultados_lote(request.missions):
+        unicas += status != 422
+        for indice in indices:
+            fragmentos[indice] = _con_indice(indice, fragmento)
+    cuerpo = b"".join((
+        b'{"count":', str(len(fragmentos)).encode(),
+        b',"unique":', str(unicas).encode(),
+        b',"results":[', b",".join(fragmentos), b"]}",
+    ))
+    return Response(content=cuerpo, media_type="application/json")
+
+@app.post(
+    "/api/v1/generate-layout/batch.ndjson",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"application/x-ndjson": {}},
+                     "description": "Un LayoutBatchItem por línea, en el orden en que terminan"}},
+    tags=["Layout Generation"],
+)
+async def generate_layout_batch_ndjson(request: LayoutBatchRequest):
+    """
+    Igual que POST /api/v1/generate-layout/batch, en streaming
+    
+    Cada misión se envía como una línea NDJSON (LayoutBatchItem, con su
+    "index") en cuanto termina su cálculo, sin esperar al resto del lote.
+    """
+    async def lineas():
+        async for indices, _, fragmento in _resultados_lote(request.missions):
+            yield b"".join(_con_indice(indice, fragmento) + b"\n" for indice in indices)
+
+    return StreamingResponse(lineas(), media_type="application/x-ndjson")
+
+@app.post("/api/v1/inventory/batch", response_model=InventoryBatchResponse, tags=["Inventory"])
+async def inventory_batch(request: InventoryBatchRequest):
+    """
+    Calcula el inventario de Fase1 para muchas misiones a la vez
+    
+    Pensado para herramientas de planificación que comparan miles de
+    combinaciones (pasajeros, duración, isScientific). Todas las reglas se
+    evalúan de forma vectorizada (Fase1.calcular_modulos_arka_batch).
+    
+    Returns:
+        InventoryBatchResponse: Matriz [n, 27] con la cantidad de cada módulo
+    """
+    try:
+        resultado, _, _ = await ejecutor.ejecutar(
+            pipeline.calcular_inventario_batch,
+            request.passengers, request.duration, request.isScientific
+        )
+        return resultado
+    except ColaLlenaError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Servicio ocupado: {str(e)}",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except Exception as e:
+        logger.exception("Error calculando inventario del lote")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error calculando inventario: {str(e)}"
+        )
+
+@app.post("/api/v1/sweep", response_model=SweepResponse, tags=["Inventory"])
+async def sweep(request: SweepRequest):
+    """
+    Barrido de pasajeros x duraciones para planificación de misiones
+    
+    Parte los rangos en tramos de inventario constante (bandas de duración de
+    Fase1 y días hasta 365 para STORAGE), coloca cada inventario distinto una
+    sola vez en el pool de procesos de los lotes y une los tramos con el mismo
+    resultado (ver barrido.py).
+    
+    Solo la planificación puede devolver 503: una vez admitido, si el pool
+    está lleno, cada paquete espera Retry-After y reintenta (como el
+    calentamiento) en lugar de tirar el barrido a medias. Si el barrido falla
+    o se cancela, los paquetes pendientes se cancelan.
+    
+    Returns:
+        SweepResponse: Arkas, módulos, coste y eficiencia por (P, tipo, tramo de T)
+    """
+    try:
+        plan, _, _ = await ejecutor_lotes.ejecutar(
+            barrido.planificar,
+            (request.passengersMin, request.passengersMax),
+            (request.durationMin, request.durationMax),
+            request.isScientific,
+        )
+        semaforo = asyncio.Semaphore(ejecutor_lotes.workers)
+
+        async def colocar(paquete):
+            async with semaforo:
+                while True:
+                    try:
+                        resultados, _, _ = await ejecutor_lotes.ejecutar(barrido.colocar_inventarios, paquete)
+                        return resultados
+                    except ColaLlenaError as e:
+                        await asyncio.sleep(e.retry_after)
+
+        tareas = [asyncio.ensure_future(colocar(paquete)) for paquete in barrido.paquetes(plan.tareas)]
+        try:
+            por_paquete = await asyncio.gather(*tareas)
+        finally:
+            # Si un paquete falla o la petición se cancela, no seguir enviando el resto
+            for tarea in tareas:
+                tarea.cancel()
+        tabla, _, _ = await ejecutor_lotes.ejecutar(
+            barrido.combinar, plan, [resultado for paquete in por_paquete for resultado in paquete]
+        )
+        return Response(content=orjson.dumps(tabla), media_type="application/json")
+    except ColaLlenaError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Servicio ocupado: {str(e)}",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except Exception as e:
+        logger.exception("Error en el barrido %s", request)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error en el barrido: {str(e)}"
+        )
+
+@app.get("/api/v1/executor/stats", response_model=ExecutorStats, tags=["Health"])
+async def executor_stats():
+    """
+    Estado del pool de ejecución de layouts
+    
+    Expone por separado el tiempo de espera en cola y el tiempo de ejecución
+    para dimensionar el número de workers (ARKHA_EXECUTOR_WORKERS).
+    """
+    return ejecutor.estadisticas()
+
+@app.get("/api/v1/cache/stats", response_model=CacheStats, tags=["Health"])
+async def cache_stats():
+    """
+    Estado de la cache de layouts
+    
+    Contadores de aciertos (memoria y disco), fallos y expulsiones.
+    """
+    return cache.estadisticas()
+
+@app.get("/api/v1/coalescing/stats", response_model=CoalescingStats, tags=["Health"])
+async def coalescing_stats():
+    """
+    Estado de la coalescencia de peticiones
+    
+    Cuántas peticiones calcularon el layout y cuántas reutilizaron el
+    cálculo en vuelo de otra (en este worker o en otro worker).
+    """
+    return coalescedor.estadisticas()
+
 # =============================================================================
 # EJECUTAR EL SERVIDOR
 # =============================================================================
 
 if __name__ == "__main__":
+    configurar_logging()
     uvicorn.run(
         "main:app",
         host="0.0.0.0",
@@ -0,0 +1,233 @@
+"""
+===============================================================================
+MÉTRICAS EN FORMATO DE EXPOSICIÓN DE PROMETHEUS
+===============================================================================
+
+Registro mínimo de contadores, indicadores e histogramas, sin dependencias
+externas. GET /metrics devuelve REGISTRO.exponer() en el formato de texto de
+Prometheus (versión 0.0.4).
+
+MÉTRICAS DEL PIPELINE:
+- arkha_phase_duration_seconds{phase, passengers}: histograma del tiempo de
+  cada fase (fase1 = inventario, fase2 = colocación, fase3 = geometría,
+  serializacion = cuerpo de respuesta), por tramo de pasajeros
+- arkha_queue_wait_seconds{passengers}: espera en la cola del ejecutor
+- arkha_arkas_created_total, arkha_modules_placed_total,
+  arkha_slots_evaluated_total, arkha_score_evaluations_total: contadores de
+  la colocación (ver Fase2.ContextoColocacion)
+- arkha_layout_requests_total{format, result}: peticiones de layout por
+  formato y resultado (hit, miss, coalesced, rejected, error)
+- arkha_placement_cache_requests_total{result}: colocaciones buscadas en la
+  cache por inventario (prebuilt, hit, shared_hit, miss; ver cache_colocacion.py)
+- arkha_executor_in_flight, arkha_cache_bytes: ocupación del ejecutor y de
+  la cache, fijadas al exponer
+
+Los valores son del proceso: con varios workers de uvicorn, cada uno expone
+los suyos (Prometheus los agrega por instancia).
+"""
+
+import math
+import threading
+from typing import Dict, List, Sequence, Tuple
+
+MEDIA_TYPE = "text/plain; version=0.0.4"  # Starlette añade "; charset=utf-8"
+
+# Tramos de pasajeros para las etiquetas de los histogramas: (máximo, etiqueta)
+TRAMOS_PASAJEROS = ((10, "1-10"), (30, "11-30"), (100, "31-100"), (300, "101-300"))
+
+LIMITES_SEGUNDOS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def tramo_pasajeros(P: int) -> str:
+    """Etiqueta del tramo de pasajeros de una misión"""
+    for maximo, etiqueta in TRAMOS_PASAJEROS:
+        if P <= maximo:
+            return etiqueta
+    return f"{TRAMOS_PASAJEROS[-1][0] + 1}+"
+
+
+def _valor(numero: float) -> str:
+    """Número en el formato de exposición (enteros sin decimales, +Inf)"""
+    if math.isinf(numero):
+        return "+Inf" if numero > 0 else "-Inf"
+    if float(numero).is_integer():
+        return str(int(numero))
+    return repr(float(numero))
+
+
+def _escapar(valor: str) -> str:
+    """Escapa \\, " y saltos de línea en el valor de una etiqueta"""
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _etiquetas(nombres: Sequence[str], valores: Sequence[str]) -> str:
+    """{a="x",b="y"} (vacío si no hay etiquetas)"""
+    if not nombres:
+        return ""
+    return "{" + ",".join(f'{nombre}="{_escapar(valor)}"' for nombre, valor in zip(nombres, valores)) + "}"
+
+
+class _Metrica:
+    """Base común: nombre, ayuda, etiquetas y valores por combinación de etiquetas"""
+
+    tipo = ""
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = ()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._lock = threading.Lock()
+
+    def _clave(self, etiquetas: Dict[str, str]) -> Tuple[str, ...]:
+        if set(etiquetas) != set(self.etiquetas):
+            raise ValueError(f"{self.nombre} usa las etiquetas {self.etiquetas}, no {tuple(etiquetas)}")
+        return tuple(str(etiquetas[nombre]) for nombre in self.etiquetas)
+
+    def _cabecera(self) -> List[str]:
+        return [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} {self.tipo}"]
+
+
+class Contador(_Metrica):
+    """Valor que solo crece"""
+
+    tipo = "counter"
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = ()):
+        super().__init__(nombre, ayuda, etiquetas)
+        self._valores: Dict[Tuple[str, ...], float] = {}
+
+    def incrementar(self, cantidad: float = 1, **etiquetas):
+        if cantidad < 0:
+            raise ValueError("Un contador no puede decrementarse")
+        clave = self._clave(etiquetas)
+        with self._lock:
+            self._valores[clave] = self._valores.get(clave, 0) + cantidad
+
+    def valor(self, **etiquetas) -> float:
+        with self._lock:
+            return self._valores.get(self._clave(etiquetas), 0)
+
+    def exponer(self) -> List[str]:
+        with self._lock:
+            valores = sorted(self._valores.items())
+        if not valores and not self.etiquetas:
+            valores = [((), 0)]
+        return self._cabecera() + [
+            f"{self.nombre}{_etiquetas(self.etiquetas, clave)} {_valor(valor)}" for clave, valor in valores
+        ]
+
+
+class Indicador(Contador):
+    """Valor que puede subir y bajar (se fija al exponer, p. ej. ocupación de la cache)"""
+
+    tipo = "gauge"
+
+    def fijar(self, valor: float, **etiquetas):
+        clave = self._clave(etiquetas)
+        with self._lock:
+            self._valores[clave] = valor
+
+
+class Histograma(_Metrica):
+    """Distribución acumulada por límites superiores (le), con suma y número de observaciones"""
+
+    tipo = "histogram"
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = (),
+                 limites: Sequence[float] = LIMITES_SEGUNDOS):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.limites = tuple(sorted(limites))
+        # clave → [cuentas por límite (sin acumular) + desbordes, suma]
+        self._series: Dict[Tuple[str, ...], List] = {}
+
+    def observar(self, valor: float, **etiquetas):
+        clave = self._clave(etiquetas)
+        indice = next((i for i, limite in enumerate(self.limites) if valor <= limite), len(self.limites))
+        with self._lock:
+            serie = self._series.get(clave)
+            if serie is None:
+                serie = self._series[clave] = [[0] * (len(self.limites) + 1), 0.0]
+            serie[0][indice] += 1
+            serie[1] += valor
+
+    def exponer(self) -> List[str]:
+        with self._lock:
+            series = sorted((clave, list(cuentas), suma) for clave, (cuentas, suma) in self._series.items())
+        lineas = self._cabecera()
+        nombres_le = self.etiquetas + ("le",)
+        for clave, cuentas, suma in series:
+            acumulado = 0
+            for limite, cuenta in zip(self.limites + (math.inf,), cuentas):
+                acumulado += cuenta
+                lineas.append(f"{self.nombre}_bucket{_etiquetas(nombres_le, clave + (_valor(limite),))} {acumulado}")
+            lineas.append(f"{self.nombre}_sum{_etiquetas(self.etiquetas, clave)} {_valor(suma)}")
+            lineas.append(f"{self.nombre}_count{_etiquetas(self.etiquetas, clave)} {acumulado}")
+        return lineas
+
+
+class Registro:
+    """Conjunto de métricas expuestas juntas en /metrics"""
+
+    def __init__(self):
+        self._metricas: List[_Metrica] = []
+
+    def registrar(self, metrica: _Metrica) -> _Metrica:
+        if any(existente.nombre == metrica.nombre for existente in self._metricas):
+            raise ValueError(f"Métrica duplicada: {metrica.nombre}")
+        self._metricas.append(metrica)
+        return metrica
+
+    def exponer(self) -> str:
+        """Todas las métricas en formato de exposición de texto"""
+        lineas = []
+        for metrica in self._metricas:
+            lineas.extend(metrica.exponer())
+        return "\n".join(lineas) + "\n"
+
+
+REGISTRO = Registro()
+
+DURACION_FASES = REGISTRO.registrar(Histograma(
+    "arkha_phase_duration_seconds", "Tiempo de cada fase del pipeline de layouts", ("phase", "passengers")))
+ESPERA_COLA = REGISTRO.registrar(Histograma(
+    "arkha_queue_wait_seconds", "Espera en la cola del ejecutor antes de calcular un layout", ("passengers",)))
+ARKAS_CREADAS = REGISTRO.registrar(Contador(
+    "arkha_arkas_created_total", "Arkas creadas por la colocación de Fase2"))
+MODULOS_COLOCADOS = REGISTRO.registrar(Contador(
+    "arkha_modules_placed_total", "Módulos colocados por la colocación de Fase2"))
+HUECOS_EVALUADOS = REGISTRO.registrar(Contador(
+    "arkha_slots_evaluated_total", "Huecos consultados en encontrar_mejor_posicion"))
+EVALUACIONES_SCORE = REGISTRO.registrar(Contador(
+    "arkha_score_evaluations_total", "Huecos evaluados desde cero (sin cache de scores)"))
+PETICIONES_LAYOUT = REGISTRO.registrar(Contador(
+    "arkha_layout_requests_total", "Peticiones de layout por formato y resultado", ("format", "result")))
+CACHE_COLOCACION = REGISTRO.registrar(Contador(
+    "arkha_placement_cache_requests_total", "Colocaciones de Fase2 buscadas en la cache por inventario", ("result",)))
+TRABAJOS_EN_CURSO = REGISTRO.registrar(Indicador(
+    "arkha_executor_in_flight", "Layouts ejecutándose o en cola en el ejecutor"))
+BYTES_CACHE = REGISTRO.registrar(Indicador(
+    "arkha_cache_bytes", "Bytes ocupados por la cache de layouts en memoria"))
+
+
+def registrar_layout(P: int, mediciones: Dict, espera: float = None):
+    """
+    Registra las mediciones de un cálculo de layout (ver pipeline.con_mediciones)
+
+    Args:
+        P: Pasajeros de la misión (para el tramo)
+        mediciones: {"fases": {fase: segundos}, "colocacion": {contador: valor},
+                     "cacheColocacion": origen (opcional)}
+        espera: Segundos en la cola del ejecutor
+    """
+    tramo = tramo_pasajeros(P)
+    for fase, segundos in mediciones["fases"].items():
+        DURACION_FASES.observar(segundos, phase=fase, passengers=tramo)
+    if espera is not None:
+        ESPERA_COLA.observar(espera, passengers=tramo)
+    colocacion = mediciones["colocacion"]
+    ARKAS_CREADAS.incrementar(colocacion.get("arkas", 0))
+    MODULOS_COLOCADOS.incrementar(colocacion.get("modulos", 0))
+    HUECOS_EVALUADOS.incrementar(colocacion.get("huecos", 0))
+    EVALUACIONES_SCORE.incrementar(colocacion.get("scores", 0))
+    if "cacheColocacion" in mediciones:
+        CACHE_COLOCACION.incrementar(result=mediciones["cacheColocacion"])
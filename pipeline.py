@@ -0,0 +1,193 @@
+"""
+===============================================================================
+PIPELINE DE GENERACIÓN DE LAYOUTS
+===============================================================================
+
+Encadena las tres fases del algoritmo para una misión:
+1. Fase1: inventario de módulos a partir de pasajeros, duración y tipo
+   (consultado en la tabla precalculada de tabla_inventario.py)
+2. Fase2: colocación de los módulos en arkas
+3. Fase3: conversión de las arkas a posiciones 3D y JSON de respuesta
+
+Las funciones de este módulo son de nivel superior para que puedan enviarse
+a un pool de procesos (deben poder serializarse con pickle).
+
+MEDICIONES:
+Cada función mide sus fases (fase1, fase2, fase3 y serializacion), los
+contadores de la colocación y si la colocación salió de la cache por
+inventario (cache_colocacion.py). Solo se guardan si se ejecuta dentro de
+con_mediciones, que devuelve las mediciones junto al resultado: así viajan
+de vuelta también desde un pool de procesos (ver metricas.registrar_layout).
+"""
+
+import contextlib
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+import Fase1
+import Fase2
+import Fase3
+import cache_colocacion
+import exportar_gltf
+import layout_binario
+import tabla_inventario
+
+# Mediciones del cálculo en curso en cada hilo (None = no se miden)
+_mediciones = threading.local()
+
+
+def con_mediciones(generar: Callable, *args) -> Tuple[Any, Dict]:
+    """
+    Ejecuta generar(*args) guardando sus mediciones
+
+    Returns:
+        Tuple: (resultado, {"fases": {fase: segundos}, "colocacion": {contador: valor}})
+    """
+    mediciones = {"fases": {}, "colocacion": {}}
+    _mediciones.actual = mediciones
+    try:
+        return generar(*args), mediciones
+    finally:
+        _mediciones.actual = None
+
+
+@contextlib.contextmanager
+def _fase(nombre: str):
+    """Mide el bloque como la fase `nombre` del cálculo en curso"""
+    inicio = time.perf_counter()
+    yield
+    mediciones = getattr(_mediciones, "actual", None)
+    if mediciones is not None:
+        fases = mediciones["fases"]
+        fases[nombre] = fases.get(nombre, 0.0) + time.perf_counter() - inicio
+
+
+def _colocar(P: int, T: int, TipoC: bool) -> List[dict]:
+    """
+    Fase1 (inventario) → Fase2 (colocación), con sus mediciones
+
+    La colocación se busca antes en la cache por inventario (compartida por
+    todas las misiones con el mismo inventario, ver cache_colocacion.py).
+    """
+    with _fase("fase1"):
+        inventario = tabla_inventario.calcular_modulos_arka(P, T, TipoC)
+    contexto = Fase2.ContextoColocacion()
+    with _fase("fase2"):
+        arkas_resultado, origen = cache_colocacion.colocar(inventario[0], contexto)
+    mediciones = getattr(_mediciones, "actual", None)
+    if mediciones is not None:
+        mediciones["cacheColocacion"] = origen
+        mediciones["colocacion"] = {
+            "arkas": contexto.contador_arkas,
+            "modulos": contexto.modulos_colocados,
+            "huecos": contexto.huecos_evaluados,
+            "scores": contexto.evaluaciones_score,
+        }
+    return arkas_resultado
+
+
+def generar_layout(P: int, T: int, terrain: str, TipoC: bool) -> dict:
+    """
+    Ejecuta Fase1 → Fase2 → Fase3 para una misión
+
+    Args:
+        P: Número de pasajeros
+        T: Duración de la misión en días
+        terrain: Tipo de terreno ("moon", "mars", "asteroid")
+        TipoC: Si es una misión científica
+
+    Returns:
+        dict: JSON de respuesta con parámetros, módulos y metadatos
+    """
+    arkas_resultado = _colocar(P, T, TipoC)
+    with _fase("fase3"):
+        return Fase3.generar_json_solo_001_011_004(arkas_resultado, P, T, terrain, TipoC)
+
+
+def generar_layout_json(P: int, T: int, terrain: str, TipoC: bool) -> bytes:
+    """
+    Igual que generar_layout pero devuelve el cuerpo JSON ya serializado
+    
+    Es lo que usa la API: el layout se serializa directamente desde los
+    arrays de Fase3 (ver Fase3.serializar_layout), sin pasar por Pydantic.
+    
+    Returns:
+        bytes: Cuerpo JSON con el formato de MissionLayoutResponse
+    """
+    arkas_resultado = _colocar(P, T, TipoC)
+    with _fase("fase3"):
+        layout, _, _ = Fase3.calcular_layout(arkas_resultado, P, T)
+    with _fase("serializacion"):
+        return Fase3.serializar_layout(layout, P, T, terrain, TipoC)
+
+
+def generar_layout_binario(P: int, T: int, terrain: str, TipoC: bool) -> bytes:
+    """
+    Igual que generar_layout pero empaquetado en el formato binario ARKL
+
+    Returns:
+        bytes: Buffer ARKL (ver layout_binario.py)
+    """
+    arkas_resultado = _colocar(P, T, TipoC)
+    with _fase("fase3"):
+        layout, _, _ = Fase3.calcular_layout(arkas_resultado, P, T)
+    with _fase("serializacion"):
+        return layout_binario.codificar_layout(layout, P, T, terrain, TipoC, len(arkas_resultado))
+
+
+def generar_layout_glb(P: int, T: int, terrain: str, TipoC: bool, uri_base: str = "") -> bytes:
+    """
+    Igual que generar_layout pero como escena glTF binaria con instancias
+
+    Args:
+        uri_base: Prefijo de las URIs de los modelos de módulo (ver exportar_gltf.py)
+
+    Returns:
+        bytes: Archivo GLB con un nodo EXT_mesh_gpu_instancing por tipo de módulo
+    """
+    arkas_resultado = _colocar(P, T, TipoC)
+    with _fase("fase3"):
+        layout, _, _ = Fase3.calcular_layout(arkas_resultado, P, T)
+    with _fase("serializacion"):
+        return exportar_gltf.exportar_glb(layout, uri_base)
+
+
+def generar_layout_ndjson(P: int, T: int, terrain: str, TipoC: bool) -> Iterator[bytes]:
+    """
+    Igual que generar_layout pero como generador de líneas NDJSON, arka por arka
+
+    La colocación sale de la tabla precalculada o de la cache por inventario
+    si está; si no, Fase2 entrega cada arka en cuanto es definitiva (y la
+    colocación se guarda en la cache al terminar). Fase3 serializa cada arka
+    en ese momento (ver Fase3.generar_ndjson): el primer registro sale antes
+    de terminar la colocación y nunca se construye el documento completo.
+
+    Returns:
+        Iterator[bytes]: Cabecera, un registro por arka y resumen final
+    """
+    inventario = tabla_inventario.calcular_modulos_arka(P, T, TipoC)
+    arkas, _ = cache_colocacion.colocar_incremental(inventario[0])
+    return Fase3.generar_ndjson(arkas, P, T, terrain, TipoC)
+
+
+def calcular_inventario_batch(P: List[int], T: List[int], TipoC: List[bool]) -> dict:
+    """
+    Inventario de Fase1 para muchas misiones a la vez (versión vectorizada)
+
+    Args:
+        P: Pasajeros de cada misión
+        T: Duración en días de cada misión
+        TipoC: Si cada misión es científica
+
+    Returns:
+        dict: Matriz de inventario [n, 27] y totales por misión
+    """
+    modulos, total_modulos, total_minimo = Fase1.calcular_modulos_arka_batch(P, T, TipoC)
+    return {
+        "count": int(modulos.shape[0]),
+        "columns": list(Fase1.MODULOS_INFO.keys()),
+        "modules": modulos.tolist(),
+        "totalModules": total_modulos.tolist(),
+        "minimumModules": total_minimo.tolist(),
+    }
@@ -0,0 +1,320 @@
+"""
+===============================================================================
+PRUEBA DE CARGA HTTP LOCAL
+===============================================================================
+
+Arranca uvicorn en local (una vez por cada número de workers indicado), lo
+somete a carga con un número fijo de clientes concurrentes (bucle cerrado:
+cada cliente envía la siguiente petición al recibir la respuesta) y mide:
+- latencia: media, p50, p95, p99, máximo e histograma
+- peticiones por segundo y tasa de error (por código de estado)
+- CPU del servidor: núcleos usados por uvicorn y sus workers durante la
+  carga (leídos de /proc; solo Linux)
+- CPU del cliente: núcleos usados por este script; si se acerca a 1, el
+  generador de carga es el cuello de botella y las cifras son un mínimo
+
+MEZCLA DE PETICIONES:
+- Por defecto, misiones aleatorias (semilla fija): pasajeros en --pasajeros,
+  duraciones en --duraciones, terreno aleatorio y --cientificas de ellas
+  científicas
+- Con --traza, se reproducen en bucle las peticiones de un archivo JSONL:
+  cada línea es un objeto con los parámetros de la misión, o con "body" y
+  opcionalmente "path" (por defecto /api/v1/generate-layout)
+
+No necesita servicios externos; usa httpx como cliente.
+
+USO:
+    python prueba_carga.py [--workers 1 2 4] [--concurrencia 16] [--duracion 20]
+                           [--traza peticiones.jsonl] [--sin-cache] [--salida carga.json]
+    python prueba_carga.py --url http://localhost:8001 ...   (servidor ya arrancado, sin CPU)
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import httpx
+
+RUTA_POR_DEFECTO = "/api/v1/generate-layout"
+TERRENOS = ("moon", "mars", "asteroid")
+
+# Límites superiores (ms) del histograma de latencias
+LIMITES_HISTOGRAMA_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+
+# =============================================================================
+# MEZCLA DE PETICIONES
+# =============================================================================
+
+def peticiones_aleatorias(pasajeros: Tuple[int, int], duraciones: Tuple[int, int],
+                          cientificas: float, semilla: int) -> Iterator[Tuple[str, Dict]]:
+    """Misiones aleatorias e infinitas: (ruta, cuerpo)"""
+    aleatorio = random.Random(semilla)
+    while True:
+        yield RUTA_POR_DEFECTO, {
+            "passengers": aleatorio.randint(*pasajeros),
+            "duration": aleatorio.randint(*duraciones),
+            "terrain": aleatorio.choice(TERRENOS),
+            "isScientific": aleatorio.random() < cientificas,
+        }
+
+
+def peticiones_de_traza(archivo: str) -> Iterator[Tuple[str, Dict]]:
+    """Peticiones de un archivo JSONL, repetidas en bucle: (ruta, cuerpo)"""
+    with open(archivo, encoding="utf-8") as f:
+        lineas = [json.loads(linea) for linea in f if linea.strip()]
+    if not lineas:
+        raise ValueError(f"La traza {archivo} no tiene peticiones")
+    peticiones = [(linea.get("path", RUTA_POR_DEFECTO), linea["body"] if "body" in linea else linea)
+                  for linea in lineas]
+    while True:
+        yield from peticiones
+
+
+# =============================================================================
+# SERVIDOR LOCAL
+# =============================================================================
+
+def _puerto_libre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def arrancar_servidor(workers: int, entorno: Dict[str, str]) -> Tuple[subprocess.Popen, str]:
+    """Arranca uvicorn con `workers` workers y espera a que /health responda"""
+    puerto = _puerto_libre()
+    proceso = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(puerto),
+         "--workers", str(workers), "--log-level", "warning", "--no-access-log"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env={**os.environ, **entorno},
+    )
+    url = f"http://127.0.0.1:{puerto}"
+    limite = time.monotonic() + 60
+    while time.monotonic() < limite:
+        if proceso.poll() is not None:
+            raise RuntimeError(f"uvicorn terminó al arrancar (código {proceso.returncode})")
+        try:
+            if httpx.get(f"{url}/health", timeout=1).status_code == 200:
+                return proceso, url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    proceso.terminate()
+    raise RuntimeError("uvicorn no respondió a /health en 60 s")
+
+
+def parar_servidor(proceso: subprocess.Popen):
+    proceso.terminate()
+    try:
+        proceso.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        proceso.kill()
+        proceso.wait()
+
+
+def cpu_arbol_procesos(pid: int) -> Optional[float]:
+    """
+    Segundos de CPU (usuario + sistema) del proceso `pid` y sus descendientes
+
+    Returns:
+        float, o None si /proc no está disponible
+    """
+    try:
+        entradas = [nombre for nombre in os.listdir("/proc") if nombre.isdigit()]
+    except OSError:
+        return None
+    hijos: Dict[int, List[int]] = {}
+    ticks: Dict[int, int] = {}
+    for nombre in entradas:
+        try:
+            with open(f"/proc/{nombre}/stat") as f:
+                campos = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        # Tras el nombre: estado(0) ppid(1) ... utime(11) stime(12)
+        hijos.setdefault(int(campos[1]), []).append(int(nombre))
+        ticks[int(nombre)] = int(campos[11]) + int(campos[12])
+    total = 0
+    pendientes = [pid]
+    while pendientes:
+        actual = pendientes.pop()
+        total += ticks.get(actual, 0)
+        pendientes.extend(hijos.get(actual, ()))
+    return total / os.sysconf("SC_CLK_TCK")
+
+
+# =============================================================================
+# CARGA
+# =============================================================================
+
+async def generar_carga(url: str, peticiones: Iterator[Tuple[str, Dict]], concurrencia: int,
+                        duracion: float, timeout: float) -> Tuple[List[float], Counter, float]:
+    """
+    Envía peticiones con `concurrencia` clientes durante `duracion` segundos
+
+    Returns:
+        Tuple: (latencias de las respuestas 2xx en ms, cuenta por estado, segundos reales)
+    """
+    latencias: List[float] = []
+    estados: Counter = Counter()
+    limites = httpx.Limits(max_connections=concurrencia, max_keepalive_connections=concurrencia)
+
+    async with httpx.AsyncClient(base_url=url, limits=limites, timeout=timeout) as cliente:
+        fin = time.perf_counter() + duracion
+
+        async def usuario():
+            while time.perf_counter() < fin:
+                ruta, cuerpo = next(peticiones)
+                inicio = time.perf_counter()
+                try:
+                    respuesta = await cliente.post(ruta, json=cuerpo)
+                    await respuesta.aread()
+                    estado = str(respuesta.status_code)
+                except httpx.HTTPError as e:
+                    estado = type(e).__name__
+                if estado.startswith("2"):
+                    latencias.append((time.perf_counter() - inicio) * 1000)
+                estados[estado] += 1
+
+        inicio = time.perf_counter()
+        await asyncio.gather(*(usuario() for _ in range(concurrencia)))
+        return latencias, estados, time.perf_counter() - inicio
+
+
+def percentil(valores_ordenados: List[float], p: float) -> float:
+    """Percentil p (0-100) por el método del rango más cercano"""
+    if not valores_ordenados:
+        return float("nan")
+    rango = math.ceil(p / 100 * len(valores_ordenados))
+    return valores_ordenados[max(0, min(len(valores_ordenados), rango) - 1)]
+
+
+def resumir(latencias: List[float], estados: Counter, segundos: float,
+            cpu: Optional[float], cpu_cliente: float) -> Dict:
+    """Resumen de una ejecución de carga"""
+    ordenadas = sorted(latencias)
+    total = sum(estados.values())
+    errores = total - len(ordenadas)
+    histograma = Counter()
+    for latencia in ordenadas:
+        limite = next((limite for limite in LIMITES_HISTOGRAMA_MS if latencia <= limite), None)
+        histograma["+Inf" if limite is None else str(limite)] += 1
+    return {
+        "requests": total,
+        "errors": errores,
+        "errorRate": errores / total if total else 0.0,
+        "statusCounts": dict(sorted(estados.items())),
+        "seconds": segundos,
+        "rps": total / segundos if segundos else 0.0,
+        "latencyMs": {
+            "mean": statistics.fmean(ordenadas) if ordenadas else float("nan"),
+            "p50": percentil(ordenadas, 50),
+            "p95": percentil(ordenadas, 95),
+            "p99": percentil(ordenadas, 99),
+            "max": ordenadas[-1] if ordenadas else float("nan"),
+        },
+        "histogramMs": {limite: histograma[limite] for limite in
+                        [str(limite) for limite in LIMITES_HISTOGRAMA_MS] + ["+Inf"] if histograma[limite]},
+        "serverCpuSeconds": cpu,
+        "serverCpuCores": cpu / segundos if cpu is not None and segundos else None,
+        "clientCpuCores": cpu_cliente / segundos if segundos else None,
+    }
+
+
+def imprimir(workers, resumen: Dict):
+    latencia = resumen["latencyMs"]
+    cpu = resumen["serverCpuCores"]
+    print(f"{str(workers):>8}{resumen['requests']:>12}{resumen['rps']:>10.1f}"
+          f"{latencia['p50']:>9.1f}{latencia['p95']:>9.1f}{latencia['p99']:>9.1f}{latencia['max']:>9.1f}"
+          f"{resumen['errorRate']:>9.2%}{'n/d' if cpu is None else f'{cpu:.2f}':>14}"
+          f"{resumen['clientCpuCores']:>13.2f}")
+
+
+def _rango(texto: str) -> Tuple[int, int]:
+    """"1-300" → (1, 300); "30" → (30, 30)"""
+    minimo, _, maximo = texto.partition("-")
+    return int(minimo), int(maximo or minimo)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prueba de carga de /api/v1/generate-layout contra uvicorn local")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1], help="Workers de uvicorn a probar")
+    parser.add_argument("--url", help="Usar un servidor ya arrancado en lugar de arrancar uvicorn")
+    parser.add_argument("--concurrencia", type=int, default=16, help="Clientes concurrentes")
+    parser.add_argument("--duracion", type=float, default=20, help="Segundos de carga por ejecución")
+    parser.add_argument("--calentamiento", type=float, default=2, help="Segundos de carga previa sin medir")
+    parser.add_argument("--timeout", type=float, default=30, help="Timeout por petición en segundos")
+    parser.add_argument("--traza", help="Archivo JSONL de peticiones a reproducir")
+    parser.add_argument("--pasajeros", type=_rango, default=(1, 300), help="Rango de pasajeros, p. ej. 1-300")
+    parser.add_argument("--duraciones", type=_rango, default=(1, 3650), help="Rango de duraciones, p. ej. 1-3650")
+    parser.add_argument("--cientificas", type=float, default=0.5, help="Fracción de misiones científicas")
+    parser.add_argument("--semilla", type=int, default=0, help="Semilla de la mezcla aleatoria")
+    parser.add_argument("--sin-cache", action="store_true",
+                        help="Arranca el servidor sin cache de layouts ni de colocaciones (ni tabla precalculada)")
+    parser.add_argument("--salida", help="Archivo JSON con los resultados")
+    args = parser.parse_args()
+
+    entorno = {"ARKHA_LOG_LEVEL": "WARNING"}
+    if args.sin_cache:
+        entorno.update({"ARKHA_CACHE_MAX_BYTES": "0", "ARKHA_CACHE_DIR": "",
+                        "ARKHA_PLACEMENT_CACHE_MAX_BYTES": "0", "ARKHA_PLACEMENT_CACHE_DB": "",
+                        "ARKHA_TABLA_COLOCACIONES_DIR": ""})
+
+    def nuevas_peticiones():
+        if args.traza:
+            return peticiones_de_traza(args.traza)
+        return peticiones_aleatorias(args.pasajeros, args.duraciones, args.cientificas, args.semilla)
+
+    print(f"concurrencia={args.concurrencia} duración={args.duracion}s "
+          f"mezcla={'traza ' + args.traza if args.traza else 'aleatoria'} cache={'no' if args.sin_cache else 'sí'}")
+    print(f"{'workers':>8}{'peticiones':>12}{'rps':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+          f"{'errores':>9}{'CPU servidor':>14}{'CPU cliente':>13}")
+
+    resultados = []
+    for workers in ([None] if args.url else args.workers):
+        proceso = None
+        url = args.url
+        if url is None:
+            proceso, url = arrancar_servidor(workers, entorno)
+        try:
+            if args.calentamiento > 0:
+                asyncio.run(generar_carga(url, nuevas_peticiones(), args.concurrencia,
+                                          args.calentamiento, args.timeout))
+            cpu_inicio = cpu_arbol_procesos(proceso.pid) if proceso else None
+            cpu_cliente = time.process_time()
+            latencias, estados, segundos = asyncio.run(
+                generar_carga(url, nuevas_peticiones(), args.concurrencia, args.duracion, args.timeout))
+            cpu_cliente = time.process_time() - cpu_cliente
+            cpu_fin = cpu_arbol_procesos(proceso.pid) if proceso else None
+        finally:
+            if proceso is not None:
+                parar_servidor(proceso)
+
+        cpu = cpu_fin - cpu_inicio if cpu_inicio is not None and cpu_fin is not None else None
+        resumen = {"workers": workers, "concurrency": args.concurrencia, **resumir(latencias, estados, segundos, cpu, cpu_cliente)}
+        resultados.append(resumen)
+        imprimir(workers if workers is not None else "-", resumen)
+
+    for resumen in resultados:
+        print(f"\nHistograma de latencias (workers={resumen['workers']}):")
+        total = max(sum(resumen["histogramMs"].values()), 1)
+        for limite, cuenta in resumen["histogramMs"].items():
+            etiqueta = f"<= {limite} ms" if limite != "+Inf" else "> " + str(LIMITES_HISTOGRAMA_MS[-1]) + " ms"
+            print(f"  {etiqueta:>12} {cuenta:>8} {'#' * round(40 * cuenta / total)}")
+
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump({"options": vars(args), "results": resultados}, f, indent=2, ensure_ascii=False, default=str)
+        print(f"\nResultados guardados en {args.salida}")
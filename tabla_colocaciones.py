@@ -0,0 +1,264 @@
+"""
+===============================================================================
+TABLA PRECALCULADA DE COLOCACIONES - FASE 2
+===============================================================================
+
+El dominio de misiones es finito (P en 1..300, T en 1..3650, TipoC booleano)
+y solo tiene unos 44 000 inventarios distintos (ver barrido.planificar).
+Este módulo pasa cada uno por Fase2.colocar_inventario_completo al construir
+la imagen y guarda las arkas en tablas .npy que el servicio abre con
+memory-map: una colocación del dominio se responde sin calcular nada y las
+páginas las comparten todos los workers del sistema.
+
+ESTRUCTURA DE LAS TABLAS:
+- colocaciones_inventarios.npy: uint16 big-endian [n, 27]
+  Cantidades de cada inventario en el orden de tabla_inventario.CODIGOS,
+  ordenadas por sus bytes (en big-endian, orden lexicográfico numérico): la
+  búsqueda es binaria (np.searchsorted) sobre la tabla mapeada.
+- colocaciones_indice.npy: uint32 [n + 1]
+  Desplazamiento de la colocación de cada inventario en los códigos.
+- colocaciones_codigos.npy: uint8 [total]
+  Huecos de todas las arkas seguidas (pisos * 4 por arka, código de
+  Fase2.CODIGO_DE_MODULO, 0 = vacío). Las arkas se numeran desde 1 y el
+  número fija los pisos (Fase2.pisos_arka) y las direcciones
+  (Fase2.direccion), así que no se guardan.
+
+CONSTRUCCIÓN (paso de build, ver Dockerfile):
+    python tabla_colocaciones.py [--directorio DIR] [--procesos N]
+
+Cada colocación se decodifica y se compara con la original antes de
+guardarla. Hay que reconstruir las tablas si cambia Fase2 (el Dockerfile lo
+hace en cada build). Junto a ellas se guarda colocaciones_version.json con
+cache_colocacion.VERSION_COLOCACION y una huella de las reglas compiladas de
+Fase2 (ver huella_reglas); si no coinciden con el código actual, las tablas
+se ignoran con un aviso en el log. Si no existen o se ignoran,
+cache_colocacion.colocar calcula (o busca en su cache) como siempre.
+
+CONFIGURACIÓN (variables de entorno):
+- ARKHA_TABLA_COLOCACIONES_DIR: directorio de las tablas (por defecto, el de
+  tabla_inventario; vacío = sin tabla, p. ej. para medir el cálculo)
+"""
+
+import argparse
+import hashlib
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+import Fase2
+import tabla_inventario
+
+ARCHIVO_INVENTARIOS = "colocaciones_inventarios.npy"
+ARCHIVO_INDICE = "colocaciones_indice.npy"
+ARCHIVO_CODIGOS = "colocaciones_codigos.npy"
+ARCHIVO_VERSION = "colocaciones_version.json"
+
+DIRECTORIO_POR_DEFECTO = os.environ.get("ARKHA_TABLA_COLOCACIONES_DIR", tabla_inventario.DIRECTORIO_POR_DEFECTO)
+
+# Inventarios colocados por tarea enviada al pool
+TAMANO_PAQUETE = 64
+
+DTYPE_INVENTARIO = np.dtype(">u2")
+BYTES_INVENTARIO = DTYPE_INVENTARIO.itemsize * len(tabla_inventario.CODIGOS)
+
+_tablas: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None
+_tablas_buscadas = False
+
+
+def huella_reglas() -> str:
+    """
+    BLAKE2b de las reglas compiladas de Fase2
+
+    Cubre las tablas de prohibiciones, puntos y pisos prioritarios, los
+    módulos sanitarios, los pisos de cada arka y el orden de colocación.
+    Los cambios del algoritmo no cambian la huella: para esos se incrementa
+    cache_colocacion.VERSION_COLOCACION.
+    """
+    reglas = (
+        Fase2.BITS_PROHIBIDOS,
+        Fase2.TABLA_PUNTOS,
+        Fase2.BITS_PISOS_PRIORITARIOS,
+        Fase2.BITS_SANITARIOS,
+        sorted(Fase2.pisos_arka.items()),
+        Fase2.ordenar_modulos_por_prioridad(dict.fromkeys(tabla_inventario.CODIGOS, 1)),
+    )
+    return hashlib.blake2b(repr(reglas).encode(), digest_size=16).hexdigest()
+
+
+def metadatos() -> Dict[str, Any]:
+    """Metadatos que deben coincidir para usar unas tablas guardadas"""
+    # cache_colocacion importa este módulo
+    import cache_colocacion
+    return {"version": cache_colocacion.VERSION_COLOCACION, "huellaReglas": huella_reglas()}
+
+
+def codificar(arkas: List[Dict]) -> bytes:
+    """Huecos de todas las arkas seguidos, un byte por hueco (0 = vacío)"""
+    return bytes(0 if modulo is None else Fase2.CODIGO_DE_MODULO[modulo]
+                 for arka in arkas for fila in arka["matriz"] for modulo in fila)
+
+
+def decodificar(codigos: Sequence[int]) -> List[Dict]:
+    """
+    Arkas en el formato de Fase2.colocar_inventario_completo
+
+    Args:
+        codigos: Huecos de todas las arkas seguidos (ver codificar)
+    """
+    arkas = []
+    inicio = 0
+    numero = 1
+    while inicio < len(codigos):
+        pisos = Fase2.pisos_arka[str(numero % 5)]
+        fin = inicio + pisos * 4
+        arkas.append({
+            "numero": numero,
+            "matriz": [[Fase2.MODULO_DE_CODIGO[codigo] for codigo in codigos[fila:fila + 4]]
+                       for fila in range(inicio, fin, 4)],
+            "direccion_actual": Fase2.direccion(numero),
+            "direccion_anterior": Fase2.direccion(numero - 1) if numero > 1 else None,
+            "pisos": pisos
+        })
+        inicio = fin
+        numero += 1
+    return arkas
+
+
+def clave(cantidades: Sequence[int]) -> bytes:
+    """Bytes del inventario tal como se guardan en la tabla (uint16 big-endian)"""
+    return np.asarray(cantidades, dtype=DTYPE_INVENTARIO).tobytes()
+
+
+def colocar_paquete(inventarios: List[Tuple[int, ...]]) -> List[bytes]:
+    """
+    Coloca y codifica cada inventario, comprobando que se decodifica igual
+
+    Es de nivel superior para poder enviarse a un pool de procesos.
+
+    Raises:
+        ValueError: Si una colocación no se puede reconstruir desde sus códigos
+    """
+    resultado = []
+    for cantidades in inventarios:
+        inventario = dict(zip(tabla_inventario.CODIGOS, cantidades))
+        arkas = Fase2.ContextoColocacion().colocar_inventario_completo(inventario)
+        codigos = codificar(arkas)
+        if decodificar(codigos) != arkas:
+            raise ValueError(f"La colocación de {inventario} no se puede reconstruir desde sus códigos")
+        resultado.append(codigos)
+    return resultado
+
+
+def inventarios_del_dominio() -> List[Tuple[int, ...]]:
+    """Todos los inventarios distintos de P en 1..300, T en 1..3650 y ambos tipos"""
+    # barrido importa cache_colocacion, que importa este módulo
+    import barrido
+    plan = barrido.planificar((1, tabla_inventario.P_MAX), (1, tabla_inventario.T_MAX))
+    return [cantidades for cantidades, _ in plan.tareas]
+
+
+def construir_tablas(procesos: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Coloca todos los inventarios del dominio en un pool de procesos
+
+    Returns:
+        Tuple: (inventarios >u2[n, 27] ordenados, indice uint32[n + 1], codigos uint8[total])
+    """
+    inventarios = sorted(inventarios_del_dominio(), key=clave)
+    paquetes = [inventarios[i:i + TAMANO_PAQUETE] for i in range(0, len(inventarios), TAMANO_PAQUETE)]
+    with ProcessPoolExecutor(max_workers=procesos) as pool:
+        colocaciones = [codigos for paquete in pool.map(colocar_paquete, paquetes) for codigos in paquete]
+
+    indice = np.zeros(len(inventarios) + 1, dtype=np.uint32)
+    indice[1:] = np.cumsum([len(codigos) for codigos in colocaciones])
+    codigos = np.frombuffer(b"".join(colocaciones), dtype=np.uint8)
+    return np.array(inventarios, dtype=DTYPE_INVENTARIO), indice, codigos
+
+
+def guardar_tablas(directorio: str = DIRECTORIO_POR_DEFECTO,
+                   procesos: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Construye las tablas y las guarda como .npy en `directorio`"""
+    inventarios, indice, codigos = construir_tablas(procesos)
+    os.makedirs(directorio, exist_ok=True)
+    np.save(os.path.join(directorio, ARCHIVO_INVENTARIOS), inventarios)
+    np.save(os.path.join(directorio, ARCHIVO_INDICE), indice)
+    np.save(os.path.join(directorio, ARCHIVO_CODIGOS), codigos)
+    tabla_inventario.guardar_metadatos(os.path.join(directorio, ARCHIVO_VERSION), metadatos())
+    return inventarios, indice, codigos
+
+
+def cargar_tablas(directorio: str = DIRECTORIO_POR_DEFECTO) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    Abre las tablas con memory-map (solo lectura)
+
+    Returns:
+        Tuple: (inventarios como void[n] de 54 bytes, indice, codigos), o None
+        si las tablas no se han construido o se construyeron con otra versión
+        de Fase2 (ver metadatos)
+    """
+    if not directorio:
+        return None
+    rutas = [os.path.join(directorio, archivo) for archivo in (ARCHIVO_INVENTARIOS, ARCHIVO_INDICE, ARCHIVO_CODIGOS)]
+    if not all(os.path.exists(ruta) for ruta in rutas):
+        return None
+    if not tabla_inventario.metadatos_coinciden(os.path.join(directorio, ARCHIVO_VERSION), metadatos()):
+        return None
+    inventarios, indice, codigos = (np.load(ruta, mmap_mode="r") for ruta in rutas)
+    return inventarios.view(np.dtype((np.void, BYTES_INVENTARIO))).ravel(), indice, codigos
+
+
+def obtener_tablas() -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """Tablas del directorio por defecto, abiertas una sola vez por proceso"""
+    global _tablas, _tablas_buscadas
+    if not _tablas_buscadas:
+        _tablas = cargar_tablas()
+        _tablas_buscadas = True
+    return _tablas
+
+
+def consultar(tablas: Tuple[np.ndarray, np.ndarray, np.ndarray], inventario: Dict[str, int]) -> Optional[List[Dict]]:
+    """
+    Búsqueda binaria del inventario en unas tablas ya cargadas
+
+    Returns:
+        List: Arkas nuevas (quien las recibe puede modificarlas), o None si
+        el inventario no está en la tabla
+    """
+    inventarios, indice, codigos = tablas
+    buscada = clave([inventario.get(codigo, 0) for codigo in tabla_inventario.CODIGOS])
+    # Con la clave como bytes, searchsorted convierte la tabla entera; con el
+    # mismo dtype void busca sin copiar
+    fila = int(np.searchsorted(inventarios, np.frombuffer(buscada, dtype=inventarios.dtype)[0]))
+    if fila == len(inventarios) or inventarios[fila].tobytes() != buscada:
+        return None
+    return decodificar(codigos[indice[fila]:indice[fila + 1]].tolist())
+
+
+def colocacion(inventario: Dict[str, int]) -> Optional[List[Dict]]:
+    """
+    Colocación precalculada del inventario
+
+    Returns:
+        List: Arkas, o None si las tablas no se han construido o el
+        inventario no está en ellas
+    """
+    tablas = obtener_tablas()
+    if tablas is None:
+        return None
+    return consultar(tablas, inventario)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Construye la tabla precalculada de colocaciones (Fase2)")
+    parser.add_argument("--directorio", default=DIRECTORIO_POR_DEFECTO, help="Directorio de salida de las tablas")
+    parser.add_argument("--procesos", type=int, default=None, help="Procesos (por defecto, número de CPUs)")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    inventarios, indice, codigos = guardar_tablas(args.directorio, args.procesos)
+    print(f"Tablas guardadas en {args.directorio}: {len(inventarios)} inventarios, "
+          f"{inventarios.nbytes + indice.nbytes + codigos.nbytes} bytes "
+          f"en {time.perf_counter() - inicio:.1f} s")
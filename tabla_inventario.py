@@ -0,0 +1,247 @@
+"""
+===============================================================================
+TABLA PRECALCULADA DE INVENTARIO - FASE 1
+===============================================================================
+
+Fase1.calcular_modulos_arka(P, T, TipoC) es una función pura sobre un dominio
+acotado (P en 1..300, T en 1..3650, TipoC booleano, ver MissionParameters en
+main.py). Este módulo compila sus reglas en tablas uint16 que se guardan en
+disco y se abren con memory-map, de modo que cada consulta es O(1).
+
+ESTRUCTURA DE LAS TABLAS:
+- inventario_modulos.npy: uint16[P, banda, TipoC, 27]
+  Casi todas las reglas solo cambian en los límites de duración 30, 60, 180,
+  500, 600 y 1000, así que T se reduce a una de las bandas de LIMITES_BANDAS.
+- inventario_almacen.npy: uint16[P, min(T, 365), 2]
+  Los módulos STORAGE (018 y 019) dependen de 0.012 * P * min(T, 365), que
+  cambia con cada día hasta 365; se guardan aparte por (P, min(T, 365)).
+
+Los totales (inventario y mínimo con módulos estructurales) se calculan al
+consultar con Fase1.calcular_total_minimo.
+
+CONSTRUCCIÓN (paso de build, ver Dockerfile):
+    python tabla_inventario.py [--directorio DIR] [--verificar]
+
+--verificar compara la tabla con Fase1.calcular_modulos_arka en TODO el
+dominio (300 x 3650 x 2 combinaciones).
+
+Junto a las tablas se guarda inventario_version.json con VERSION_TABLA y una
+huella (BLAKE2b) del código de Fase1. Si no coincide con el código actual
+(tablas de una imagen o un directorio anteriores a un cambio de reglas), las
+tablas se ignoran con un aviso en el log.
+
+Si las tablas no existen, calcular_modulos_arka recurre a Fase1 directamente.
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+from bisect import bisect_left
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+import Fase1
+
+logger = logging.getLogger(__name__)
+
+CODIGOS = [f"{i:03d}" for i in range(1, 28)]
+
+P_MAX = 300
+T_MAX = 3650
+T_ALMACEN_MAX = 365
+
+# Límite superior (inclusive) de cada banda de duración.
+# Las reglas de Fase1 usan T <= 30, T <= 60, T <= 180, T < 500, T <= 500,
+# T <= 600 y T < 1000 (1000 ya pertenece a la última banda).
+LIMITES_BANDAS = (30, 60, 180, 499, 500, 600, 999, T_MAX)
+
+IDX_018 = CODIGOS.index("018")
+IDX_019 = CODIGOS.index("019")
+
+DIRECTORIO_POR_DEFECTO = os.environ.get(
+    "ARKHA_TABLA_INVENTARIO_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "tablas"),
+)
+ARCHIVO_MODULOS = "inventario_modulos.npy"
+ARCHIVO_ALMACEN = "inventario_almacen.npy"
+ARCHIVO_VERSION = "inventario_version.json"
+
+# Incrementar si cambia la estructura de las tablas
+VERSION_TABLA = 1
+
+_tablas: Optional[Tuple[np.ndarray, np.ndarray]] = None
+_tablas_buscadas = False
+
+
+def banda_duracion(T: int) -> int:
+    """Índice de la banda de duración a la que pertenece T"""
+    return bisect_left(LIMITES_BANDAS, T)
+
+
+def huella_fase1() -> str:
+    """BLAKE2b del código fuente de Fase1: cambia con cualquier cambio de sus reglas"""
+    with open(Fase1.__file__, "rb") as archivo:
+        return hashlib.blake2b(archivo.read(), digest_size=16).hexdigest()
+
+
+def metadatos() -> Dict[str, Any]:
+    """Metadatos que deben coincidir para usar unas tablas guardadas"""
+    return {"version": VERSION_TABLA, "huellaFase1": huella_fase1(), "limitesBandas": list(LIMITES_BANDAS)}
+
+
+def guardar_metadatos(ruta: str, datos: Dict[str, Any]):
+    """Escribe los metadatos de unas tablas (después de las tablas)"""
+    with open(ruta, "w") as archivo:
+        json.dump(datos, archivo, indent=2)
+
+
+def metadatos_coinciden(ruta: str, esperados: Dict[str, Any]) -> bool:
+    """
+    Compara los metadatos guardados en `ruta` con los esperados
+
+    Returns:
+        bool: True si coinciden; si faltan o no coinciden, registra un aviso
+        y devuelve False
+    """
+    try:
+        with open(ruta) as archivo:
+            guardados = json.load(archivo)
+    except (OSError, ValueError):
+        logger.warning("Tablas precalculadas sin metadatos válidos (%s): se ignoran", ruta)
+        return False
+    if guardados != esperados:
+        logger.warning("Tablas precalculadas de otra versión (%s: %s, esperado %s): se ignoran; "
+                       "hay que reconstruirlas", ruta, guardados, esperados)
+        return False
+    return True
+
+
+def construir_tablas() -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Evalúa Fase1.calcular_modulos_arka en un representante de cada banda
+
+    Returns:
+        Tuple: (modulos uint16[P_MAX+1, bandas, 2, 27], almacen uint16[P_MAX+1, 366, 2])
+        La fila P=0 y la columna T=0 no se usan.
+    """
+    modulos = np.zeros((P_MAX + 1, len(LIMITES_BANDAS), 2, len(CODIGOS)), dtype=np.uint16)
+    almacen = np.zeros((P_MAX + 1, T_ALMACEN_MAX + 1, 2), dtype=np.uint16)
+
+    for P in range(1, P_MAX + 1):
+        for banda, T in enumerate(LIMITES_BANDAS):
+            for TipoC in (False, True):
+                inventario = Fase1.calcular_modulos_arka(P, T, TipoC)[0]
+                modulos[P, banda, int(TipoC)] = [inventario[codigo] for codigo in CODIGOS]
+
+        for T in range(1, T_ALMACEN_MAX + 1):
+            inventario = Fase1.calcular_modulos_arka(P, T, False)[0]
+            almacen[P, T] = (inventario["018"], inventario["019"])
+
+    # STORAGE se lee siempre de la tabla de almacén
+    modulos[:, :, :, IDX_018] = 0
+    modulos[:, :, :, IDX_019] = 0
+    return modulos, almacen
+
+
+def guardar_tablas(directorio: str = DIRECTORIO_POR_DEFECTO) -> Tuple[np.ndarray, np.ndarray]:
+    """Construye las tablas y las guarda como .npy en `directorio`"""
+    modulos, almacen = construir_tablas()
+    os.makedirs(directorio, exist_ok=True)
+    np.save(os.path.join(directorio, ARCHIVO_MODULOS), modulos)
+    np.save(os.path.join(directorio, ARCHIVO_ALMACEN), almacen)
+    guardar_metadatos(os.path.join(directorio, ARCHIVO_VERSION), metadatos())
+    return modulos, almacen
+
+
+def cargar_tablas(directorio: str = DIRECTORIO_POR_DEFECTO) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Abre las tablas con memory-map (solo lectura)
+
+    Returns:
+        Tuple: (modulos, almacen), o None si las tablas no se han construido
+        o se construyeron con otra versión de Fase1 (ver metadatos)
+    """
+    ruta_modulos = os.path.join(directorio, ARCHIVO_MODULOS)
+    ruta_almacen = os.path.join(directorio, ARCHIVO_ALMACEN)
+    if not (os.path.exists(ruta_modulos) and os.path.exists(ruta_almacen)):
+        return None
+    if not metadatos_coinciden(os.path.join(directorio, ARCHIVO_VERSION), metadatos()):
+        return None
+    return np.load(ruta_modulos, mmap_mode="r"), np.load(ruta_almacen, mmap_mode="r")
+
+
+def obtener_tablas() -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """Tablas del directorio por defecto, abiertas una sola vez por proceso"""
+    global _tablas, _tablas_buscadas
+    if not _tablas_buscadas:
+        _tablas = cargar_tablas()
+        _tablas_buscadas = True
+    return _tablas
+
+
+def consultar(tablas: Tuple[np.ndarray, np.ndarray], P: int, T: int, TipoC: bool) -> Tuple[Dict[str, int], int, int]:
+    """
+    Consulta O(1) en unas tablas ya cargadas
+
+    Returns:
+        Tuple: Mismo formato que Fase1.calcular_modulos_arka
+    """
+    modulos, almacen = tablas
+    fila = modulos[P, banda_duracion(T), 1 if TipoC else 0].tolist()
+    fila[IDX_018], fila[IDX_019] = almacen[P, min(T, T_ALMACEN_MAX)].tolist()
+    total_modulos = sum(fila)
+    return dict(zip(CODIGOS, fila)), total_modulos, Fase1.calcular_total_minimo(total_modulos, P, T)
+
+
+def calcular_modulos_arka(P: int, T: int, TipoC: bool) -> Tuple[Dict[str, int], int, int]:
+    """
+    Igual que Fase1.calcular_modulos_arka pero consultando la tabla precalculada
+
+    Fuera del dominio de la tabla, o si no se ha construido, usa Fase1.
+
+    Returns:
+        Tuple: (modulos_necesarios, total_modulos, total_modulos_sin_base)
+    """
+    tablas = obtener_tablas()
+    if tablas is None or not (1 <= P <= P_MAX and 1 <= T <= T_MAX):
+        return Fase1.calcular_modulos_arka(P, T, TipoC)
+    return consultar(tablas, P, T, TipoC)
+
+
+def verificar_tablas(tablas: Tuple[np.ndarray, np.ndarray]) -> int:
+    """
+    Compara las tablas con Fase1.calcular_modulos_arka en todo el dominio
+
+    Returns:
+        int: Número de combinaciones (P, T, TipoC) que no coinciden
+    """
+    diferencias = 0
+    for P in range(1, P_MAX + 1):
+        for T in range(1, T_MAX + 1):
+            for TipoC in (False, True):
+                esperado = Fase1.calcular_modulos_arka(P, T, TipoC)
+                obtenido = consultar(tablas, P, T, TipoC)
+                if obtenido != esperado:
+                    diferencias += 1
+                    if diferencias <= 10:
+                        print(f"Diferencia en P={P}, T={T}, TipoC={TipoC}: {obtenido} != {esperado}")
+    return diferencias
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Construye la tabla precalculada de inventario (Fase1)")
+    parser.add_argument("--directorio", default=DIRECTORIO_POR_DEFECTO, help="Directorio de salida de las tablas")
+    parser.add_argument("--verificar", action="store_true", help="Comparar con Fase1 en todo el dominio")
+    args = parser.parse_args()
+
+    modulos, almacen = guardar_tablas(args.directorio)
+    print(f"Tablas guardadas en {args.directorio}: {modulos.nbytes + almacen.nbytes} bytes")
+
+    if args.verificar:
+        diferencias = verificar_tablas(cargar_tablas(args.directorio))
+        if diferencias:
+            raise SystemExit(f"ERROR: {diferencias} combinaciones no coinciden con Fase1")
+        print(f"Verificación completa: {P_MAX * T_MAX * 2} combinaciones coinciden con Fase1")
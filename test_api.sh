@@ -21,6 +21,21 @@ curl -s -X POST http://localhost:8000/api/v1/generate-layout \
     "isScientific": false
   }' | jq '.'
 
+echo ""
+echo ""
+
+# Generate Layout (binario ARKL)
+echo "3️⃣  Testing Generate Layout (binary)..."
+curl -s "http://localhost:8000/api/v1/generate-layout.bin?passengers=10&duration=90&terrain=moon&isScientific=false" \
+  -o /dev/null -w "HTTP %{http_code} - %{content_type} - %{size_download} bytes\n"
+
+echo ""
+
+# Generate Layout (streaming NDJSON, una línea por arka)
+echo "4️⃣  Testing Generate Layout (NDJSON stream)..."
+curl -s -N "http://localhost:8000/api/v1/generate-layout.ndjson?passengers=10&duration=90&terrain=moon&isScientific=false" \
+  | jq -c '{type, numero, totalModules}'
+
 echo ""
 echo "✅ Tests completed!"
 echo "📖 View full docs at: http://localhost:8000/docs"
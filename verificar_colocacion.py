@@ -0,0 +1,160 @@
+"""
+===============================================================================
+VERIFICACIÓN DE COLOCACIONES CONTRA LA REFERENCIA (FASE 2)
+===============================================================================
+
+Las optimizaciones de Fase2 (reglas compiladas, representación compacta,
+índices de huecos, cache de scores) no deben cambiar ninguna colocación.
+colocaciones_referencia.npz guarda, para cada inventario distinto del
+dominio (P en 1..300, T en 1..3650, ambos tipos; ver barrido.planificar), un
+resumen BLAKE2b de las arkas que devolvía el Fase2 original, anterior a esas
+optimizaciones. Este script coloca los inventarios con el Fase2 actual y
+compara los resúmenes.
+
+ESTRUCTURA DE LA REFERENCIA:
+- inventarios: uint16 [n, 27], cantidades en el orden de
+  tabla_inventario.CODIGOS, ordenadas
+- resumenes: uint8 [n, 16], BLAKE2b de orjson.dumps(arkas) con las claves
+  ordenadas (no S16: numpy quita los bytes nulos finales al leerlo)
+
+MODOS:
+- por defecto: una muestra aleatoria de --muestra inventarios
+- --todo: todos los inventarios de la referencia (unos 44 000, ~4 min por
+  núcleo)
+- --tabla: todos los inventarios, leyendo la tabla precalculada
+  (tabla_colocaciones.py) en lugar de calcular; es el paso del Dockerfile
+- --regenerar: vuelve a escribir la referencia con el Fase2 actual. Solo
+  cuando un cambio de Fase2 cambia las colocaciones a propósito (e
+  incrementa también cache_colocacion.VERSION_COLOCACION).
+
+USO:
+    python verificar_colocacion.py [--muestra 500] [--todo] [--tabla] [--semilla 0]
+    python verificar_colocacion.py --regenerar [--procesos N]
+"""
+
+import argparse
+import hashlib
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import orjson
+
+import Fase2
+import tabla_colocaciones
+import tabla_inventario
+
+RUTA_REFERENCIA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "colocaciones_referencia.npz")
+
+
+def resumen(arkas: List[Dict]) -> bytes:
+    """BLAKE2b (16 bytes) de las arkas serializadas con las claves ordenadas"""
+    return hashlib.blake2b(orjson.dumps(arkas, option=orjson.OPT_SORT_KEYS), digest_size=16).digest()
+
+
+def colocar(cantidades: Sequence[int]) -> List[Dict]:
+    """Colocación del inventario con el Fase2 actual"""
+    return Fase2.ContextoColocacion().colocar_inventario_completo(dict(zip(tabla_inventario.CODIGOS, cantidades)))
+
+
+def resumir_paquete(inventarios: List[Tuple[int, ...]]) -> List[bytes]:
+    """Resumen de la colocación de cada inventario (de nivel superior para el pool)"""
+    return [resumen(colocar(cantidades)) for cantidades in inventarios]
+
+
+def cargar_referencia(ruta: str = RUTA_REFERENCIA) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Lee la referencia
+
+    Returns:
+        Tuple: (inventarios uint16[n, 27], resumenes uint8[n, 16])
+    """
+    with np.load(ruta) as referencia:
+        return referencia["inventarios"], referencia["resumenes"]
+
+
+def regenerar(ruta: str = RUTA_REFERENCIA, procesos: Optional[int] = None) -> int:
+    """
+    Escribe la referencia con las colocaciones del Fase2 actual
+
+    Returns:
+        int: Número de inventarios de la referencia
+    """
+    inventarios = sorted(tabla_colocaciones.inventarios_del_dominio())
+    paquetes = [inventarios[i:i + tabla_colocaciones.TAMANO_PAQUETE]
+                for i in range(0, len(inventarios), tabla_colocaciones.TAMANO_PAQUETE)]
+    with ProcessPoolExecutor(max_workers=procesos) as pool:
+        resumenes = [valor for paquete in pool.map(resumir_paquete, paquetes) for valor in paquete]
+    np.savez_compressed(ruta, inventarios=np.array(inventarios, dtype=np.uint16),
+                        resumenes=np.frombuffer(b"".join(resumenes), dtype=np.uint8).reshape(-1, 16))
+    return len(inventarios)
+
+
+def verificar(inventarios: np.ndarray, resumenes: np.ndarray, filas: Sequence[int],
+              fuente: Callable[[Sequence[int]], Optional[List[Dict]]]) -> int:
+    """
+    Compara las colocaciones de `fuente` con la referencia en las filas dadas
+
+    Args:
+        fuente: Cantidades → arkas (None si no tiene el inventario)
+
+    Returns:
+        int: Número de inventarios que no coinciden (o que faltan en la fuente)
+    """
+    diferencias = 0
+    for fila in filas:
+        cantidades = inventarios[fila].tolist()
+        arkas = fuente(cantidades)
+        if arkas is None or resumen(arkas) != resumenes[fila].tobytes():
+            diferencias += 1
+            if diferencias <= 10:
+                estado = "falta en la fuente" if arkas is None else "colocación distinta"
+                print(f"Diferencia en {dict(zip(tabla_inventario.CODIGOS, cantidades))}: {estado}")
+    return diferencias
+
+
+def fuente_tabla() -> Callable[[Sequence[int]], Optional[List[Dict]]]:
+    """
+    Consulta de la tabla precalculada del directorio por defecto
+
+    Raises:
+        SystemExit: Si la tabla no existe o es de otra versión
+    """
+    tablas = tabla_colocaciones.obtener_tablas()
+    if tablas is None:
+        raise SystemExit(f"ERROR: no hay tabla de colocaciones válida en {tabla_colocaciones.DIRECTORIO_POR_DEFECTO}")
+    return lambda cantidades: tabla_colocaciones.consultar(tablas, dict(zip(tabla_inventario.CODIGOS, cantidades)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compara las colocaciones de Fase2 con la referencia del Fase2 original")
+    parser.add_argument("--referencia", default=RUTA_REFERENCIA, help="Archivo .npz de la referencia")
+    parser.add_argument("--muestra", type=int, default=500, help="Inventarios de la muestra aleatoria")
+    parser.add_argument("--semilla", type=int, default=0, help="Semilla de la muestra")
+    parser.add_argument("--todo", action="store_true", help="Todos los inventarios de la referencia")
+    parser.add_argument("--tabla", action="store_true", help="Todos los inventarios, desde la tabla precalculada")
+    parser.add_argument("--regenerar", action="store_true", help="Reescribir la referencia con el Fase2 actual")
+    parser.add_argument("--procesos", type=int, default=None, help="Procesos para --regenerar (por defecto, número de CPUs)")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    if args.regenerar:
+        total = regenerar(args.referencia, args.procesos)
+        print(f"Referencia guardada en {args.referencia}: {total} inventarios en {time.perf_counter() - inicio:.1f} s")
+        raise SystemExit(0)
+
+    inventarios, resumenes = cargar_referencia(args.referencia)
+    if args.todo or args.tabla:
+        filas = range(len(inventarios))
+    else:
+        filas = random.Random(args.semilla).sample(range(len(inventarios)), min(args.muestra, len(inventarios)))
+
+    diferencias = verificar(inventarios, resumenes, filas, fuente_tabla() if args.tabla else colocar)
+    origen = "la tabla precalculada" if args.tabla else "Fase2"
+    if diferencias:
+        raise SystemExit(f"ERROR: {diferencias} de {len(filas)} colocaciones de {origen} no coinciden con la referencia")
+    print(f"Verificación completa: {len(filas)} colocaciones de {origen} coinciden con la referencia "
+          f"en {time.perf_counter() - inicio:.1f} s")
@@ -0,0 +1,94 @@
+"""
+===============================================================================
+VERIFICACIÓN DE COLOCACIONES CONCURRENTES (FASE 2)
+===============================================================================
+
+Fase2.ContextoColocacion guarda todo el estado de una colocación (contador y
+lista de arkas, índices de huecos, cache de scores), así que varias
+colocaciones pueden ejecutarse a la vez en hilos de un mismo proceso sin
+locks. Este script lo comprueba: coloca una muestra de inventarios en serie
+y después cientos de veces a la vez en un ThreadPoolExecutor (en orden
+aleatorio y con un intervalo de cambio de hilo muy corto para forzar
+intercalados), y compara cada resultado con el de la ejecución en serie.
+
+Se comprueban colocar_inventario_completo y colocar_inventario_incremental
+(el que usa /api/v1/generate-layout.ndjson).
+
+USO (paso de build, ver Dockerfile):
+    python verificar_concurrencia.py [--colocaciones 400] [--hilos 32] [--semilla 0]
+"""
+
+import argparse
+import random
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+import Fase2
+import tabla_inventario
+
+# Misiones distintas de la muestra (cada una se coloca varias veces)
+MISIONES = 40
+
+
+def muestra(semilla: int) -> List[Dict[str, int]]:
+    """Inventarios de MISIONES misiones aleatorias del dominio"""
+    aleatorio = random.Random(semilla)
+    return [
+        tabla_inventario.calcular_modulos_arka(aleatorio.randint(1, tabla_inventario.P_MAX),
+                                               aleatorio.randint(1, tabla_inventario.T_MAX),
+                                               aleatorio.random() < 0.5)[0]
+        for _ in range(MISIONES)
+    ]
+
+
+def colocar(trabajo: Tuple[int, bool], inventarios: List[Dict[str, int]]) -> List[Dict]:
+    """Coloca el inventario del trabajo con un contexto nuevo (completo o incremental)"""
+    indice, incremental = trabajo
+    contexto = Fase2.ContextoColocacion()
+    if incremental:
+        return list(contexto.colocar_inventario_incremental(inventarios[indice]))
+    return contexto.colocar_inventario_completo(inventarios[indice])
+
+
+def verificar(colocaciones: int, hilos: int, semilla: int) -> int:
+    """
+    Compara las colocaciones concurrentes con las de una ejecución en serie
+
+    Returns:
+        int: Número de colocaciones concurrentes que no coinciden
+    """
+    inventarios = muestra(semilla)
+    esperadas = [Fase2.ContextoColocacion().colocar_inventario_completo(inventario) for inventario in inventarios]
+
+    aleatorio = random.Random(semilla)
+    trabajos = [(aleatorio.randrange(len(inventarios)), aleatorio.random() < 0.5) for _ in range(colocaciones)]
+
+    intervalo = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        with ThreadPoolExecutor(max_workers=hilos) as pool:
+            resultados = list(pool.map(colocar, trabajos, [inventarios] * len(trabajos)))
+    finally:
+        sys.setswitchinterval(intervalo)
+
+    diferencias = 0
+    for (indice, incremental), arkas in zip(trabajos, resultados):
+        if arkas != esperadas[indice]:
+            diferencias += 1
+            if diferencias <= 10:
+                print(f"Diferencia en el inventario {indice} (incremental={incremental})")
+    return diferencias
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compara colocaciones concurrentes de Fase2 con una ejecución en serie")
+    parser.add_argument("--colocaciones", type=int, default=400, help="Colocaciones concurrentes")
+    parser.add_argument("--hilos", type=int, default=32, help="Hilos del ThreadPoolExecutor")
+    parser.add_argument("--semilla", type=int, default=0, help="Semilla de la muestra y del orden")
+    args = parser.parse_args()
+
+    diferencias = verificar(args.colocaciones, args.hilos, args.semilla)
+    if diferencias:
+        raise SystemExit(f"ERROR: {diferencias} de {args.colocaciones} colocaciones concurrentes no coinciden con la serie")
+    print(f"Verificación completa: {args.colocaciones} colocaciones en {args.hilos} hilos coinciden con la serie")
@@ -0,0 +1,69 @@
+"""
+===============================================================================
+VERIFICACIÓN DEL CUERPO DE RESPUESTA DE GENERATE-LAYOUT
+===============================================================================
+
+El endpoint /api/v1/generate-layout serializa el layout directamente desde los
+arrays de Fase3 (pipeline.generar_layout_json) sin pasar por Pydantic. Este
+script comprueba, en una muestra del dominio de misiones, que ese cuerpo:
+1. Es válido según MissionLayoutResponse (el esquema documentado en /docs)
+2. Es idéntico byte a byte a MissionLayoutResponse(...).model_dump_json()
+   aplicado al diccionario de pipeline.generar_layout
+
+La muestra recorre P en 1..300 con el paso indicado, una duración por banda
+de tabla_inventario.LIMITES_BANDAS (más duraciones intermedias de almacén),
+ambos valores de isScientific y los tres terrenos.
+
+USO (paso de build, ver Dockerfile):
+    python verificar_respuesta.py [--paso-p 10]
+"""
+
+import argparse
+from itertools import cycle
+
+import pipeline
+import tabla_inventario
+from cache_layouts import parchear_timestamp
+from main import MissionLayoutResponse, MissionParameters
+
+TERRENOS = MissionParameters.model_fields["terrain"].annotation.__args__
+DURACIONES = sorted(set(tabla_inventario.LIMITES_BANDAS) | {1, 90, 365})
+TIMESTAMP_FIJO = "2000-01-01T00:00:00Z"
+
+
+def verificar(paso_p: int) -> int:
+    """
+    Compara la serialización directa con la de Pydantic
+
+    Returns:
+        int: Número de misiones cuyo cuerpo no coincide
+    """
+    diferencias = 0
+    terrenos = cycle(TERRENOS)
+    for P in range(1, tabla_inventario.P_MAX + 1, paso_p):
+        for T in DURACIONES:
+            for TipoC in (False, True):
+                terrain = next(terrenos)
+                directo = pipeline.generar_layout_json(P, T, terrain, TipoC)
+                referencia = MissionLayoutResponse.model_validate(
+                    pipeline.generar_layout(P, T, terrain, TipoC)
+                ).model_dump_json().encode()
+
+                MissionLayoutResponse.model_validate_json(directo)
+                if parchear_timestamp(directo, TIMESTAMP_FIJO) != parchear_timestamp(referencia, TIMESTAMP_FIJO):
+                    diferencias += 1
+                    if diferencias <= 10:
+                        print(f"Diferencia en P={P}, T={T}, terrain={terrain}, TipoC={TipoC}")
+    return diferencias
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Verifica la serialización directa de generate-layout")
+    parser.add_argument("--paso-p", type=int, default=10, help="Paso en el recorrido de pasajeros 1..300")
+    args = parser.parse_args()
+
+    diferencias = verificar(args.paso_p)
+    casos = len(range(1, tabla_inventario.P_MAX + 1, args.paso_p)) * len(DURACIONES) * 2
+    if diferencias:
+        raise SystemExit(f"ERROR: {diferencias} de {casos} respuestas no coinciden con MissionLayoutResponse")
+    print(f"Verificación completa: {casos} respuestas coinciden con MissionLayoutResponse")